@@ -1,7 +1,13 @@
 # _shared.py — utilitaires communs (filtres, pagination, statusbar, chargements, exports)
 from __future__ import annotations
 import io
+import json
+import os
 import re
+import sys
+import tarfile
+from collections.abc import MutableMapping
+from contextlib import nullcontext
 from datetime import date, datetime
 from pathlib import Path
 from typing import Dict, Optional, Tuple, List
@@ -9,11 +15,20 @@ from typing import Dict, Optional, Tuple, List
 import pandas as pd
 import streamlit as st
 
+import schema
+
+# zstandard (optional, archives .tar.zst)
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
 # ==== Import backends existants ====
 try:
     from storage_backend import (
         AUDIT_COLS, SHEET_NAME,
-        compute_etag, ensure_df_source, save_df_target
+        compute_etag, ensure_df_source, ensure_df_sources, save_df_target, append_rows_target, query_rows,
+        data_version, query_period, table_months, ROW_KEYS, table_lock
     )
 except Exception:
     # Garde-fous si le module n'existe pas (dev local minimal)
@@ -31,34 +46,76 @@ except Exception:
             return hashlib.sha256(payload.encode("utf-8")).hexdigest()
         except Exception:
             return "empty"
-    def ensure_df_source(name: str, cols: list, paths: dict=None, ws_func=None) -> pd.DataFrame:  # pragma: no cover
+    def ensure_df_source(name: str, cols: list, paths: dict=None, ws_func=None, columns: list=None) -> pd.DataFrame:  # pragma: no cover
         p = (paths or {}).get(name, Path(f"data/{name}.csv"))
         p.parent.mkdir(exist_ok=True, parents=True)
         if not p.exists():
             df = pd.DataFrame(columns=cols + [c for c in AUDIT_COLS if c not in cols])
             df.to_csv(p, index=False, encoding="utf-8")
             return df
-        return pd.read_csv(p, dtype=str).fillna("")
+        df = pd.read_csv(p, dtype=str).fillna("")
+        return df[[c for c in df.columns if c in columns]] if columns else df
+    def ensure_df_sources(specs: dict, paths: dict=None, ws_func=None, max_workers=None, on_error="warn", typed=False) -> dict:  # pragma: no cover
+        return {n: ensure_df_source(n, c, paths, ws_func) for n, c in specs.items()}
     def save_df_target(name: str, df: pd.DataFrame, paths: dict=None, ws_func=None):  # pragma: no cover
         p = (paths or {}).get(name, Path(f"data/{name}.csv"))
         p.parent.mkdir(exist_ok=True, parents=True)
         df.to_csv(p, index=False, encoding="utf-8")
+    def append_rows_target(name: str, rows: pd.DataFrame, paths: dict=None, ws_func=None):  # pragma: no cover
+        p = (paths or {}).get(name, Path(f"data/{name}.csv"))
+        p.parent.mkdir(exist_ok=True, parents=True)
+        rows.to_csv(p, mode="a", header=not p.exists(), index=False, encoding="utf-8")
+    def data_version(name: str) -> int:  # pragma: no cover
+        return 0
+    def query_period(name: str, cols: list, start=None, end=None, paths: dict=None, ws_func=None, columns: list=None) -> pd.DataFrame:  # pragma: no cover
+        df = ensure_df_source(name, cols, paths, ws_func)
+        col = {"inter": "Date", "pay": "Date_Paiement"}[name]
+        d = pd.to_datetime(df.get(col, pd.Series("", index=df.index)), errors="coerce")
+        mask = d.notna()
+        if start is not None: mask &= d >= pd.Timestamp(start)
+        if end is not None: mask &= d <= pd.Timestamp(end)
+        return df[mask]
+    def table_months(name: str, cols: list, paths: dict=None, ws_func=None) -> list:  # pragma: no cover
+        col = {"inter": "Date", "pay": "Date_Paiement"}[name]
+        d = pd.to_datetime(ensure_df_source(name, cols, paths, ws_func).get(col, pd.Series(dtype=str)), errors="coerce")
+        return sorted(d.dropna().dt.strftime("%Y-%m").unique().tolist())
+    def query_rows(name: str, cols: list, where: dict, paths: dict=None, ws_func=None, columns: list=None):  # pragma: no cover
+        df = ensure_df_source(name, cols, paths, ws_func)
+        for c, v in (where or {}).items():
+            vals = [str(x) for x in v] if isinstance(v, (list, tuple, set, pd.Series)) else [str(v)]
+            df = df[df[c].astype(str).isin(vals)] if c in df.columns else df.iloc[0:0]
+        return df[[c for c in columns if c in df.columns]] if columns else df
+    ROW_KEYS = {n: c[0] for n, c in schema.SCHEMAS.items()}
+    def table_lock(path: Path, shared: bool = False):  # pragma: no cover
+        return nullcontext()
+
+# Versions des tables (points de restauration, voir versions.py)
+try:
+    import versions
+except Exception:
+    versions = None
 
-# ==== Schémas colonnes minimaux ====
-C_COLS = ["ID","Nom","Prenom","Email","Telephone","Type","Statut","Entreprise","Fonction","Pays","Ville",
-          "Top20","Created_At","Created_By","Updated_At","Updated_By","Genre"]
-ENT_COLS = ["ID_Entreprise","Nom_Entreprise","Secteur","Contact_Principal_ID","CA_Annuel","Nb_Employes",
-            "Pays","Ville","Created_At","Created_By","Updated_At","Updated_By"]
-E_COLS = ["ID_Événement","Nom_Événement","Type","Date","Ville","Pays",
-          "Cout_Salle","Cout_Formateur","Cout_Logistique","Cout_Pub","Cout_Autres","Cout_Total",
-          "Created_At","Created_By","Updated_At","Updated_By"]
-PART_COLS = ["ID_Participation","ID","ID_Événement","Rôle","Note","Created_At","Created_By","Updated_At","Updated_By"]
-PAY_COLS  = ["ID_Paiement","ID","ID_Événement","Montant","Statut","Date_Paiement","Created_At","Created_By","Updated_At","Updated_By"]
-CERT_COLS = ["ID_Certif","ID","Intitulé","Résultat","Date_Obtention","Date_Examen","Created_At","Created_By","Updated_At","Updated_By"]
-INTER_COLS = ["ID_Interaction","ID","Canal","Objet","Date","Responsable","Cible","ID_Cible",
-              "Created_At","Created_By","Updated_At","Updated_By"]
-EPART_COLS = ["ID_EntPart","ID_Entreprise","ID_Événement","Type_Lien","Nb_Employes","Sponsoring_FCFA",
-              "Created_At","Created_By","Updated_At","Updated_By"]
+# ==== Cache partagé : calculs dérivés invalidés par table ====
+try:
+    from dataset_store import cached_on, invalidate_tables
+except Exception:
+    def cached_on(*tables):  # pragma: no cover
+        return lambda fn: fn
+    def invalidate_tables(*names):  # pragma: no cover
+        pass
+
+# ==== Schémas colonnes (registre unique : schema.py) ====
+C_COLS = schema.columns("contacts")
+ENT_COLS = schema.columns("entreprises")
+E_COLS = schema.columns("events")
+PART_COLS = schema.columns("parts")
+PAY_COLS  = schema.columns("pay")
+CERT_COLS = schema.columns("cert")
+INTER_COLS = schema.columns("inter")
+EPART_COLS = schema.columns("entreprise_parts")
+U_COLS = schema.columns("users")
+
+TABLE_COLS = {name: schema.columns(name) for name in schema.SCHEMAS}
 
 # ==== Backend & chemins ====
 DATA_DIR = Path("data"); DATA_DIR.mkdir(exist_ok=True, parents=True)
@@ -81,8 +138,10 @@ def _paths() -> Dict[str, Path]:
 def _ws_func():
     return st.session_state.get("WS_FUNC", None)
 
-# ==== Chargement groupé ====
-def load_all_tables() -> Dict[str, pd.DataFrame]:
+# ==== Chargement groupé (paresseux) ====
+def _load_tables(names: List[str], typed: bool = False) -> Dict[str, pd.DataFrame]:
+    """Charge `names` en un seul lot : un appel Google Sheets pour tous les onglets, sinon pool de threads.
+       Une table en erreur est signalée et renvoyée vide, sans bloquer les autres."""
     paths = _paths()
     backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
     ws = _ws_func() if backend_eff == "gsheets" else None
@@ -92,37 +151,233 @@ def load_all_tables() -> Dict[str, pd.DataFrame]:
         if df is None or not isinstance(df, pd.DataFrame) or df.empty:
             df = pd.DataFrame(columns=cols)
         else:
-            df = df.copy()
+            df = df.copy(deep=False)  # vue sur le jeu partagé : pas de copie des données
         for c in cols:
             if c not in df.columns:
                 df[c] = ""
         ordered = [c for c in cols if c in df.columns] + [c for c in df.columns if c not in cols]
-        return df[ordered].fillna("")
+        df = df[ordered]
+        if typed:
+            text = [c for c in df.columns if df[c].dtype == object]
+            df[text] = df[text].fillna("")
+            return df
+        return df.fillna("")
 
+    wanted = [t for t in TABLE_COLS if t in names]
+    workers = int(st.secrets.get("load_workers", 8))
+    raw = ensure_df_sources({t: TABLE_COLS[t] for t in wanted}, paths, ws, max_workers=workers, typed=typed)
     dfs = {}
-    dfs["contacts"] = _norm(ensure_df_source("contacts", C_COLS, paths, ws), C_COLS)
-    dfs["entreprises"] = _norm(ensure_df_source("entreprises", ENT_COLS, paths, ws), ENT_COLS)
-    dfs["events"] = _norm(ensure_df_source("events", E_COLS, paths, ws), E_COLS)
-    dfs["parts"] = _norm(ensure_df_source("parts", PART_COLS, paths, ws), PART_COLS)
-    dfs["pay"] = _norm(ensure_df_source("pay", PAY_COLS, paths, ws), PAY_COLS)
-    dfs["cert"] = _norm(ensure_df_source("cert", CERT_COLS, paths, ws), CERT_COLS)
-    _inter = ensure_df_source("inter", INTER_COLS, paths, ws)
-    for nc in ["Cible","ID_Cible"]:
-        if nc not in _inter.columns:
-            _inter[nc] = ""
-    dfs["inter"] = _norm(_inter, INTER_COLS)
-    dfs["entreprise_parts"] = _norm(ensure_df_source("entreprise_parts", EPART_COLS, paths, ws), EPART_COLS)
-    dfs["params"] = ensure_df_source("params", ["key","value"], paths, ws)
-    dfs["users"]  = ensure_df_source("users", ["user_id","email","password_hash","role","is_active","display_name",
-                                               "Created_At","Created_By","Updated_At","Updated_By"], paths, ws)
+    for name in ["contacts","entreprises","events","parts","pay","cert"]:
+        if name in raw:
+            dfs[name] = _norm(raw[name], TABLE_COLS[name])
+    if "inter" in raw:
+        _inter = raw["inter"]
+        for nc in ["Cible","ID_Cible"]:
+            if nc not in _inter.columns:
+                _inter[nc] = ""
+        dfs["inter"] = _norm(_inter, INTER_COLS)
+    if "entreprise_parts" in raw:
+        dfs["entreprise_parts"] = _norm(raw["entreprise_parts"], EPART_COLS)
+    for name in ["params","users"]:
+        if name in raw:
+            dfs[name] = raw[name]
     return dfs
 
+def _record_tables_read(page: str, names: List[str]) -> None:
+    """st.session_state["TABLES_LOADED"][page] : tables réellement lues par la page (panneau Diagnostics)."""
+    report = st.session_state.setdefault("TABLES_LOADED", {})
+    seen = set(report.get(page, []))
+    if not seen.issuperset(names):
+        report[page] = sorted(seen | set(names))
+
+class LazyTables(MutableMapping):
+    """Résultat de load_all_tables : une table n'est chargée qu'à sa première lecture, puis gardée tant
+       que sa version (data_version) ne change pas. Au premier chargement, les tables déjà lues par la
+       page lors d'un run précédent sont chargées avec elle, en un seul lot."""
+    def __init__(self, names: List[str], typed: bool = False, page: str = "?"):
+        self._names = list(names)
+        self._typed = typed
+        self._page = page
+        self._frames: Dict[str, tuple] = {}  # nom -> (version, df) ; version None = affecté par la page
+
+    def _fresh(self, name: str) -> bool:
+        hit = self._frames.get(name)
+        return hit is not None and (hit[0] is None or hit[0] == data_version(name))
+
+    def prefetch(self, *names: str) -> None:
+        """Charge d'un coup les tables indiquées (et pas encore à jour)."""
+        todo = [n for n in names if n in self._names and not self._fresh(n)]
+        if not todo:
+            return
+        versions = {n: data_version(n) for n in todo}  # lue avant : une écriture pendant le chargement recharge
+        for name, df in _load_tables(todo, self._typed).items():
+            self._frames[name] = (versions[name], df)
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name not in self._names:
+            raise KeyError(name)
+        if not self._fresh(name):
+            previous = st.session_state.get("TABLES_LOADED", {}).get(self._page, [])
+            self.prefetch(name, *[n for n in previous if n != name])
+        _record_tables_read(self._page, [name])
+        return self._frames[name][1]
+
+    def __setitem__(self, name: str, df: pd.DataFrame) -> None:
+        if name not in self._names:
+            self._names.append(name)
+        self._frames[name] = (None, df)
+
+    def __delitem__(self, name: str) -> None:
+        self._names.remove(name)
+        self._frames.pop(name, None)
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._names
+
+    def loaded(self) -> List[str]:
+        return [n for n in self._names if n in self._frames]
+
+    def __repr__(self) -> str:
+        return f"LazyTables(chargées={self.loaded()}, disponibles={self._names})"
+
+def load_all_tables(tables: Optional[List[str]] = None, typed: bool = False,
+                    use_cache_only: bool = False) -> LazyTables:
+    """Tables (toutes par défaut, sinon seulement `tables`), chargées à la première lecture : une page
+       ne lit que ce qu'elle utilise. Voir LazyTables et _load_tables.
+       typed=True : colonnes typées selon schema.py (pages de lecture/agrégats, ex. Rapports).
+       Les tables viennent du jeu partagé entre sessions (dataset_store) tant que la source n'a pas
+       changé : `use_cache_only` (pages CRM) est accepté pour compatibilité, c'est déjà le cas."""
+    wanted = list(TABLE_COLS) if tables is None else [t for t in TABLE_COLS if t in tables]
+    page = os.path.basename(sys._getframe(1).f_code.co_filename)  # script appelant (page Streamlit)
+    return LazyTables(wanted, typed, page)
+
+def load_table(name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Charge une seule table, éventuellement limitée aux colonnes utilisées par la page
+       (projection réelle en Parquet/CSV, filtrage après lecture en Google Sheets)."""
+    paths = _paths()
+    backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
+    ws = _ws_func() if backend_eff == "gsheets" else None
+    return ensure_df_source(name, TABLE_COLS.get(name, columns or []), paths, ws, columns=columns)
+
+def query_table(name: str, where: Dict[str, object], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lignes d'une seule entité/d'un groupe d'IDs (requête indexée en SQLite, filtre pandas sinon).
+       Ex. query_table("pay", {"ID": emp_ids})"""
+    paths = _paths()
+    backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
+    ws = _ws_func() if backend_eff == "gsheets" else None
+    return query_rows(name, TABLE_COLS.get(name, []), where, paths, ws, columns=columns)
+
+def query_table_period(name: str, start=None, end=None, columns: Optional[List[str]] = None,
+                       typed: bool = False) -> pd.DataFrame:
+    """Interactions / paiements datés entre `start` et `end` inclus : seules les archives mensuelles
+       concernées sont lues. Ex. query_table_period("pay", date(2024, 3, 1), date(2024, 3, 31))"""
+    paths = _paths()
+    backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
+    ws = _ws_func() if backend_eff == "gsheets" else None
+    df = query_period(name, TABLE_COLS.get(name, []), start, end, paths, ws, columns=columns)
+    return schema.to_typed(df, name) if typed else df
+
+def table_years(name: str) -> List[int]:
+    """Années présentes dans les interactions / paiements (noms des archives + CSV récent)."""
+    paths = _paths()
+    backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
+    ws = _ws_func() if backend_eff == "gsheets" else None
+    return sorted({int(m[:4]) for m in table_months(name, TABLE_COLS.get(name, []), paths, ws)})
+
 def save_table(name: str, df: pd.DataFrame) -> None:
     paths = _paths()
     backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
     ws = _ws_func() if backend_eff == "gsheets" else None
     save_df_target(name, df, paths, ws)
 
+def append_rows(name: str, rows: pd.DataFrame) -> None:
+    """Ajoute des lignes en fin de table (écriture incrémentale, sans réécrire la table)."""
+    paths = _paths()
+    backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
+    ws = _ws_func() if backend_eff == "gsheets" else None
+    append_rows_target(name, rows, paths, ws)
+
+# ==== Versions des tables (points de restauration) ====
+# Avant / après chaque remplacement de table (import, restauration) : delta ligne à ligne par clé, état complet
+# de temps en temps. Rétention (secrets) : versions_retention_days (90), versions_keep_min (10).
+def versions_root() -> Path:
+    return _paths().get("contacts", DEFAULT_PATHS["contacts"]).parent / ".versions"
+
+def _versions_lock(name: str):
+    return table_lock(versions_root() / name / "log.jsonl")
+
+def snapshot_table(name: str, df: Optional[pd.DataFrame] = None, reason: str = "") -> Optional[int]:
+    """Enregistre l'état de la table (ou `df`) comme version, puis applique la rétention.
+       Renvoie le numéro de version, None si rien n'a changé (ou module versions absent)."""
+    if versions is None:
+        return None
+    if df is None:
+        df = load_table(name)
+    user = st.session_state.get("auth_user") or {}
+    user = str(user.get("email") or user.get("user_id") or "system") if isinstance(user, dict) else "system"
+    v = versions.record(name, df, ROW_KEYS.get(name), user, reason, versions_root(), lock=_versions_lock(name))
+    versions.compact(name, float(st.secrets.get("versions_retention_days", versions.RETENTION_DAYS)),
+                     int(st.secrets.get("versions_keep_min", versions.KEEP_MIN)),
+                     root=versions_root(), lock=_versions_lock(name))
+    return v
+
+def restore_table(name: str, v: int) -> pd.DataFrame:
+    """Réécrit la table avec son contenu à la version `v` (état courant enregistré avant, pour pouvoir revenir)."""
+    df = versions.state(name, v, versions_root())
+    if df is None:
+        raise ValueError(f"Version {v} de {name} introuvable (retirée par la rétention ?)")
+    snapshot_table(name, reason=f"avant restauration de la version {v}")
+    save_table(name, df)
+    snapshot_table(name, df, reason=f"restauration de la version {v}")
+    return df
+
+def render_write_status() -> None:
+    """Barre latérale : écritures différées en attente / écrites. Relance le flush (et la reprise
+       du journal après un arrêt brutal) s'il reste des entrées."""
+    try:
+        import write_behind
+        from storage_backend import _write_behind_dir
+    except Exception:
+        return
+    journal = _write_behind_dir(_paths())
+    stat = write_behind.status(journal)
+    if stat["en_attente"]:
+        write_behind.ensure_worker(_ws_func(), journal_dir=journal)
+    elif not st.session_state.get("WRITE_BEHIND", st.secrets.get("write_behind", False)):
+        return
+    if stat["en_attente"]:
+        detail = ", ".join(f"{t} : {n}" for t, n in stat["par_table"].items())
+        st.sidebar.warning(f"💾 {stat['en_attente']} écriture(s) en attente ({detail})")
+    else:
+        st.sidebar.caption(f"💾 Écritures différées : tout est enregistré ({stat['écrites']} écrites)")
+    if stat["dernière_erreur"]:
+        st.sidebar.caption(f"⚠️ Dernière erreur d'écriture : {stat['dernière_erreur']}")
+    if stat["rejetées"]:
+        st.sidebar.error(f"{stat['rejetées']} écriture(s) rejetée(s) pour conflit (voir data/.write_behind/rejected)")
+
+# Noms longs (onglets Google Sheets) -> clés internes ("interactions" -> "inter")
+TABLE_KEY = {v: k for k, v in SHEET_NAME.items()}
+
+def atomic_append_row(name: str, cols: List[str], row: dict, user_email: str = "system",
+                      ws_func=None, paths: Dict[str, Path] = None) -> dict:
+    """Horodate (colonnes d'audit) puis ajoute une ligne à la table `name` (clé ou nom d'onglet)."""
+    key = TABLE_KEY.get(name, name)
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    out = {c: "" for c in (cols or [])}
+    out.update({k: ("" if v is None else v) for k, v in row.items()})
+    out.setdefault("Created_At", now); out.setdefault("Created_By", user_email)
+    out["Updated_At"] = now; out["Updated_By"] = user_email
+    backend_eff = st.session_state.get("BACKEND_EFFECTIVE", st.secrets.get("storage_backend","csv")).strip().lower()
+    ws = (ws_func or _ws_func()) if backend_eff == "gsheets" else None
+    append_rows_target(key, pd.DataFrame([out]), paths or _paths(), ws)
+    return out
+
 # ==== Helpers divers ====
 def generate_id(prefix: str, series_like) -> str:
     try:
@@ -159,7 +414,8 @@ def _sum_numeric(df: pd.DataFrame, cols: List[str]) -> Dict[str, float]:
     out = {}
     for c in cols:
         if c in df.columns:
-            out[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).sum()
+            col = df[c] if pd.api.types.is_numeric_dtype(df[c]) else pd.to_numeric(df[c], errors="coerce")
+            out[c] = col.fillna(0).sum()
     return out
 
 def statusbar(df: pd.DataFrame, numeric_keys: List[str] = None, key: str = "statusbar"):
@@ -208,7 +464,7 @@ def filter_and_paginate(df: pd.DataFrame,
         if global_q:
             mask = pd.Series(False, index=df.index)
             for c in df.columns:
-                if df[c].dtype == object:
+                if df[c].dtype == object or isinstance(df[c].dtype, pd.CategoricalDtype):
                     mask = mask | df[c].astype(str).str.contains(global_q, case=False, na=False)
             df = df[mask]
 
@@ -278,6 +534,69 @@ def export_filtered_excel(dfs: Dict[str, pd.DataFrame], filename_prefix: str = "
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+# ==== Archive compressée (toutes tables) ====
+# Un CSV par table + manifest.json (lignes, colonnes, ETag) dans un tar compressé en flux (gzip, ou zstd si
+# le paquet zstandard est installé). Beaucoup plus léger que le classeur Excel à stocker et à transférer.
+BUNDLE_FORMATS = {"gzip": ("tar.gz", "application/gzip"), "zstd": ("tar.zst", "application/zstd")}
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def bundle_codecs() -> List[str]:
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+def _tar_add(tar: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(datetime.now().timestamp())
+    tar.addfile(info, io.BytesIO(data))
+
+def build_bundle(dfs: Dict[str, pd.DataFrame], codec: str = "gzip") -> bytes:
+    """Archive compressée de `dfs` (voir read_bundle pour la relire)."""
+    buf = io.BytesIO()
+    if codec == "zstd" and zstandard is not None:
+        sink = zstandard.ZstdCompressor(level=10).stream_writer(buf, closefd=False)
+        mode = "w|"
+    else:
+        sink, mode = buf, "w|gz"
+    manifest = {"format": "iiba-bundle/1", "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "tables": {}}
+    with tarfile.open(fileobj=sink, mode=mode) as tar:
+        for name, df in dfs.items():
+            df = df.fillna("").astype(str)
+            _tar_add(tar, f"{name}.csv", df.to_csv(index=False).encode("utf-8"))
+            manifest["tables"][name] = {"rows": len(df), "columns": list(map(str, df.columns)),
+                                        "etag": compute_etag(df, name)}
+        _tar_add(tar, "manifest.json", json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+    if sink is not buf:
+        sink.close()
+    return buf.getvalue()
+
+def read_bundle(data: bytes) -> Tuple[Dict[str, pd.DataFrame], dict]:
+    """(tables, manifeste) d'une archive build_bundle ; décompression en flux (gzip ou zstd détecté).
+       Lève ValueError si une table ne correspond pas au manifeste (archive tronquée ou modifiée)."""
+    src = io.BytesIO(data)
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("archive zstd : paquet zstandard non installé")
+        src, mode = zstandard.ZstdDecompressor().stream_reader(src), "r|"
+    else:
+        mode = "r|gz"
+    tables, manifest = {}, {}
+    with tarfile.open(fileobj=src, mode=mode) as tar:
+        for member in tar:
+            fh = tar.extractfile(member)
+            if fh is None:
+                continue
+            if member.name == "manifest.json":
+                manifest = json.loads(fh.read().decode("utf-8"))
+            elif member.name.endswith(".csv"):
+                # membre lu d'un flux non repositionnable : copié en mémoire pour read_csv
+                tables[member.name[:-4]] = pd.read_csv(io.BytesIO(fh.read()), dtype=str, keep_default_na=False)
+    if not manifest:
+        raise ValueError("manifest.json absent : archive incomplète")
+    for name, info in manifest.get("tables", {}).items():
+        if name not in tables or compute_etag(tables[name], name) != info.get("etag"):
+            raise ValueError(f"table « {name} » absente ou altérée dans l'archive")
+    return tables, manifest
+
 # === _shared.py : Filtres globaux inter-pages =================================
 
 
@@ -5,7 +5,7 @@ from datetime import datetime
 import hashlib
 import pandas as pd
 import streamlit as st
-from _shared import load_all_tables, render_global_filter_panel
+from _shared import cached_on, load_all_tables, render_global_filter_panel, render_write_status
 
 from storage_backend import (
     AUDIT_COLS, SHEET_NAME,
@@ -14,6 +14,14 @@ from storage_backend import (
 from gs_client import (
     read_service_account_secret, get_gspread_client, make_ws_func, show_diagnostics_sidebar
 )
+from dataset_store import enable_copy_on_write
+
+# Copy-on-Write pandas pour tout le process : les sessions lisent le même jeu de données partagé
+# (dataset_store) en vues sans copie, et une page qui modifie sa vue la copie à ce moment-là au lieu
+# d'altérer les données des autres sessions. Activé ici explicitement car l'option change la sémantique
+# pandas pour tout le code du process (une écriture en chaîne df[c][i] = … n'a plus d'effet).
+# Sans elle, dataset_store.view renvoie des copies.
+enable_copy_on_write()
 
 st.set_page_config(page_title="IIBA Cameroun — CRM", page_icon="📊", layout="wide")
 
@@ -70,6 +78,14 @@ if BACKEND_DECLARED == "gsheets":
         BACKEND_EFFECTIVE = "csv"
         st.session_state["BACKEND_EFFECTIVE"] = BACKEND_EFFECTIVE
         st.session_state["WS_FUNC"] = None
+elif BACKEND_DECLARED == "parquet":
+    BACKEND_EFFECTIVE = "parquet"
+    st.session_state["BACKEND_EFFECTIVE"] = BACKEND_EFFECTIVE
+    st.sidebar.info("Backend : Parquet (./data, colonnes typées)")
+elif BACKEND_DECLARED == "sqlite":
+    BACKEND_EFFECTIVE = "sqlite"
+    st.session_state["BACKEND_EFFECTIVE"] = BACKEND_EFFECTIVE
+    st.sidebar.info("Backend : SQLite (./data/iiba_crm.sqlite)")
 else:
     BACKEND_EFFECTIVE = "csv"
     st.session_state["BACKEND_EFFECTIVE"] = BACKEND_EFFECTIVE
@@ -123,7 +139,7 @@ def authenticate_user(email: str, password: str, df_users: pd.DataFrame):
     return row.to_dict()
 
 # ---------- Chargement et seed Users ----------
-@st.cache_data(show_spinner=False)
+@cached_on("users")  # invalidé par toute écriture sur users (page Admin, fichier modifié), pas par les autres tables
 def load_users(paths):
     ws_func = None
     if st.session_state.get("BACKEND_EFFECTIVE") == "gsheets":
@@ -186,6 +202,7 @@ if "auth_user" in st.session_state:
         render_global_filter_panel(dfs_for_filters)  # met à jour st.session_state["GLOBAL_FILTERS"]
     except Exception as e:
         st.sidebar.warning(f"Filtre global indisponible : {e}")
+    render_write_status()  # reprend aussi le journal d'écritures différées laissé par un arrêt
 else:
     st.info("Veuillez vous connecter pour accéder au CRM.")
 
@@ -251,6 +251,12 @@ try:
 except Exception:
     alt = None
 
+# Versions des tables (points de restauration avant import / réinitialisation)
+try:
+    import versions
+except Exception:
+    versions = None
+
 import openpyxl
 
 st.set_page_config(page_title="IIBA Cameroun — CRM", page_icon="📊", layout="wide")
@@ -444,6 +450,20 @@ def ensure_df(path:Path, cols:list)->pd.DataFrame:
 def save_df(df:pd.DataFrame, path:Path):
     df.to_csv(path, index=False, encoding="utf-8")
 
+VERSIONS_DIR = DATA_DIR / ".versions"
+
+def snapshot_df(name:str, df:pd.DataFrame, reason:str):
+    """Enregistre l'état d'une table comme version (delta par clé = 1re colonne, voir versions.py)."""
+    if versions is None:
+        return None
+    user = (st.session_state.get("user") or {}).get("UserID", "system")
+    v = versions.record(name, df, df.columns[0] if len(df.columns) else None, user, reason, VERSIONS_DIR)
+    versions.compact(name, root=VERSIONS_DIR)
+    return v
+
+def read_table_file(path:Path)->pd.DataFrame:
+    return pd.read_csv(path, dtype=str, keep_default_na=False) if path.exists() else pd.DataFrame()
+
 def parse_date(s:str):
     if not s or str(s).strip()=="" or str(s).lower()=="nan":
         return None
@@ -2868,7 +2888,9 @@ elif page == "Admin":
             if csv_type == "parametres":
                 # Cas spécial pour les paramètres
                 if "key" in df_uploaded.columns and "value" in df_uploaded.columns:
+                    snapshot_df("params", read_table_file(PATHS["params"]), "avant import CSV")
                     df_uploaded.to_csv(PATHS["params"], index=False, encoding="utf-8")
+                    snapshot_df("params", df_uploaded, "import CSV")
                     st.success("Fichier paramètres importé avec succès!")
                     st.info("Rechargez la page pour voir les changements.")
                 else:
@@ -2895,8 +2917,10 @@ elif page == "Admin":
                     df_uploaded = df_uploaded[cols]
                     
                     if replace_mode == "Remplacer complètement":
-                        # Remplacer complètement
+                        # Remplacer complètement (état précédent gardé comme version)
+                        snapshot_df(path_key, ensure_df(PATHS[path_key], cols), "avant import CSV (remplacement)")
                         save_df(df_uploaded, PATHS[path_key])
+                        snapshot_df(path_key, df_uploaded, "import CSV (remplacement)")
                         global_var = f"df_{path_key}"
                         globals()[global_var] = df_uploaded
                         st.success(f"Données {csv_type} remplacées complètement! ({len(df_uploaded)} lignes)")
@@ -2954,8 +2978,12 @@ elif page == "Admin":
         st.subheader("🗑️ Réinitialisation")
         if st.button("⚠️ RESET COMPLET (tous les fichiers)", type="secondary"):
             try:
-                for path in PATHS.values():
+                for key_name, path in PATHS.items():
                     if path.exists():
+                        if path.suffix == ".csv":
+                            df_old = read_table_file(path)
+                            snapshot_df(key_name, df_old, "avant réinitialisation complète")
+                            snapshot_df(key_name, df_old.iloc[0:0], "réinitialisation complète")
                         path.unlink()
                 st.success("✅ Tous les fichiers supprimés! Rechargez la page.")
             except Exception as e:
@@ -2979,6 +3007,34 @@ elif page == "Admin":
         for name, count in file_counts.items():
             st.write(f"• {name}: {count} lignes")
 
+    # VERSIONS (retour à un état antérieur après import / réinitialisation)
+    st.subheader("🕓 Versions des tables")
+    if versions is None:
+        st.info("Module versions indisponible.")
+    else:
+        v_table = st.selectbox("Table", [k for k, p in PATHS.items() if p.suffix == ".csv"], key="versions_table")
+        v_hist = versions.history(v_table, VERSIONS_DIR)
+        if not v_hist:
+            st.caption("Aucune version enregistrée pour cette table.")
+        else:
+            v_labels = {r["v"]: f"v{r['v']} — {datetime.fromtimestamp(r['ts']).strftime('%Y-%m-%d %H:%M')} — "
+                                f"{r['reason']} ({r['rows']} lignes)" for r in v_hist}
+            v_list = list(v_labels)[::-1]
+            v_sel = st.selectbox("Version", v_list, format_func=v_labels.get, key="versions_sel")
+            v_cmp = st.selectbox("Comparer avec", v_list, index=min(1, len(v_list) - 1),
+                                 format_func=v_labels.get, key="versions_cmp")
+            df_at = versions.state(v_table, v_sel, VERSIONS_DIR)
+            if v_cmp != v_sel and len(df_at.columns):
+                changes = versions.diff(v_table, v_cmp, v_sel, df_at.columns[0], VERSIONS_DIR)
+                st.write(" · ".join(f"{len(part)} {label}" for label, part in changes.items()))
+                if len(changes["modifiées"]):
+                    st.dataframe(changes["modifiées"], use_container_width=True, hide_index=True)
+            if st.button(f"↩️ Restaurer {v_table} à la version {v_sel}"):
+                snapshot_df(v_table, read_table_file(PATHS[v_table]), f"avant restauration de la version {v_sel}")
+                save_df(df_at, PATHS[v_table])
+                snapshot_df(v_table, df_at, f"restauration de la version {v_sel}")
+                st.success(f"✅ {v_table} restaurée ({len(df_at)} lignes). Rechargez la page.")
+
     # GESTION DES UTILISATEURS (simplifié)
     st.markdown("---")
     st.header("👤 Gestion des utilisateurs")
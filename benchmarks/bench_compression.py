@@ -0,0 +1,66 @@
+# benchmarks/bench_compression.py — CSV en clair vs gzip / zstd : taille, écriture, débit de lecture,
+# et archive d'export (Admin) vs classeur Excel
+# Usage : python benchmarks/bench_compression.py [lignes] [répétitions]
+from __future__ import annotations
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import _shared  # noqa: E402
+import schema  # noqa: E402
+import storage_backend as sb  # noqa: E402
+
+TABLES = ["contacts", "inter", "pay"]
+
+def sample(name: str, rows: int) -> pd.DataFrame:
+    key = sb.ROW_KEYS[name]
+    return pd.DataFrame({c: [f"{key[:3].upper()}{i:06d}" if c == key else f"{c}-{i % 97}" for i in range(rows)]
+                         for c in schema.columns(name)})
+
+def best(fn, repeat: int) -> float:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return min(out)
+
+def run(rows: int, repeat: int) -> None:
+    data_dir = Path(tempfile.mkdtemp())
+    dfs = {name: sample(name, rows) for name in TABLES}
+    codecs = [None, "gzip"] + (["zstd"] if sb.HAS_ZSTD else [])
+    print(f"{len(TABLES)} tables × {rows} lignes (meilleur de {repeat})")
+    print(f"{'format':<10} {'octets':>12} {'ratio':>7} {'écriture s':>11} {'lecture s':>10} {'Mo CSV/s':>9}")
+    plain_size = None
+    for codec in codecs:
+        suffix = ".csv" + (sb.COMPRESSED_SUFFIXES[codec] if codec else "")
+        paths = {name: data_dir / f"{name}{suffix}" for name in TABLES}
+        write = best(lambda: [sb.write_csv_atomic(paths[n], dfs[n]) for n in TABLES], repeat)
+        read = best(lambda: [sb._read_table_file(paths[n]) for n in TABLES], repeat)
+        size = sum(p.stat().st_size for p in paths.values())
+        plain_size = plain_size or size
+        print(f"{codec or 'clair':<10} {size:>12} {plain_size / size:>6.1f}x {write:>11.3f} {read:>10.3f} "
+              f"{plain_size / read / 1e6:>9.1f}")
+    print()
+    excel = io.BytesIO()
+    t0 = time.perf_counter()
+    with pd.ExcelWriter(excel, engine="openpyxl") as writer:
+        for name, df in dfs.items():
+            df.to_excel(writer, sheet_name=name[:31], index=False)
+    print(f"{'export Excel':<16} {len(excel.getvalue()):>12} octets {time.perf_counter() - t0:>8.3f} s")
+    for codec in _shared.bundle_codecs():
+        t0 = time.perf_counter()
+        data = _shared.build_bundle(dfs, codec)
+        built = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        _shared.read_bundle(data)
+        print(f"{'archive ' + codec:<16} {len(data):>12} octets {built:>8.3f} s   relecture {time.perf_counter() - t0:.3f} s")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 50000, int(args[1]) if len(args) > 1 else 3)
@@ -0,0 +1,68 @@
+# benchmarks/bench_etag.py — ETag historique (tri + to_csv + sha256) vs hachage de lignes vectorisé
+# Usage : python benchmarks/bench_etag.py [10000 100000 1000000]
+from __future__ import annotations
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from storage_backend import compute_etag, etag_add_rows  # noqa: E402
+
+def legacy_compute_etag(df: pd.DataFrame, name: str) -> str:
+    """Copie de l'implémentation d'origine (référence)."""
+    if df is None or df.empty:
+        return "empty"
+    cols = [c for c in df.columns if c.lower() in {"id","updated_at","id_événement","user_id"}]
+    if cols:
+        payload = df[cols].astype(str).fillna("").sort_values(by=cols).to_csv(index=False)
+    else:
+        payload = df.astype(str).fillna("").to_csv(index=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def make_table(n: int, name: str) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    ids = [f"CNT{i:07d}" for i in rng.integers(1, max(n // 3, 2), n)]
+    df = pd.DataFrame({
+        "ID_Interaction": [f"INT{i:07d}" for i in range(n)],
+        "ID": ids,
+        "Canal": rng.choice(["Appel","Email","WhatsApp","LinkedIn"], n),
+        "Objet": rng.choice(["Relance adhésion","Inscription atelier","Suivi certification"], n),
+        "Date": pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D"),
+        "Responsable": rng.choice(["Admin","Equipe","IIBA Cameroun"], n),
+        "Created_At": "2025-01-01 00:00:00", "Created_By": "seed",
+        "Updated_At": "2025-01-01 00:00:00", "Updated_By": "seed",
+    }).astype(str)
+    if name == "pay":  # pas de colonne 'id'/'updated_at' -> l'ancien ETag hachait toute la table
+        df = df.drop(columns=["ID","Updated_At"])
+    return df
+
+def timeit(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main(sizes):
+    # Ajout d'une ligne : l'ETag historique n'est pas incrémental, il faut rehacher toute la table
+    print(f"{'table':<6} {'lignes':>9} {'historique (s)':>15} {'row-hash (s)':>13} {'gain':>6} "
+          f"{'ajout historique (ms)':>22} {'ajout row-hash (ms)':>20}")
+    for n in sizes:
+        for name in ("inter", "pay"):
+            df = make_table(n, name)
+            t_old = timeit(lambda: legacy_compute_etag(df, name))
+            t_new = timeit(lambda: compute_etag(df, name))
+            base = compute_etag(df, name)
+            row = df.tail(1)
+            t_inc = timeit(lambda: etag_add_rows(base, row), repeat=20)
+            print(f"{name:<6} {n:>9} {t_old:>15.3f} {t_new:>13.3f} {t_old/max(t_new,1e-9):>5.1f}x "
+                  f"{t_old*1000:>22.1f} {t_inc*1000:>20.3f}")
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    main(sizes)
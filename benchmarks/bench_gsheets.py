@@ -0,0 +1,62 @@
+# benchmarks/bench_gsheets.py — chemin Google Sheets hors ligne (gs_fake) : chargement et sauvegarde
+# Usage : python benchmarks/bench_gsheets.py [lignes_par_onglet] [latence_ms]
+from __future__ import annotations
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import storage_backend as sb  # noqa: E402
+from gs_fake import Client, FakeServer, make_fake_ws_func  # noqa: E402
+from gs_scheduler import RequestScheduler, Scheduled  # noqa: E402
+
+TABLES = {"contacts": ["ID", "Nom", "Prénom", "Société", "Email"],
+          "inter": ["ID_Interaction", "ID", "Date", "Canal", "Objet"],
+          "pay": ["ID_Paiement", "ID", "Montant", "Statut"]}
+
+def seed(ss, rows: int) -> None:
+    # Colonnes d'audit comprises : sinon le premier save les ajoute et réécrit tout l'onglet
+    for name, cols in TABLES.items():
+        header = cols + sb.AUDIT_COLS
+        ws = ss.add_worksheet(sb.SHEET_NAME[name], rows=rows + 1, cols=len(header))
+        key = sb.ROW_KEYS[name]
+        audit = ["2025-01-01 00:00:00", "seed", "2025-01-01 00:00:00", "seed"]
+        data = [[f"{key[:3].upper()}{i:06d}" if c == key else f"{c}-{i % 97}" for c in cols] + audit
+                for i in range(rows)]
+        ws.update("A1", [header] + data)
+
+def run(rows: int, latency_ms: float) -> None:
+    server = FakeServer(latency_s=latency_ms / 1000)
+    ss = Client(server).create("IIBA CRM DB")
+    seed(ss, rows)
+    ws_func = make_fake_ws_func(Scheduled(ss, RequestScheduler(per_min=6000)))
+    paths = {n: Path(tempfile.mkdtemp()) / f"{n}.csv" for n in TABLES}
+    st.session_state["BACKEND_EFFECTIVE"] = "gsheets"
+    st.session_state["WRITE_BEHIND"] = False
+
+    def measure(label, fn):
+        before = server.stats()
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        after = server.stats()
+        print(f"{label:<34} {dt:>8.3f} s {after['requests'] - before['requests']:>6} req "
+              f"{after['cells_read'] - before['cells_read']:>9} cell. lues "
+              f"{after['cells_written'] - before['cells_written']:>7} cell. écrites")
+
+    sb._gs_cache_ttl = lambda: 0  # miroir local désactivé : on mesure le réseau simulé
+    measure("chargement onglet par onglet", lambda: [sb._load_df_now(n, c, paths, ws_func) for n, c in TABLES.items()])
+    measure("chargement groupé (values_batch_get)", lambda: sb.ensure_df_sources(TABLES, paths, ws_func))
+    df = sb.ensure_df_source("inter", TABLES["inter"], paths, ws_func)
+    df.loc[df.index[:5], "Objet"] = "modifié"
+    measure("sauvegarde 5 lignes modifiées", lambda: sb.save_df_target("inter", df, paths, ws_func))
+    new = pd.DataFrame([{"ID_Interaction": "INT999999", "ID": "CNT000001", "Objet": "nouveau"}])
+    measure("ajout 1 ligne", lambda: sb.append_rows_target("inter", new, paths, ws_func))
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 5000, float(args[1]) if len(args) > 1 else 150)
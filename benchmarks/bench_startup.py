@@ -0,0 +1,58 @@
+# benchmarks/bench_startup.py — démarrage à froid : parsing CSV vs instantanés Arrow (memory-map)
+# Usage : python benchmarks/bench_startup.py [lignes_par_table] [répétitions]
+from __future__ import annotations
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import schema  # noqa: E402
+import storage_backend as sb  # noqa: E402
+
+TABLES = ["contacts", "inter", "events", "parts", "pay", "cert", "entreprises", "entreprise_parts"]
+
+def seed(data_dir: Path, rows: int) -> dict:
+    paths = {}
+    for name in TABLES:
+        cols = schema.columns(name)
+        key = sb.ROW_KEYS[name]
+        df = pd.DataFrame({c: [f"{key[:3].upper()}{i:06d}" if c == key else f"{c}-{i % 97}" for i in range(rows)]
+                           for c in cols})
+        paths[name] = data_dir / f"{sb.SHEET_NAME[name]}.csv"
+        df.to_csv(paths[name], index=False, encoding="utf-8")
+    return paths
+
+def cold_load(paths: dict) -> float:
+    """Chargement de toutes les tables, caches process vidés (équivalent d'un redémarrage)."""
+    sb.clear_file_cache()
+    if sb.dataset_store is not None:
+        sb.dataset_store.get_store.clear()
+    t0 = time.perf_counter()
+    for name in TABLES:
+        sb._load_df_now(name, schema.columns(name), paths)
+    return time.perf_counter() - t0
+
+def run(rows: int, repeat: int) -> None:
+    if not sb.HAS_PARQUET:
+        print("pyarrow absent : instantanés indisponibles")
+        return
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    paths = seed(Path(tempfile.mkdtemp()), rows)
+    enabled = sb._snapshots_on
+    sb._snapshots_on = lambda: False
+    parse = min(cold_load(paths) for _ in range(repeat))
+    sb._snapshots_on = enabled
+    first = cold_load(paths)  # parsing + écriture des instantanés
+    snap = min(cold_load(paths) for _ in range(repeat))
+    print(f"{len(TABLES)} tables × {rows} lignes (meilleur de {repeat})")
+    print(f"{'CSV parsé':<36} {parse:>8.3f} s")
+    print(f"{'1er démarrage (parsing + instantané)':<36} {first:>8.3f} s")
+    print(f"{'instantanés Arrow (memory-map)':<36} {snap:>8.3f} s   x{parse / snap:.1f}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if args else 50000, int(args[1]) if len(args) > 1 else 3)
@@ -0,0 +1,231 @@
+# changefeed.py — flux des modifications (CDC) : une ligne par insert/update/delete, journal local en ajout seul
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+CHANGES_DIR = Path("data/.changes")
+SEGMENT_MAX_BYTES = 16 << 20   # au-delà, nouveau segment changes-<premier seq>.log
+RETENTION_SEGMENTS = 8         # segments conservés ; un abonné plus en retard doit tout relire (gap)
+
+# Événement : {"seq", "ts", "table", "op": "insert"|"update"|"delete"|"reload", "key", "before", "after",
+#              "user", "etag"}. before/after : ligne complète (None pour un insert / un delete) ;
+#              "reload" : table réécrite sans clé exploitable, les vues dérivées doivent la relire.
+
+# Abonnés du process (notifiés après chaque publication) ; survit à importlib.reload
+_LISTENERS: List[tuple] = globals().get("_LISTENERS", [])
+_LOCK = globals().get("_LOCK", threading.Lock())
+
+def _segments(log_dir: Path) -> List[Path]:
+    return sorted(log_dir.glob("changes-*.log")) if log_dir.exists() else []
+
+def _first_seq(segment: Path) -> int:
+    return int(segment.stem.split("-", 1)[1])
+
+def _read_segment(segment: Path) -> List[dict]:
+    out = []
+    try:
+        fh = open(segment, "rb")
+    except OSError:
+        return out
+    with fh:
+        for line in fh:
+            if not line.endswith(b"\n"):
+                break  # événement en cours d'écriture
+            try:
+                out.append(json.loads(line))
+            except Exception:
+                break
+    return out
+
+def _tail(segment: Path, window: int = 1 << 16) -> tuple:
+    """(dernier événement complet ou None, taille valide du segment) : lecture de la fin du fichier seulement."""
+    try:
+        with open(segment, "rb") as fh:
+            size = fh.seek(0, os.SEEK_END)
+            while True:
+                start = max(0, size - window)
+                fh.seek(start)
+                data = fh.read()
+                end = data.rfind(b"\n") + 1  # après le dernier saut de ligne : événement interrompu
+                if (end and data[:end].count(b"\n") > 1) or start == 0:
+                    break
+                window *= 2  # événement plus long que la fenêtre
+    except OSError:
+        return None, 0
+    lines = data[:end].splitlines()
+    try:
+        return (json.loads(lines[-1]) if lines else None), start + end
+    except Exception:
+        return None, start + end
+
+def last_seq(log_dir: Path = CHANGES_DIR) -> int:
+    segs = _segments(log_dir)
+    if not segs:
+        return 0
+    event, _ = _tail(segs[-1])
+    return event["seq"] if event else _first_seq(segs[-1]) - 1
+
+# ---------- Publication ----------
+def row_events(table: str, op: str, rows: Optional[pd.DataFrame], key: Optional[str], user: str,
+               before: Optional[pd.DataFrame] = None) -> List[dict]:
+    """Événements d'une opération sur des lignes (`rows` = après, `before` = avant, alignées par position).
+       Auteur : Created_By (insert) / Updated_By de la ligne, sinon l'utilisateur de la session."""
+    after = rows.fillna("").astype(str).to_dict("records") if rows is not None else None
+    prev = before.fillna("").astype(str).to_dict("records") if before is not None else None
+    n = len(after if after is not None else prev or [])
+    out = []
+    for i in range(n):
+        a = after[i] if after is not None else None
+        b = prev[i] if prev is not None else None
+        row = a or b or {}
+        by = (row.get("Created_By") if op == "insert" else None) or (a or {}).get("Updated_By") or user
+        out.append({"table": table, "op": op, "key": row.get(key) if key else None,
+                    "before": b, "after": a, "user": by})
+    return out
+
+def publish(events: List[dict], etag: Optional[str] = None, log_dir: Path = CHANGES_DIR, lock=None) -> int:
+    """Ajoute les événements au journal (numérotés, horodatés, fsync) puis notifie les abonnés du process.
+       `lock` : verrou inter-process du journal (contexte) ; renvoie le dernier numéro attribué."""
+    if not events:
+        return last_seq(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    with _LOCK, (lock if lock is not None else nullcontext()):
+        seq = last_seq(log_dir)
+        segs = _segments(log_dir)
+        seg = segs[-1] if segs else None
+        valid = _tail(seg)[1] if seg is not None else 0
+        if seg is None or valid >= SEGMENT_MAX_BYTES:
+            seg = log_dir / f"changes-{seq + 1:012d}.log"
+            valid = 0
+            for old in segs[:max(0, len(segs) + 1 - RETENTION_SEGMENTS)]:
+                old.unlink(missing_ok=True)
+        now = time.time()
+        stamped = []
+        for e in events:
+            seq += 1
+            stamped.append({"seq": seq, "ts": now, **e, "etag": etag})
+        payload = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in stamped)
+        with open(seg, "ab") as fh:
+            if fh.tell() > valid:
+                fh.truncate(valid)  # reste d'une publication interrompue
+            fh.write(payload.encode("utf-8"))
+            fh.flush()
+            os.fsync(fh.fileno())
+    _notify(stamped)
+    return seq
+
+# ---------- Abonnements ----------
+def subscribe(callback: Callable[[List[dict]], None], tables: Optional[Iterable[str]] = None) -> Callable[[], None]:
+    """Abonné du process : callback(événements) après chaque publication faite par ce process (les écritures
+       des autres process se lisent avec Subscription.poll). Renvoie la fonction de désabonnement."""
+    entry = (callback, set(tables) if tables else None)
+    with _LOCK:
+        _LISTENERS.append(entry)
+
+    def unsubscribe():
+        with _LOCK:
+            if entry in _LISTENERS:
+                _LISTENERS.remove(entry)
+    return unsubscribe
+
+def _notify(events: List[dict]) -> None:
+    with _LOCK:
+        listeners = list(_LISTENERS)
+    for callback, tables in listeners:
+        mine = [e for e in events if tables is None or e["table"] in tables]
+        if mine:
+            try:
+                callback(mine)
+            except Exception:
+                pass  # un abonné en erreur ne bloque ni l'écriture ni les autres abonnés
+
+def read_since(seq: int, tables: Optional[Iterable[str]] = None, log_dir: Path = CHANGES_DIR,
+               limit: Optional[int] = None) -> List[dict]:
+    """Événements de numéro > seq (tous process), dans l'ordre."""
+    tables = set(tables) if tables else None
+    segs = _segments(log_dir)
+    start = max([i for i, s in enumerate(segs) if _first_seq(s) <= seq + 1] or [0])
+    out = []
+    for seg in segs[start:]:
+        for e in _read_segment(seg):
+            if e["seq"] > seq and (tables is None or e["table"] in tables):
+                out.append(e)
+                if limit and len(out) >= limit:
+                    return out
+    return out
+
+class Subscription:
+    """Abonné par relecture du journal (tous process). `name` : curseur durable (log_dir/cursors/<name>),
+       repris au redémarrage après commit(). gap=True : des événements ont été purgés avant d'être lus,
+       la vue dérivée doit être reconstruite depuis les tables."""
+    def __init__(self, tables: Optional[Iterable[str]] = None, since: Optional[int] = None,
+                 name: Optional[str] = None, log_dir: Path = CHANGES_DIR):
+        self.tables = set(tables) if tables else None
+        self.log_dir = Path(log_dir)
+        self.name = name
+        self.gap = False
+        if since is None and name:
+            try:
+                since = int(self._cursor_path().read_text(encoding="utf-8"))
+            except Exception:
+                since = None
+        self.seq = last_seq(self.log_dir) if since is None else int(since)
+
+    def _cursor_path(self) -> Path:
+        return self.log_dir / "cursors" / self.name
+
+    def poll(self, limit: Optional[int] = None) -> List[dict]:
+        segs = _segments(self.log_dir)
+        if segs and _first_seq(segs[0]) > self.seq + 1:
+            self.gap = True
+        events = read_since(self.seq, None, self.log_dir, limit)
+        if events:
+            self.seq = events[-1]["seq"]
+        return [e for e in events if self.tables is None or e["table"] in self.tables]
+
+    def commit(self) -> None:
+        if self.name:
+            path = self._cursor_path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(str(self.seq), encoding="utf-8")
+            os.replace(tmp, path)
+
+# ---------- Vues dérivées ----------
+def apply_events(df: pd.DataFrame, events: List[dict], key: str) -> Optional[pd.DataFrame]:
+    """Met à jour une copie de table avec les événements (insert/update : ligne écrite, delete : retirée).
+       None si un événement 'reload' impose de relire la table."""
+    rows: Dict[str, Optional[dict]] = {}
+    for e in events:
+        if e["op"] == "reload":
+            return None
+        rows[str(e["key"])] = e["after"] if e["op"] != "delete" else None
+    if not rows:
+        return df
+    out = df.set_index(df[key].astype(str), drop=False)
+    out = out.drop(index=[k for k, r in rows.items() if r is None and k in out.index])
+    upserts = [r for r in rows.values() if r is not None]
+    if not upserts:
+        return out.reset_index(drop=True)
+    new = pd.DataFrame(upserts).reindex(columns=out.columns, fill_value="").fillna("")
+    new.index = new[key].astype(str)
+    present = new.index.isin(out.index)
+    if present.any():
+        out.loc[new.index[present]] = new[present].values
+    return pd.concat([out, new[~present]]).reset_index(drop=True)
+
+def status(log_dir: Path = CHANGES_DIR) -> dict:
+    segs = _segments(log_dir)
+    cursors = log_dir / "cursors"
+    return {"dernier_seq": last_seq(log_dir), "segments": len(segs),
+            "octets": sum(s.stat().st_size for s in segs),
+            "abonnés_process": len(_LISTENERS),
+            "curseurs": {p.name: p.read_text(encoding="utf-8") for p in cursors.glob("*") if not p.name.endswith(".tmp")}
+                        if cursors.exists() else {}}
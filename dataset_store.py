@@ -0,0 +1,183 @@
+# dataset_store.py — jeu de données partagé par toutes les sessions : une version en lecture seule par table
+from __future__ import annotations
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import pandas as pd
+import streamlit as st
+
+def share_views() -> bool:
+    """Vues sans copie seulement sous Copy-on-Write : une vue modifiée par une page est alors copiée
+       à ce moment-là, le jeu partagé n'est jamais touché. Sinon (option non activée) : copies."""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True  # comportement par défaut
+    try:
+        return pd.get_option("mode.copy_on_write") is True
+    except Exception:
+        return False
+
+def enable_copy_on_write() -> bool:
+    """Active le Copy-on-Write pandas pour tout le process — à appeler au démarrage de l'application
+       (app.py), jamais à l'import. pandas < 2 : option absente, les vues restent des copies."""
+    if share_views():
+        return True
+    try:
+        pd.set_option("mode.copy_on_write", True)
+    except Exception:
+        return False
+    return True
+
+DERIVED_MAX_ENTRIES = 128
+
+class DerivedCache:
+    """Résultats de calculs dérivés (agrégats…) indexés par les versions des tables dont ils dépendent.
+       Une écriture sur une table ne retire que les résultats qui en dépendent ; LRU au-delà de max_entries."""
+    def __init__(self, max_entries: int = DERIVED_MAX_ENTRIES):
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # clé -> (valeur, tables)
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, fname: str, what: str, n: int = 1) -> None:
+        per = self.stats.setdefault(fname, {"hits": 0, "misses": 0, "invalidations": 0})
+        per[what] += n
+
+    def get(self, fname: str, key: tuple):
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is None:
+                self._count(fname, "misses")
+                return None
+            self.entries.move_to_end(key)
+            self._count(fname, "hits")
+            return hit
+
+    def put(self, key: tuple, value, tables: tuple) -> None:
+        with self.lock:
+            self.entries[key] = (value, tables)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, table: str) -> int:
+        with self.lock:
+            gone = [k for k, (_, tables) in self.entries.items() if table in tables]
+            for k in gone:
+                del self.entries[k]
+                self._count(k[0], "invalidations")
+            return len(gone)
+
+    def status(self) -> dict:
+        with self.lock:
+            return {"entrées": len(self.entries), "fonctions": {f: dict(v) for f, v in self.stats.items()}}
+
+class DatasetStore:
+    """Une entrée par (table, source) : DataFrame figé + version + état de session associé (ETag,
+       base de fusion…). `version` est un compteur process, croissant à chaque publication/invalidation ;
+       data_version(table) ne change qu'aux écritures (un contenu rechargé change l'ETag)."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.entries: Dict[tuple, dict] = {}
+        self.table_versions: Dict[str, int] = {}
+        self.stats = {"hits": 0, "misses": 0, "publications": 0, "invalidations": 0}
+        self.derived = DerivedCache()
+
+    def get(self, name: str, source: str, token) -> Optional[dict]:
+        """Entrée publiée si la source n'a pas bougé depuis (même jeton), sinon None."""
+        with self.lock:
+            entry = self.entries.get((name, source))
+            if entry is not None and token is not None and entry["token"] == token:
+                self.stats["hits"] += 1
+                return entry
+            self.stats["misses"] += 1
+            return None
+
+    def publish(self, name: str, source: str, token, df: pd.DataFrame, state: dict) -> dict:
+        with self.lock:
+            self.version += 1
+            entry = {"version": self.version, "token": token, "df": df, "state": dict(state),
+                     "rows": len(df), "published_at": time.time()}
+            self.entries[(name, source)] = entry
+            self.stats["publications"] += 1
+            return entry
+
+    def invalidate(self, name: str) -> int:
+        """Écriture sur `name` : seules les entrées de cette table sont retirées ; renvoie la nouvelle version."""
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == name]:
+                del self.entries[key]
+            self.version += 1
+            self.table_versions[name] = self.version
+            self.stats["invalidations"] += 1
+            version = self.version
+        self.derived.invalidate(name)  # calculs qui lisent cette table, et eux seuls
+        return version
+
+    def data_version(self, name: str) -> int:
+        with self.lock:
+            return self.table_versions.get(name, 0)
+
+    def status(self) -> dict:
+        with self.lock:
+            tables = [{"table": n, "source": s[0] if isinstance(s, tuple) else s, "version": e["version"],
+                       "lignes": e["rows"]} for (n, s), e in self.entries.items()]
+            out = {"version": self.version, "vues_partagées": share_views(), **self.stats, "tables": tables}
+        out["calculs_dérivés"] = self.derived.status()
+        return out
+
+@st.cache_resource(show_spinner=False)
+def get_store() -> DatasetStore:
+    """Instance unique par process (toutes sessions confondues)."""
+    return DatasetStore()
+
+def view(df: pd.DataFrame) -> pd.DataFrame:
+    """Vue de session sur un DataFrame partagé : sans copie avec Copy-on-Write, copie sinon."""
+    return df.copy(deep=not share_views())
+
+# ---------- Calculs dérivés ----------
+def _table_token(name: str) -> Optional[tuple]:
+    """(jeton de la source stockée, version process) : change dès que le fichier (même modifié hors de
+       l'application) ou la version de la table change. Indépendant de la session ; None : pas de partage."""
+    from storage_backend import table_source_token
+    token = table_source_token(name)
+    return None if token is None else (token, get_store().data_version(name))
+
+def cached_on(*tables: str):
+    """Mémoïse une fonction dont le résultat ne dépend que de `tables` et de ses arguments (valeurs simples).
+       Partagé entre sessions ; une écriture sur l'une des tables invalide le résultat, pas les autres caches.
+       Le résultat est rendu en vue (ne pas le modifier en place sans Copy-on-Write)."""
+    def deco(fn):
+        fname = f"{os.path.basename(fn.__code__.co_filename)}:{fn.__qualname__}"  # pages : même __module__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            store = get_store()
+            tokens = tuple(_table_token(t) for t in tables)
+            if None in tokens:
+                value = fn(*args, **kwargs)  # source pas encore lue ou non vérifiable : calcul non partagé
+                return view(value) if isinstance(value, pd.DataFrame) else value
+            key = (fname, tokens, repr(args), repr(sorted(kwargs.items())))
+            hit = store.derived.get(fname, key)
+            if hit is None:
+                value = fn(*args, **kwargs)
+                store.derived.put(key, value, tables)
+            else:
+                value = hit[0]
+                from storage_backend import sync_session_state
+                for t in tables:
+                    sync_session_state(t)  # ETag / base de la session, comme si fn avait lu les tables
+            return view(value) if isinstance(value, pd.DataFrame) else value
+        wrapper.tables = tables
+        return wrapper
+    return deco
+
+def invalidate_tables(*names: str) -> None:
+    """Invalidation explicite (ex. après une modification hors storage_backend)."""
+    store = get_store()
+    for name in names:
+        store.invalidate(name)
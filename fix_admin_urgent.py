@@ -1,9 +1,27 @@
 # Script pour créer un nouvel utilisateur admin avec mot de passe "123456"
 import pandas as pd
 import bcrypt
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 from datetime import datetime
 
+# Verrou et écriture atomique partagés avec l'application (l'app peut tourner en même temps)
+try:
+    from storage_backend import checkpoint_table, table_lock, write_csv_atomic
+except Exception:
+    checkpoint_table = lambda name, paths=None: False
+    table_lock = lambda path: nullcontext()
+    write_csv_atomic = lambda path, df: df.to_csv(path, index=False, encoding="utf-8")
+
+USERS_CSV = Path("./data/users.csv")
+
+@contextmanager
+def users_locked():
+    """Verrou de users.csv ; écritures journalisées par l'application reportées dans le CSV avant lecture."""
+    with table_lock(USERS_CSV):
+        checkpoint_table("users", {"users": USERS_CSV})
+        yield
+
 def create_new_admin():
     """
     Crée un nouvel utilisateur admin avec mot de passe "123456"
@@ -66,7 +84,7 @@ def create_new_admin():
             df_users = pd.DataFrame([new_admin])
         
         # Sauvegarder
-        df_users.to_csv(USERS_PATH, index=False, encoding="utf-8")
+        write_csv_atomic(USERS_PATH, df_users)
         
         print("\n" + "="*60)
         print("✅ NOUVEL ADMIN CRÉÉ AVEC SUCCÈS!")
@@ -112,7 +130,7 @@ def reset_admin_password():
             df_users.loc[admin_mask, "must_change_pw"] = "0"
             df_users.loc[admin_mask, "updated_at"] = datetime.now().isoformat(timespec="seconds")
             
-            df_users.to_csv(USERS_PATH, index=False, encoding="utf-8")
+            write_csv_atomic(USERS_PATH, df_users)
             
             print("✅ Mot de passe de admin@iiba.cm réinitialisé!")
             print("Nouveau mot de passe: 123456")
@@ -156,7 +174,7 @@ def reset_all_users():
         }
         
         df_new = pd.DataFrame([admin_data])
-        df_new.to_csv(USERS_PATH, index=False, encoding="utf-8")
+        write_csv_atomic(USERS_PATH, df_new)
         
         print("✅ Fichier users.csv recréé!")
         print("Email: admin@iiba.cm")
@@ -172,15 +190,21 @@ if __name__ == "__main__":
     print("="*50)
     
     print("\n1️⃣ Tentative de création d'un nouvel admin...")
-    if create_new_admin():
+    with users_locked():  # lecture-modification-écriture sans écriture concurrente
+        ok = create_new_admin()
+    if ok:
         print("\n✅ SUCCÈS! Vous pouvez vous connecter avec admin2@iiba.cm / 123456")
     else:
         print("\n2️⃣ Tentative de réinitialisation du mot de passe admin@iiba.cm...")
-        if reset_admin_password():
+        with users_locked():
+            ok = reset_admin_password()
+        if ok:
             print("\n✅ SUCCÈS! Vous pouvez vous connecter avec admin@iiba.cm / 123456")
         else:
             print("\n3️⃣ Réinitialisation complète des utilisateurs...")
-            if reset_all_users():
+            with users_locked():
+                ok = reset_all_users()
+            if ok:
                 print("\n✅ SUCCÈS! Vous pouvez vous connecter avec admin@iiba.cm / 123456")
             else:
                 print("\n❌ ÉCHEC TOTAL - Contactez le support technique")
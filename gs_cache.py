@@ -0,0 +1,112 @@
+# gs_cache.py — miroir local des onglets Google Sheets (lecture rapide / hors ligne) + rafraîchissement en tâche de fond
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+CACHE_DIR = Path("data/.gs_cache")
+DEFAULT_TTL_S = 60     # âge max d'un miroir avant rafraîchissement
+DEFAULT_POLL_S = 15    # fréquence de vérification (TTL + révision du classeur)
+
+# État process (partagé par toutes les sessions ; survit à importlib.reload)
+_REFRESHER: Dict[str, object] = globals().get("_REFRESHER", {})
+_LOCK = globals().get("_LOCK", threading.Lock())
+
+def _paths(tab: str, cache_dir: Path = CACHE_DIR) -> Tuple[Path, Path]:
+    return cache_dir / f"{tab}.csv", cache_dir / f"{tab}.json"
+
+def read_mirror(tab: str, cache_dir: Path = CACHE_DIR) -> Optional[Tuple[pd.DataFrame, dict]]:
+    """(DataFrame texte, méta {fetched_at, revision}) ou None si l'onglet n'a jamais été copié."""
+    csv_path, meta_path = _paths(tab, cache_dir)
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        return _read_csv_frame(csv_path), meta
+    except Exception:
+        return None
+
+def _read_csv_frame(csv_path: Path) -> pd.DataFrame:
+    """Miroir CSV -> DataFrame texte, via l'instantané Arrow de storage_backend s'il est à jour."""
+    try:
+        import storage_backend as sb
+    except Exception:
+        sb = None
+    fp = sb._stat_fingerprint(csv_path) if sb is not None else None
+    snap = sb._snapshot_read(csv_path, fp) if fp is not None else None
+    if snap is not None:
+        return snap[0]
+    df = pd.read_csv(csv_path, dtype=str).fillna("")  # même normalisation que la lecture live
+    if fp is not None:
+        sb._snapshot_write(csv_path, fp, df, None)
+    return df
+
+def write_mirror(tab: str, df: pd.DataFrame, revision: Optional[str] = None, cache_dir: Path = CACHE_DIR) -> None:
+    """Écrit le miroir (fichier temporaire + os.replace : un lecteur ne voit jamais un fichier à moitié écrit)."""
+    csv_path, meta_path = _paths(tab, cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = csv_path.with_suffix(".csv.tmp")
+    df.fillna("").astype(str).to_csv(tmp, index=False, encoding="utf-8")
+    os.replace(tmp, csv_path)
+    meta = {"fetched_at": time.time(), "revision": revision, "rows": int(len(df))}
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+def is_stale(meta: dict, ttl_s: float) -> bool:
+    return time.time() - float(meta.get("fetched_at", 0)) > ttl_s
+
+def spreadsheet_revision(ss) -> Optional[str]:
+    """Horodatage de dernière modification du classeur (API Drive), None si indisponible."""
+    try:
+        getter = getattr(ss, "get_lastUpdateTime", None)
+        return str(getter() if callable(getter) else ss.lastUpdateTime)
+    except Exception:
+        return None
+
+def refresh_now(ss, tabs: List[str], cache_dir: Path = CACHE_DIR, revision: Optional[str] = None) -> None:
+    """Relit tous les onglets en un appel values_batch_get et met à jour les miroirs."""
+    from storage_backend import _values_to_frame
+    resp = ss.values_batch_get([f"'{t}'" for t in tabs])
+    for tab, vr in zip(tabs, resp.get("valueRanges", [])):
+        write_mirror(tab, _values_to_frame(vr.get("values", [])), revision, cache_dir)
+
+def _loop(ss, tabs: List[str], ttl_s: float, poll_s: float, cache_dir: Path, stop: threading.Event) -> None:
+    last_rev = None
+    while not stop.wait(poll_s):
+        try:
+            rev = spreadsheet_revision(ss)
+            metas = [read_mirror(t, cache_dir) for t in tabs]
+            expired = any(m is None or is_stale(m[1], ttl_s) for m in metas)
+            changed = rev is not None and rev != last_rev and any(
+                m is None or m[1].get("revision") != rev for m in metas)
+            if expired or changed:
+                refresh_now(ss, tabs, cache_dir, rev)
+                _REFRESHER["last_refresh"] = time.time()
+            last_rev = rev
+            _REFRESHER["last_error"] = None
+        except Exception as e:  # quota, réseau… : on garde le miroir, nouvel essai au prochain tour
+            _REFRESHER["last_error"] = str(e)
+
+def ensure_refresher(ss, tabs: List[str], ttl_s: float = DEFAULT_TTL_S, poll_s: float = DEFAULT_POLL_S,
+                     cache_dir: Path = CACHE_DIR) -> None:
+    """Démarre (une seule fois par process) le thread de rafraîchissement des miroirs."""
+    with _LOCK:
+        th = _REFRESHER.get("thread")
+        if th is not None and th.is_alive():
+            return
+        stop = threading.Event()
+        th = threading.Thread(target=_loop, args=(ss, list(tabs), ttl_s, min(poll_s, ttl_s), cache_dir, stop),
+                              name="gs-cache-refresher", daemon=True)
+        _REFRESHER.update({"thread": th, "stop": stop, "tabs": list(tabs), "ttl_s": ttl_s})
+        th.start()
+
+def refresher_status() -> dict:
+    th = _REFRESHER.get("thread")
+    return {
+        "actif": bool(th is not None and th.is_alive()),
+        "ttl_s": _REFRESHER.get("ttl_s"),
+        "dernier_rafraîchissement": _REFRESHER.get("last_refresh"),
+        "dernière_erreur": _REFRESHER.get("last_error"),
+    }
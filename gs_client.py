@@ -4,6 +4,8 @@ import json
 from typing import Dict, Optional, Mapping, Any
 import streamlit as st
 
+from gs_scheduler import DEFAULT_PER_MIN, get_scheduler, scheduled
+
 # compat TOML (string) parsing
 try:
     import tomllib  # Python 3.11+
@@ -78,13 +80,16 @@ def make_ws_func(GC, spreadsheet_id: Optional[str] = None, spreadsheet_title: Op
         spreadsheet_title = "IIBA CRM DB"
 
     # Cache le Spreadsheet (évite les requêtes répétées)
+    # Tous les appels (classeur, onglets, gspread_dataframe) passent par l'ordonnanceur : quota + retries
+    sched = get_scheduler(float(st.secrets.get("gs_quota_per_min", DEFAULT_PER_MIN)))
+
     @st.cache_resource(show_spinner=False)
     def _open_spreadsheet():
         if spreadsheet_id:
-            return GC.open_by_key(spreadsheet_id)
-        return GC.open(spreadsheet_title)
+            return sched.call(GC.open_by_key, spreadsheet_id)
+        return sched.call(GC.open, spreadsheet_title)
 
-    ss = _open_spreadsheet()
+    ss = scheduled(_open_spreadsheet())
 
     @lru_cache(maxsize=64)
     def _get_ws(name: str):
@@ -97,6 +102,7 @@ def make_ws_func(GC, spreadsheet_id: Optional[str] = None, spreadsheet_title: Op
     def ws(name: str):
         return _get_ws(name)
 
+    ws.spreadsheet = ss  # accès au classeur pour les lectures groupées (values_batch_get)
     return ws
 
 def show_diagnostics_sidebar(spreadsheet_title_or_id: str, sheet_name_map: Dict[str, str]):
@@ -117,4 +123,46 @@ def show_diagnostics_sidebar(spreadsheet_title_or_id: str, sheet_name_map: Dict[
                 st.info("google_service_account: Chaîne TOML détectée (ou autre).")
         else:
             st.warning("google_service_account: format inattendu.")
+        timings = st.session_state.get("GS_LOAD_TIMINGS")
+        if timings:
+            st.write(f"Dernière lecture groupée : {timings.get('batch_get_s', 0)} s (1 appel values_batch_get)")
+            st.dataframe([{"onglet": k, **v} for k, v in timings.get("tabs", {}).items()], use_container_width=True)
+        read = st.session_state.get("TABLES_LOADED")
+        if read:
+            st.write("Tables lues par page (chargement paresseux) :", read)
+        load = st.session_state.get("LOAD_TIMINGS")
+        if load:
+            st.write(f"Dernier chargement parallèle : {load['total_ms']} ms ({load['workers']} threads)", load["tables_ms"])
+        st.write("Appels Google Sheets (ordonnanceur) :", get_scheduler().stats())
+        try:
+            import dataset_store
+            st.write("Jeu de données partagé (toutes sessions) :", dataset_store.get_store().status())
+        except Exception:
+            pass
+        try:
+            import gs_cache
+            st.write("Miroir local (./data/.gs_cache) :", gs_cache.refresher_status())
+        except Exception:
+            pass
+        try:
+            import storage_backend
+            journals = storage_backend.wal_status()
+            if journals:
+                st.write("Journaux d'écriture (./data/.wal) :", journals)
+            if storage_backend._compression():
+                st.write(f"Tables compressées ({storage_backend._compression()}) :", storage_backend.storage_footprint())
+            archives = storage_backend.partition_status()
+            if archives:
+                st.write("Archives mensuelles (./data/<table>.parts) :", archives)
+        except Exception:
+            pass
+        try:
+            import changefeed
+            st.write("Flux des modifications (./data/.changes) :", changefeed.status())
+        except Exception:
+            pass
+        stats = st.session_state.get("GS_WRITE_STATS", {})
+        if stats:
+            st.write("Dernières écritures (mode / cellules / lignes ajoutées / effacées) :")
+            st.dataframe([{"table": k, **v} for k, v in stats.items()], use_container_width=True)
         st.caption("Astuce : fournissez gsheet_spreadsheet_id pour éviter les collisions de titre.")
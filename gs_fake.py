@@ -0,0 +1,319 @@
+# gs_fake.py — faux Google Sheets en mémoire (sous-ensemble de gspread utilisé par l'app) pour tests et benchmarks
+from __future__ import annotations
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from gspread.exceptions import WorksheetNotFound, SpreadsheetNotFound
+except Exception:
+    class WorksheetNotFound(Exception):
+        pass
+
+    class SpreadsheetNotFound(Exception):
+        pass
+
+class FakeAPIError(Exception):
+    """Erreur HTTP simulée (même forme que gspread.exceptions.APIError : .code et .response.status_code)."""
+    def __init__(self, code: int, message: str = ""):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.response = type("Response", (), {"status_code": code})()
+
+# ---------- Notation A1 ----------
+_A1 = re.compile(r"^([A-Z]*)(\d*)$")
+_A1_RANGE = re.compile(r"^[A-Z]+\d+(:[A-Z]*\d*)?$|^[A-Z]+:[A-Z]+$")
+
+def _col_index(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+def parse_range(rng: str) -> Tuple[Optional[str], Tuple[int, int, Optional[int], Optional[int]]]:
+    """"'onglet'!B3:C4" -> ("onglet", (ligne0, col0, ligne1, col1)) en base 1 ; None = jusqu'à la fin."""
+    tab = None
+    if "!" in rng:
+        tab, rng = rng.rsplit("!", 1)
+    elif not _A1_RANGE.match(rng):
+        tab, rng = rng, ""  # nom d'onglet seul
+    if tab is not None:
+        tab = tab.strip("'")
+    if not rng:
+        return tab, (1, 1, None, None)
+    start, _, end = rng.upper().partition(":")
+    c0, r0 = _A1.match(start).groups()
+    c1, r1 = _A1.match(end or start).groups()
+    return tab, (int(r0 or 1), _col_index(c0) if c0 else 1,
+                 int(r1) if r1 else None, _col_index(c1) if c1 else None)
+
+# ---------- Serveur simulé ----------
+class FakeServer:
+    """Latence par requête, quota glissant (requêtes/minute → 429), erreurs 503 aléatoires, compteurs."""
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, quota_per_min: Optional[int] = None,
+                 error_rate: float = 0.0, seed: int = 0, sleep=time.sleep):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.quota_per_min = quota_per_min
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.calls = Counter()
+        self.cells_read = 0
+        self.cells_written = 0
+        self.spreadsheets: Dict[str, "Spreadsheet"] = {}
+
+    def request(self, method: str) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self.calls[method] += 1
+            while self.window and now - self.window[0] > 60:
+                self.window.popleft()
+            over = self.quota_per_min is not None and len(self.window) >= self.quota_per_min
+            if not over:
+                self.window.append(now)
+            fail = self.error_rate and self.rng.random() < self.error_rate
+            delay = self.latency_s + (self.rng.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+        if delay:
+            self.sleep(delay)
+        if over:
+            raise FakeAPIError(429, "Quota exceeded for quota metric 'Read requests'")
+        if fail:
+            raise FakeAPIError(503, "The service is currently unavailable.")
+
+    def stats(self) -> dict:
+        return {"requests": sum(self.calls.values()), "by_method": dict(self.calls),
+                "cells_read": self.cells_read, "cells_written": self.cells_written}
+
+class Client:
+    def __init__(self, server: Optional[FakeServer] = None):
+        self.server = server or FakeServer()
+
+    def create(self, title: str) -> "Spreadsheet":
+        self.server.request("create")
+        ss = Spreadsheet(self.server, f"fake-{len(self.server.spreadsheets) + 1}", title)
+        self.server.spreadsheets[ss.id] = ss
+        return ss
+
+    def open_by_key(self, key: str) -> "Spreadsheet":
+        self.server.request("open_by_key")
+        if key not in self.server.spreadsheets:
+            raise SpreadsheetNotFound(key)
+        return self.server.spreadsheets[key]
+
+    def open(self, title: str) -> "Spreadsheet":
+        self.server.request("open")
+        for ss in self.server.spreadsheets.values():
+            if ss.title == title:
+                return ss
+        raise SpreadsheetNotFound(title)
+
+class Spreadsheet:
+    def __init__(self, server: FakeServer, key: str, title: str):
+        self.server = server
+        self.id = key
+        self.title = title
+        self._sheets: List["Worksheet"] = []
+        self.lastUpdateTime = "0"
+        self._revision = 0
+
+    def _touch(self) -> None:
+        self._revision += 1
+        self.lastUpdateTime = str(self._revision)
+
+    def get_lastUpdateTime(self) -> str:
+        self.server.request("get_lastUpdateTime")
+        return self.lastUpdateTime
+
+    def worksheets(self) -> List["Worksheet"]:
+        self.server.request("fetch_sheet_metadata")
+        return list(self._sheets)
+
+    def worksheet(self, title: str) -> "Worksheet":
+        self.server.request("fetch_sheet_metadata")
+        return self._find(title)
+
+    def _find(self, title: str) -> "Worksheet":
+        for ws in self._sheets:
+            if ws.title == title:
+                return ws
+        raise WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, index: Optional[int] = None) -> "Worksheet":
+        self.server.request("add_worksheet")
+        if any(ws.title == title for ws in self._sheets):
+            raise FakeAPIError(400, f'A sheet with the name "{title}" already exists.')
+        ws = Worksheet(self, title, rows, cols)
+        self._sheets.append(ws)
+        self._touch()
+        return ws
+
+    def values_get(self, rng: str, params: Optional[dict] = None) -> dict:
+        self.server.request("values_get")
+        return self._read(rng)
+
+    def values_batch_get(self, ranges: List[str], params: Optional[dict] = None) -> dict:
+        self.server.request("values_batch_get")
+        return {"spreadsheetId": self.id, "valueRanges": [self._read(r) for r in ranges]}
+
+    def _read(self, rng: str) -> dict:
+        tab, box = parse_range(rng)
+        values = self._find(tab)._slice(box)
+        self.server.cells_read += sum(len(r) for r in values)
+        return {"range": rng, "majorDimension": "ROWS", "values": values}
+
+class Cell:
+    def __init__(self, row: int, col: int, value=""):
+        self.row, self.col, self.value = row, col, value
+
+class Worksheet:
+    """Grille de chaînes. Les valeurs sont stockées telles quelles (pas d'interprétation USER_ENTERED)."""
+    def __init__(self, spreadsheet: Spreadsheet, title: str, rows: int, cols: int):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.hidden = False
+        self._grid: List[List[str]] = []
+
+    @property
+    def server(self) -> FakeServer:
+        return self.spreadsheet.server
+
+    # --- lecture ---
+    def _slice(self, box) -> List[List[str]]:
+        r0, c0, r1, c1 = box
+        rows = self._grid[r0 - 1:(r1 if r1 is not None else len(self._grid))]
+        out = [[str(v) for v in row[c0 - 1:(c1 if c1 is not None else len(row))]] for row in rows]
+        # Comme l'API : cellules vides de fin de ligne et lignes vides de fin omises
+        out = [row[:max([i + 1 for i, v in enumerate(row) if v != ""], default=0)] for row in out]
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def get_all_values(self, **kwargs) -> List[List[str]]:
+        self.server.request("get_all_values")
+        values = self._slice((1, 1, None, None))
+        width = max((len(r) for r in values), default=0)
+        self.server.cells_read += len(values) * width
+        return [r + [""] * (width - len(r)) for r in values]
+
+    def get_values(self, range_name: Optional[str] = None, **kwargs) -> List[List[str]]:
+        self.server.request("get_values")
+        return self._slice(parse_range(range_name)[1] if range_name else (1, 1, None, None))
+
+    def batch_get(self, ranges: List[str], **kwargs) -> List[List[List[str]]]:
+        self.server.request("batch_get")
+        return [self._slice(parse_range(r)[1]) for r in ranges]
+
+    def acell(self, label: str, **kwargs) -> Cell:
+        self.server.request("acell")
+        _, (r, c, _, _) = parse_range(label)
+        vals = self._slice((r, c, r, c))
+        return Cell(r, c, vals[0][0] if vals and vals[0] else "")
+
+    # --- écriture ---
+    def _write(self, r0: int, c0: int, values: List[List[object]]) -> None:
+        for i, row in enumerate(values):
+            r = r0 + i
+            while len(self._grid) < r:
+                self._grid.append([])
+            line = self._grid[r - 1]
+            for j, v in enumerate(row):
+                c = c0 + j
+                if len(line) < c:
+                    line.extend([""] * (c - len(line)))
+                line[c - 1] = "" if v is None else str(v)
+            self.server.cells_written += len(row)
+        self.row_count = max(self.row_count, len(self._grid))
+        self.col_count = max([self.col_count] + [len(r) for r in self._grid])
+        self.spreadsheet._touch()
+
+    def update(self, *args, **kwargs) -> dict:
+        """update(range, values) (gspread 5) ou update(values, range) (gspread 6)."""
+        self.server.request("update")
+        rng = kwargs.get("range_name")
+        values = kwargs.get("values")
+        for a in args:
+            if isinstance(a, str):
+                rng = a
+            else:
+                values = a
+        _, (r0, c0, _, _) = parse_range(rng or "A1")
+        self._write(r0, c0, values or [])
+        return {"updatedRange": rng}
+
+    def batch_update(self, data: List[dict], **kwargs) -> dict:
+        self.server.request("batch_update")
+        for item in data:
+            _, (r0, c0, _, _) = parse_range(item["range"])
+            self._write(r0, c0, item["values"])
+        return {"totalUpdatedCells": sum(len(r) for d in data for r in d["values"])}
+
+    def update_cells(self, cells: List[Cell], **kwargs) -> dict:
+        self.server.request("update_cells")
+        for cell in cells:
+            self._write(cell.row, cell.col, [[cell.value]])
+        return {"updatedCells": len(cells)}
+
+    def append_rows(self, values: List[List[object]], **kwargs) -> dict:
+        self.server.request("append_rows")
+        last = len(self._slice((1, 1, None, None)))
+        self._write(last + 1, 1, values)
+        return {"updates": {"updatedRows": len(values)}}
+
+    def append_row(self, values: List[object], **kwargs) -> dict:
+        return self.append_rows([values], **kwargs)
+
+    def batch_clear(self, ranges: List[str]) -> dict:
+        self.server.request("batch_clear")
+        for rng in ranges:
+            _, (r0, c0, r1, c1) = parse_range(rng)
+            for r in range(r0, (r1 if r1 is not None else len(self._grid)) + 1):
+                if r - 1 < len(self._grid):
+                    line = self._grid[r - 1]
+                    for c in range(c0, min(c1 if c1 is not None else len(line), len(line)) + 1):
+                        line[c - 1] = ""
+        self.spreadsheet._touch()
+        return {"clearedRanges": ranges}
+
+    def clear(self) -> dict:
+        self.server.request("clear")
+        self._grid = []
+        self.spreadsheet._touch()
+        return {}
+
+    def resize(self, rows: Optional[int] = None, cols: Optional[int] = None) -> dict:
+        self.server.request("resize")
+        if rows is not None:
+            self.row_count = rows
+            self._grid = self._grid[:rows]
+        if cols is not None:
+            self.col_count = cols
+            self._grid = [r[:cols] for r in self._grid]
+        return {}
+
+    def hide(self) -> dict:
+        self.server.request("hide")
+        self.hidden = True
+        return {}
+
+def make_fake_ws_func(spreadsheet: Spreadsheet):
+    """Équivalent hors Streamlit de gs_client.make_ws_func : ws(nom) crée l'onglet manquant."""
+    cache: Dict[str, Worksheet] = {}
+
+    def ws(name: str):
+        if name not in cache:
+            try:
+                cache[name] = spreadsheet.worksheet(name)
+            except WorksheetNotFound:
+                cache[name] = spreadsheet.add_worksheet(title=name, rows=1000, cols=40)
+        return cache[name]
+
+    ws.spreadsheet = spreadsheet
+    return ws
@@ -0,0 +1,184 @@
+# gs_scheduler.py — ordonnanceur des appels gspread : quota (token bucket), retries avec backoff, coalescence, compteurs
+from __future__ import annotations
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_PER_MIN = 60        # quota Sheets par défaut (requêtes / minute / utilisateur)
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE_S = 0.5
+BACKOFF_CAP_S = 32.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Écritures : un 5xx peut arriver après application (append en double, version incrémentée deux fois) ;
+# seul le 429 (requête refusée avant traitement) est relancé
+WRITE_RETRY_STATUS = {429}
+
+# Méthodes de lecture : des appels identiques simultanés partagent une seule requête
+READ_METHODS = {"get_all_values", "get_all_records", "get_values", "get", "batch_get", "values_batch_get",
+                "row_values", "col_values", "worksheets", "worksheet", "fetch_sheet_metadata", "acell", "cell"}
+
+WRAPPED_TYPES = {"Client", "Spreadsheet", "Worksheet"}
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    """Code HTTP d'une gspread.exceptions.APIError (selon les versions : .code ou .response.status_code)."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    resp = getattr(exc, "response", None)
+    return getattr(resp, "status_code", None)
+
+class TokenBucket:
+    """`rate_per_min` jetons par minute, rafale max `burst`."""
+    def __init__(self, rate_per_min: float, burst: Optional[int] = None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(burst or max(1, int(rate_per_min // 6)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Bloque jusqu'à obtenir un jeton ; renvoie le temps d'attente."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class RequestScheduler:
+    def __init__(self, per_min: float = DEFAULT_PER_MIN, max_retries: int = DEFAULT_MAX_RETRIES,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.bucket = TokenBucket(per_min)
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.inflight: Dict[tuple, _InFlight] = {}
+        self.latencies = deque(maxlen=1000)
+        self.counters = {"calls": 0, "retries": 0, "errors": 0, "coalesced": 0, "throttled_s": 0.0}
+
+    def call(self, fn: Callable, *args, key: Optional[tuple] = None, idempotent: bool = True, **kwargs):
+        """Exécute fn(*args, **kwargs) sous quota, avec retries (429/5xx ; 429 seulement si idempotent=False) ;
+           si `key` est fourni, un appel identique déjà en cours est partagé au lieu d'être relancé."""
+        retry = RETRY_STATUS if idempotent else WRITE_RETRY_STATUS
+        if key is None:
+            return self._run(fn, args, kwargs, retry)
+        with self.lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = _InFlight()
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._run(fn, args, kwargs, retry)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            flight.done.set()
+
+    def _run(self, fn: Callable, args, kwargs, retry: set = RETRY_STATUS):
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            t0 = time.perf_counter()
+            with self.lock:
+                self.counters["calls"] += 1
+                self.counters["throttled_s"] += waited
+            try:
+                out = fn(*args, **kwargs)
+                with self.lock:
+                    self.latencies.append(time.perf_counter() - t0)
+                return out
+            except Exception as e:
+                status = _status_of(e)
+                if status not in retry or attempt >= self.max_retries:
+                    with self.lock:
+                        self.counters["errors"] += 1
+                    raise
+                # Backoff exponentiel avec jitter complet
+                delay = random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * (2 ** attempt)))
+                attempt += 1
+                with self.lock:
+                    self.counters["retries"] += 1
+                self.sleep(delay)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lat = sorted(self.latencies)
+            out = dict(self.counters)
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p / 100 * len(lat)))] * 1000, 1) if lat else None
+        out.update({"p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+                    "throttled_s": round(out["throttled_s"], 2)})
+        return out
+
+class Scheduled:
+    """Proxy d'un objet gspread (Client, Spreadsheet, Worksheet) : chaque méthode passe par l'ordonnanceur
+       (lectures : retries 429/5xx et coalescence ; écritures : retry sur 429 seulement). Les objets gspread renvoyés (worksheet(), worksheets(), .spreadsheet…) sont eux-mêmes enveloppés."""
+    def __init__(self, target, scheduler: RequestScheduler):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_scheduler", scheduler)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return _wrap(attr, self._scheduler)
+        def method(*args, **kwargs):
+            read = name in READ_METHODS
+            key = (id(self._target), name, repr(args), repr(sorted(kwargs.items()))) if read else None
+            return _wrap(self._scheduler.call(attr, *args, key=key, idempotent=read, **kwargs), self._scheduler)
+        return method
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __repr__(self):
+        return f"Scheduled({self._target!r})"
+
+def _wrap(obj, scheduler: RequestScheduler):
+    if isinstance(obj, Scheduled):
+        return obj
+    if isinstance(obj, list):
+        # Listes d'onglets (worksheets()) uniquement ; les valeurs de cellules sont renvoyées telles quelles
+        if obj and type(obj[0]).__name__ in WRAPPED_TYPES:
+            return [_wrap(o, scheduler) for o in obj]
+        return obj
+    if type(obj).__name__ in WRAPPED_TYPES and type(obj).__module__.startswith(("gspread", "gs_fake")):
+        return Scheduled(obj, scheduler)
+    return obj
+
+# Instance process (partagée par toutes les sessions ; survit à importlib.reload)
+_SCHEDULER: Optional[RequestScheduler] = globals().get("_SCHEDULER")
+
+def get_scheduler(per_min: float = DEFAULT_PER_MIN) -> RequestScheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = RequestScheduler(per_min=per_min)
+    return _SCHEDULER
+
+def scheduled(obj, per_min: float = DEFAULT_PER_MIN):
+    """Enveloppe un objet gspread avec l'ordonnanceur process."""
+    return _wrap(obj, get_scheduler(per_min)) if obj is not None else None
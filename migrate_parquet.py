@@ -0,0 +1,37 @@
+# Script de migration ./data/*.csv -> ./data/*.parquet (backend storage_backend = "parquet")
+import sys
+from pathlib import Path
+
+from storage_backend import csv_to_parquet
+
+def migrate(data_dir: Path = Path("./data"), overwrite: bool = False) -> int:
+    """
+    Convertit chaque CSV de data_dir en Parquet typé (dates, montants FCFA, booléens).
+    Les CSV sont conservés (retour arrière possible en repassant storage_backend = "csv").
+    """
+    csvs = sorted(data_dir.glob("*.csv"))
+    if not csvs:
+        print(f"⚠️ Aucun CSV trouvé dans {data_dir}")
+        return 0
+    done = 0
+    for csv_path in csvs:
+        pq_path = csv_path.with_suffix(".parquet")
+        if pq_path.exists() and not overwrite:
+            print(f"⏭️ {pq_path.name} existe déjà (utilisez --overwrite)")
+            continue
+        try:
+            n = csv_to_parquet(csv_path, pq_path)
+            print(f"✅ {csv_path.name} -> {pq_path.name} ({n} lignes)")
+            done += 1
+        except Exception as e:
+            print(f"❌ {csv_path.name}: {e}")
+    return done
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    data_dir = Path(args[0]) if args else Path("./data")
+    print("📦 MIGRATION CSV -> PARQUET - IIBA Cameroun")
+    print("="*50)
+    n = migrate(data_dir, overwrite="--overwrite" in sys.argv)
+    print("="*50)
+    print(f"🎯 {n} table(s) migrée(s). Activez : storage_backend = \"parquet\" dans secrets.toml")
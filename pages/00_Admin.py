@@ -1,9 +1,14 @@
-# pages/00_Admin.py — Listes, KPI cibles, Import/Export Excel (toutes tables) + filtres/pagination
+# pages/00_Admin.py — Listes, KPI cibles, Import/Export Excel (toutes tables), versions + filtres/pagination
 from __future__ import annotations
 import io
+from datetime import date, datetime
 import streamlit as st
 import pandas as pd
-from _shared import load_all_tables, save_table, filter_and_paginate, statusbar, export_filtered_excel, smart_suggested_filters
+from _shared import (
+    load_all_tables, save_table, filter_and_paginate, statusbar, export_filtered_excel, smart_suggested_filters,
+    BUNDLE_FORMATS, bundle_codecs, build_bundle, read_bundle,
+    ROW_KEYS, versions, versions_root, snapshot_table, restore_table
+)
 
 st.set_page_config(page_title="Admin — IIBA Cameroun", page_icon="🛠️", layout="wide")
 st.title("🛠️ Administration")
@@ -14,6 +19,14 @@ if "auth_user" not in st.session_state:
 
 dfs = load_all_tables()
 
+def _replace_table(sheet: str, df_new: pd.DataFrame, source: str) -> None:
+    """Remplace une table importée ; l'état précédent et le nouveau sont enregistrés comme versions."""
+    if sheet in dfs:
+        snapshot_table(sheet, dfs[sheet], f"avant import {source}")
+    dfs[sheet] = df_new
+    save_table(sheet, df_new)
+    snapshot_table(sheet, df_new, f"import {source}")
+
 st.header("📦 Export/Import Excel (toutes tables)")
 c1, c2 = st.columns(2)
 with c1:
@@ -27,17 +40,34 @@ with c1:
     st.download_button("⬇ Exporter toutes les tables (Excel)", buf.getvalue(),
                        file_name="iiba_crm_all_tables.xlsx",
                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    # Archive compressée : préparée à la demande (un CSV par table, bien plus léger que l'Excel)
+    codec = st.selectbox("Compression de l'archive", bundle_codecs(), index=0)
+    if st.button("📦 Préparer l'archive compressée"):
+        st.session_state["ADMIN_BUNDLE"] = (codec, datetime.now().strftime("%Y%m%d_%H%M"), build_bundle(dict(dfs.items()), codec))
+    if "ADMIN_BUNDLE" in st.session_state:
+        b_codec, b_stamp, b_data = st.session_state["ADMIN_BUNDLE"]
+        ext, mime = BUNDLE_FORMATS[b_codec]
+        st.download_button(f"⬇ Exporter toutes les tables (archive {ext}, {len(b_data) / 1024:.0f} Ko)", b_data,
+                           file_name=f"iiba_crm_all_tables_{b_stamp}.{ext}", mime=mime)
 with c2:
-    up = st.file_uploader("Importer un Excel (mêmes feuilles/colonnes)", type=["xlsx"])
-    if up is not None:
+    up = st.file_uploader("Importer un Excel ou une archive compressée (mêmes feuilles/colonnes)",
+                          type=["xlsx", "gz", "zst"])
+    if up is not None and not up.name.endswith(".xlsx"):
+        try:
+            tables, manifest = read_bundle(up.getvalue())
+            for sheet, df_new in tables.items():
+                _replace_table(sheet, df_new, up.name)
+            st.success(f"Import terminé ({len(tables)} tables, archive du {manifest.get('created_at', '?')}).")
+        except Exception as e:
+            st.error(f"Import échoué: {e}")
+    elif up is not None:
         try:
             x = pd.ExcelFile(up)
             changed = False
             for sheet in x.sheet_names:
                 try:
                     df_new = pd.read_excel(x, sheet_name=sheet, dtype=str).fillna("")
-                    dfs[sheet] = df_new
-                    save_table(sheet, df_new)
+                    _replace_table(sheet, df_new, up.name)
                     changed = True
                 except Exception:
                     pass
@@ -46,6 +76,51 @@ with c2:
         except Exception as e:
             st.error(f"Import échoué: {e}")
 
+st.header("🕓 Versions des tables (points de restauration)")
+if versions is None:
+    st.info("Module versions indisponible : pas de points de restauration.")
+else:
+    st.caption("Chaque import enregistre l'état avant / après (seules les lignes modifiées sont stockées).")
+    vt = st.selectbox("Table", list(dfs), key="adm_versions_table")
+    if st.button("📸 Créer un point de restauration"):
+        v_new = snapshot_table(vt, reason="point de restauration manuel")
+        st.success(f"Version {v_new} enregistrée." if v_new else "Aucun changement depuis la dernière version.")
+    hist = versions.history(vt, versions_root())
+    if not hist:
+        st.caption("Aucune version enregistrée pour cette table.")
+    else:
+        hdf = pd.DataFrame(hist)
+        hdf["date"] = [datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") for ts in hdf["ts"]]
+        st.dataframe(hdf[["v", "date", "user", "reason", "kind", "rows", "ajouts", "modifications", "suppressions"]]
+                     .iloc[::-1], use_container_width=True, hide_index=True)
+        v_list = [r["v"] for r in hist]
+        cr1, cr2 = st.columns(2)
+        with cr1:
+            st.subheader("↩️ Restaurer à une date")
+            d_at = st.date_input("Date", value=date.today(), key="adm_versions_date")
+            t_at = st.time_input("Heure", value=datetime.now().time(), key="adm_versions_time")
+            v_at = versions.version_at(vt, datetime.combine(d_at, t_at), versions_root())
+            if v_at is None:
+                st.caption("Aucune version enregistrée à cette date.")
+            elif st.button(f"↩️ Restaurer {vt} à la version {v_at}"):
+                try:
+                    restored = restore_table(vt, v_at)
+                    dfs[vt] = restored
+                    st.success(f"{vt} restaurée à la version {v_at} ({len(restored)} lignes).")
+                except Exception as e:
+                    st.error(f"Restauration échouée: {e}")
+        with cr2:
+            st.subheader("🔍 Comparer deux versions")
+            v1 = st.selectbox("De la version", v_list, index=max(0, len(v_list) - 2), key="adm_versions_v1")
+            v2 = st.selectbox("À la version", v_list, index=len(v_list) - 1, key="adm_versions_v2")
+        if v1 != v2:
+            changes = versions.diff(vt, v1, v2, ROW_KEYS.get(vt), versions_root())
+            for label, part in changes.items():
+                with st.expander(f"Lignes {label} : {len(part)}" if label != "modifiées" else f"Valeurs modifiées : {len(part)}"):
+                    st.dataframe(part, use_container_width=True, hide_index=True)
+    with st.expander("Stockage des versions"):
+        st.dataframe(pd.DataFrame(versions.status(versions_root())), use_container_width=True, hide_index=True)
+
 st.header("📋 Listes de valeurs & KPI / Paramètres")
 tab_cats, tab_kpi, tab_tech = st.tabs(["Listes", "KPI / Paramètres", "Tech (diagnostic data)"])
 
@@ -55,6 +55,8 @@ AUDIT_COLS                  = _get("AUDIT_COLS",                 ["Created_At","
 parse_date                  = _get("parse_date",                 lambda s: None)
 email_ok                    = _get("email_ok",                   lambda s: True)
 phone_ok                    = _get("phone_ok",                   lambda s: True)
+cached_on                   = _get("cached_on",                  lambda *tables: (lambda fn: fn))
+atomic_append_row           = _get("atomic_append_row")
 
 save_df_target = getattr(SB, "save_df_target", None)  # peut être None si import raté
 
@@ -148,6 +150,8 @@ if hasattr(SH, "render_global_filter_panel"):
         SH.render_global_filter_panel(dfs_for_filters)
     except Exception as e:
         st.sidebar.warning(f"Filtre global indisponible : {e}")
+if hasattr(SH, "render_write_status"):
+    SH.render_write_status()  # écritures différées en attente / écrites
 
 # Auth requise 
 user = st.session_state.get("auth_user") or st.session_state.get("user")
@@ -201,6 +205,7 @@ def map_to_datetime_column(df, index_source, series_or_other, col_name, errors="
     return df
 
 
+@cached_on("contacts", "inter", "parts", "pay", "cert", "params")  # recalculé seulement si l'une change
 def aggregates_for_contacts(today=None):
     today = today or date.today()
     vip_thr = float(PARAMS.get("vip_threshold", "500000"))
@@ -309,7 +314,7 @@ type_filtre  = colf3.selectbox("Type", ["Tous"] + list(SET.get("types_contact",
 top20_only   = colf4.checkbox("Top-20 uniquement", value=False)
 
 # — fusion des agrégats au niveau contact
-ag = aggregates_for_contacts()
+ag = aggregates_for_contacts(date.today())  # date explicite : clé du cache
 dfc = df_contacts.copy()
 if not dfc.empty:
     dfc = dfc.merge(ag, on="ID", how="left")
@@ -45,8 +45,10 @@ AUDIT_COLS                  = _get("AUDIT_COLS",                 ["Created_At","
 parse_date                  = _get("parse_date",                 lambda s: None)
 email_ok                    = _get("email_ok",                   lambda s: True)
 phone_ok                    = _get("phone_ok",                   lambda s: True)
+cached_on                   = _get("cached_on",                  lambda *tables: (lambda fn: fn))
 
 save_df_target = getattr(SB, "save_df_target", None)  # peut être None si import raté
+append_rows_target = getattr(SB, "append_rows_target", None)  # ajout incrémental (créations)
 
 # WS_FUNC pour GSheets (optionnel). S’il n’existe pas et que backend=gsheets, storage_backend lèvera un message clair.
 WS_FUNC = st.session_state.get("WS_FUNC", None)
@@ -138,6 +140,8 @@ if hasattr(SH, "render_global_filter_panel"):
         SH.render_global_filter_panel(dfs_for_filters)
     except Exception as e:
         st.sidebar.warning(f"Filtre global indisponible : {e}")
+if hasattr(SH, "render_write_status"):
+    SH.render_write_status()  # écritures différées en attente / écrites
 
 # Auth requise 
 user = st.session_state.get("auth_user") or st.session_state.get("user")
@@ -191,6 +195,7 @@ def map_to_datetime_column(df, index_source, series_or_other, col_name, errors="
     return df
 
 
+@cached_on("contacts", "inter", "parts", "pay", "cert", "params")  # recalculé seulement si l'une change
 def aggregates_for_contacts(today=None):
     today = today or date.today()
     vip_thr = float(PARAMS.get("vip_threshold", "500000"))
@@ -299,7 +304,7 @@ type_filtre  = colf3.selectbox("Type", ["Tous"] + list(SET.get("types_contact",
 top20_only   = colf4.checkbox("Top-20 uniquement", value=False)
 
 # — fusion des agrégats au niveau contact
-ag = aggregates_for_contacts()
+ag = aggregates_for_contacts(date.today())  # date explicite : clé du cache
 dfc = df_contacts.copy()
 if not dfc.empty:
     dfc = dfc.merge(ag, on="ID", how="left")
@@ -475,7 +480,6 @@ with cL:
                 if save_df_target:
                     try:
                         save_df_target("contacts", df_contacts, getattr(SH, "PATHS", None), WS_FUNC)
-                        st.cache_data.clear()  # force une relecture au prochain run
                     except Exception as e:
                         st.error(f"Échec sauvegarde (contacts) : {e}")
                         st.stop()
@@ -545,11 +549,9 @@ with cL:
                         "Date_Creation": dc_new.isoformat(), "Notes": notes_new, "Top20": top20_new
                     }
                     row = _stamp_create(row, user)
-                    df_new = pd.concat([df_contacts, pd.DataFrame([row])], ignore_index=True)
-                    if save_df_target:
+                    if append_rows_target:
                         try:
-                            save_df_target("contacts", df_new, getattr(SH, "PATHS", None), WS_FUNC)
-                            st.cache_data.clear()  # force une relecture au prochain run
+                            append_rows_target("contacts", pd.DataFrame([row]), getattr(SH, "PATHS", None), WS_FUNC)
                         except Exception as e:
                             st.error(f"Échec sauvegarde (contacts) : {e}")
                             st.stop()
@@ -590,11 +592,9 @@ with cR:
                         "Responsable": resp
                     }
                     row = _stamp_create(row, user)
-                    df_new = pd.concat([df_inter, pd.DataFrame([row])], ignore_index=True)
-                    if save_df_target:
+                    if append_rows_target:
                         try:
-                            save_df_target("inter", df_new, getattr(SH, "PATHS", None), WS_FUNC)
-                            st.cache_data.clear()  # force une relecture au prochain run
+                            append_rows_target("inter", pd.DataFrame([row]), getattr(SH, "PATHS", None), WS_FUNC)
                         except Exception as e:
                             st.error(f"Échec sauvegarde (interactions) : {e}")
                             st.stop()
@@ -622,10 +622,9 @@ with cR:
                         row = {"ID_Participation":nid,"ID":sel_id,"ID_Événement":ide,"Rôle":role,
                                "Feedback":fb,"Note":str(note)}
                         row = _stamp_create(row, user)
-                        df_new = pd.concat([df_parts, pd.DataFrame([row])], ignore_index=True)
-                        if save_df_target:
+                        if append_rows_target:
                             try:
-                                save_df_target("parts", df_new, getattr(SH, "PATHS", None), WS_FUNC)
+                                append_rows_target("parts", pd.DataFrame([row]), getattr(SH, "PATHS", None), WS_FUNC)
                             except Exception as e:
                                 st.error(f"Échec sauvegarde (participations) : {e}")
                                 st.stop()
@@ -655,11 +654,9 @@ with cR:
                         row = {"ID_Paiement":nid,"ID":sel_id,"ID_Événement":ide,"Date_Paiement":dtp.isoformat(),
                                "Montant":str(montant),"Moyen":moyen,"Statut":statut,"Référence":ref}
                         row = _stamp_create(row, user)
-                        df_new = pd.concat([df_pay, pd.DataFrame([row])], ignore_index=True)
-                        if save_df_target:
+                        if append_rows_target:
                             try:
-                                save_df_target("pay", df_new, getattr(SH, "PATHS", None), WS_FUNC)
-                                st.cache_data.clear()  # force une relecture au prochain run
+                                append_rows_target("pay", pd.DataFrame([row]), getattr(SH, "PATHS", None), WS_FUNC)
                             except Exception as e:
                                 st.error(f"Échec sauvegarde (paiements) : {e}")
                                 st.stop()
@@ -687,11 +684,9 @@ with cR:
                     row = {"ID_Certif":nid,"ID":sel_id,"Type_Certif":tc,"Date_Examen":dte.isoformat(),"Résultat":res,
                            "Score":str(sc),"Date_Obtention":(dto.isoformat() if dto else "")}
                     row = _stamp_create(row, user)
-                    df_new = pd.concat([df_cert, pd.DataFrame([row])], ignore_index=True)
-                    if save_df_target:
+                    if append_rows_target:
                         try:
-                            save_df_target("cert", df_new, getattr(SH, "PATHS", None), WS_FUNC)
-                            st.cache_data.clear()  # force une relecture au prochain run
+                            append_rows_target("cert", pd.DataFrame([row]), getattr(SH, "PATHS", None), WS_FUNC)
                         except Exception as e:
                             st.error(f"Échec sauvegarde (certifications) : {e}")
                             st.stop()
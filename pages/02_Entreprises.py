@@ -2,7 +2,7 @@
 from __future__ import annotations
 import streamlit as st
 import pandas as pd
-from _shared import load_all_tables, statusbar, filter_and_paginate, smart_suggested_filters
+from _shared import load_all_tables, query_table, statusbar, filter_and_paginate, smart_suggested_filters
 
 st.set_page_config(page_title="Entreprises — IIBA Cameroun", page_icon="🏢", layout="wide")
 st.title("🏢 Entreprises")
@@ -74,9 +74,10 @@ if sel_ent and sel_ent != "—":
             emp_ids = set(dfc[dfc.get("Entreprise","")==nom_ent]["ID"].astype(str))
             inter_emp = dfi[((dfi.get("Cible","")=="Contact") & (dfi.get("ID_Cible","").astype(str).isin(emp_ids)))
                             | ((dfi.get("Cible","")=="") & (dfi.get("ID","").astype(str).isin(emp_ids)))].copy()
-            pay_emp = dfpay[dfpay.get("ID","").astype(str).isin(emp_ids)].copy()
-            cert_emp = dfcert[dfcert.get("ID","").astype(str).isin(emp_ids)].copy()
-            parts_emp = dfs["parts"][dfs["parts"].get("ID","").astype(str).isin(emp_ids)].copy()
+            # Lignes des seuls employés (requête indexée sur ID en backend SQLite)
+            pay_emp = query_table("pay", {"ID": sorted(emp_ids)})
+            cert_emp = query_table("cert", {"ID": sorted(emp_ids)})
+            parts_emp = query_table("parts", {"ID": sorted(emp_ids)})
 
             st.write(f"**Employés liés** : {len(emp_ids)}")
             if not pay_emp.empty:
@@ -3,10 +3,12 @@ from __future__ import annotations
 import io
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+import schema
+from calendar import monthrange
+from datetime import date, datetime
 from _shared import (
     load_all_tables, filter_and_paginate, statusbar, parse_date,
-    export_filtered_excel, smart_suggested_filters
+    export_filtered_excel, smart_suggested_filters, query_table_period, table_years
 )
 
 st.set_page_config(page_title="Rapports — IIBA Cameroun", page_icon="📈", layout="wide")
@@ -16,7 +18,7 @@ if "auth_user" not in st.session_state:
     st.info("🔐 Veuillez vous connecter depuis la page principale pour accéder à cette section.")
     st.stop()
 
-dfs = load_all_tables()
+dfs = load_all_tables(typed=True)  # dates / montants déjà typés (schema.py)
 df_contacts = dfs["contacts"]
 df_events   = dfs["events"]
 df_parts    = dfs["parts"]
@@ -25,14 +27,21 @@ df_cert     = dfs["cert"]
 df_entre    = dfs["entreprises"]
 df_ep       = dfs["entreprise_parts"]
 
+# Colonnes du registre déjà typées au chargement : converties ici seulement si elles sont restées en texte
+def _dates(df, col):
+    return schema.as_dates(df[col]) if col in df.columns else pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+
+def _amounts(df, col):
+    return schema.as_numbers(df[col]).fillna(0) if col in df.columns else pd.Series(0, index=df.index)
+
 # --- Sélecteurs de période ---
 def _years_from(series):
-    s = pd.to_datetime(series, errors="coerce").dt.year.dropna().astype(int)
+    s = series.dt.year.dropna().astype(int)
     if s.empty: return []
     return sorted(s.unique().tolist())
 
-years = sorted(set(_years_from(df_events.get("Date","")) |
-                   set(_years_from(df_pay.get("Date_Paiement","")))))
+# Années des paiements : noms des archives mensuelles + CSV récent (l'historique n'est pas parsé)
+years = sorted(set(_years_from(_dates(df_events, "Date"))) | set(table_years("pay")))
 annees = ["Toutes"] + [str(y) for y in years]
 mois = ["Tous"] + [str(i) for i in range(1,13)]
 c1,c2 = st.columns(2)
@@ -41,7 +50,7 @@ mois_sel = c2.selectbox("Mois", mois, index=0)
 
 def _apply_period(df, date_col):
     if date_col not in df.columns: return df
-    d = pd.to_datetime(df[date_col], errors="coerce")
+    d = _dates(df, date_col)
     if annee != "Toutes":
         df = df[d.dt.year == int(annee)]
     if mois_sel != "Tous":
@@ -60,7 +69,7 @@ st.dataframe(page_e, use_container_width=True, hide_index=True)
 st.header("🎟 Participations (période via date événement)")
 dfp = df_parts.copy()
 if not dfp.empty and "ID_Événement" in dfp.columns and "Date" in df_events.columns:
-    ev_dates = df_events.set_index("ID_Événement")["Date"].map(pd.to_datetime, na_action="ignore")
+    ev_dates = _dates(df_events, "Date").set_axis(df_events["ID_Événement"])
     dfp["_d_evt"] = dfp["ID_Événement"].map(ev_dates)
     if annee != "Toutes":
         dfp = dfp[dfp["_d_evt"].dt.year == int(annee)]
@@ -73,7 +82,13 @@ st.dataframe(page_p, use_container_width=True, hide_index=True)
 
 # === Paiements (période via Date_Paiement) ===
 st.header("💰 Paiements (période via Date_Paiement)")
-dfpay = _apply_period(df_pay.copy(), "Date_Paiement")
+if annee != "Toutes":
+    # Seules les archives des mois de la période sont lues
+    m1, m2 = (int(mois_sel), int(mois_sel)) if mois_sel != "Tous" else (1, 12)
+    dfpay = query_table_period("pay", date(int(annee), m1, 1),
+                               date(int(annee), m2, monthrange(int(annee), m2)[1]), typed=True)
+else:
+    dfpay = _apply_period(df_pay.copy(), "Date_Paiement")
 page_pay, filt_pay = filter_and_paginate(dfpay, key_prefix="rep_pay", page_size_default=20,
                                          suggested_filters=["Statut"])
 statusbar(filt_pay, numeric_keys=["Montant"])
@@ -83,8 +98,8 @@ st.dataframe(page_pay, use_container_width=True, hide_index=True)
 st.header("🎓 Certifications (période via Date_Obtention/Examen)")
 dfc = df_cert.copy()
 if not dfc.empty:
-    dfc["_do"] = pd.to_datetime(dfc.get("Date_Obtention",""), errors="coerce")
-    dfc["_de"] = pd.to_datetime(dfc.get("Date_Examen",""), errors="coerce")
+    dfc["_do"] = _dates(dfc, "Date_Obtention")
+    dfc["_de"] = _dates(dfc, "Date_Examen")
     mask = pd.Series(True, index=dfc.index)
     if annee != "Toutes":
         mask &= ((dfc["_do"].dt.year == int(annee)) | (dfc["_de"].dt.year == int(annee)))
@@ -102,24 +117,23 @@ st.header("📊 Sous-rapports spécifiques")
 # Top entreprises par CA réglé (via paiements + contacts Entreprise) + sponsoring officiel
 with st.expander("🏆 Top entreprises par CA réglé (incl. sponsoring officiel)", expanded=False):
     pay_ok = df_pay.copy()
-    pay_ok["Montant"] = pd.to_numeric(pay_ok.get("Montant",0), errors="coerce").fillna(0)
+    pay_ok["Montant"] = _amounts(pay_ok, "Montant")
     pay_ok = pay_ok[pay_ok.get("Statut","")=="Réglé"]
     # via employés
     if not pay_ok.empty and "ID" in pay_ok.columns and "Entreprise" in df_contacts.columns:
         merged = pay_ok.merge(df_contacts[["ID","Entreprise"]], on="ID", how="left")
         agg_emp = merged.groupby("Entreprise")["Montant"].sum().reset_index().rename(columns={"Montant":"CA_Regle_Employes"})
     else:
-        agg_emp = pd.DataFrame(columns=["Entreprise","CA_Regle_Employes"])
+        agg_emp = pd.DataFrame({"Entreprise": pd.Series(dtype=object), "CA_Regle_Employes": pd.Series(dtype="Int64")})
     # sponsoring officiel (entreprise_parts -> Sponsoring_FCFA)
     ep = df_ep.copy()
-    ep["Sponsoring_FCFA"] = pd.to_numeric(ep.get("Sponsoring_FCFA",0), errors="coerce").fillna(0)
+    ep["Sponsoring_FCFA"] = _amounts(ep, "Sponsoring_FCFA")
     agg_off = ep.groupby("ID_Entreprise")["Sponsoring_FCFA"].sum().reset_index()
     agg_off = agg_off.merge(df_entre[["ID_Entreprise","Nom_Entreprise"]], on="ID_Entreprise", how="left")
     agg_off = agg_off.rename(columns={"Nom_Entreprise":"Entreprise"})
     # fusion
     top = pd.merge(agg_emp, agg_off[["Entreprise","Sponsoring_FCFA"]], on="Entreprise", how="outer").fillna(0)
-    top["CA_Total"] = pd.to_numeric(top.get("CA_Regle_Employes",0), errors="coerce").fillna(0) + \
-                      pd.to_numeric(top.get("Sponsoring_FCFA",0), errors="coerce").fillna(0)
+    top["CA_Total"] = top["CA_Regle_Employes"] + top["Sponsoring_FCFA"]
     # filtres/pagination
     suggested = ["Entreprise"]
     page_top, filt_top = filter_and_paginate(top, key_prefix="rep_top_ca", page_size_default=20, suggested_filters=suggested)
@@ -130,7 +144,7 @@ with st.expander("🏆 Top entreprises par CA réglé (incl. sponsoring officiel
 with st.expander("📆 Activité mensuelle (Événements / Participations / Paiements réglés)", expanded=False):
     # Événements par mois
     dfe2 = df_events.copy()
-    dfe2["_mois"] = pd.to_datetime(dfe2.get("Date",""), errors="coerce").dt.to_period("M").astype(str)
+    dfe2["_mois"] = _dates(dfe2, "Date").dt.to_period("M").astype(str)
     evm = dfe2["_mois"].value_counts().rename_axis("Mois").reset_index(name="Nb_Événements")
     page_evm, filt_evm = filter_and_paginate(evm, key_prefix="rep_act_evt", page_size_default=20,
                                              suggested_filters=["Mois"])
@@ -140,9 +154,8 @@ with st.expander("📆 Activité mensuelle (Événements / Participations / Paie
     # Participations par mois (via Date événement)
     dfp2 = df_parts.copy()
     if not dfp2.empty and "ID_Événement" in dfp2.columns and "Date" in df_events.columns:
-        ev_dates = df_events.set_index("ID_Événement")["Date"].map(pd.to_datetime, na_action="ignore")
-        dfp2["_d_evt"] = dfp2["ID_Événement"].map(ev_dates)
-        dfp2["_mois"] = pd.to_datetime(dfp2["_d_evt"], errors="coerce").dt.to_period("M").astype(str)
+        ev_dates = _dates(df_events, "Date").set_axis(df_events["ID_Événement"])
+        dfp2["_mois"] = dfp2["ID_Événement"].map(ev_dates).dt.to_period("M").astype(str)
         pm = dfp2["_mois"].value_counts().rename_axis("Mois").reset_index(name="Nb_Participations")
     else:
         pm = pd.DataFrame(columns=["Mois","Nb_Participations"])
@@ -154,8 +167,8 @@ with st.expander("📆 Activité mensuelle (Événements / Participations / Paie
     # Paiements réglés par mois
     dfpay2 = df_pay.copy()
     dfpay2 = dfpay2[dfpay2.get("Statut","")=="Réglé"].copy()
-    dfpay2["Montant"] = pd.to_numeric(dfpay2.get("Montant",0), errors="coerce").fillna(0)
-    dfpay2["_mois"] = pd.to_datetime(dfpay2.get("Date_Paiement",""), errors="coerce").dt.to_period("M").astype(str)
+    dfpay2["Montant"] = _amounts(dfpay2, "Montant")
+    dfpay2["_mois"] = _dates(dfpay2, "Date_Paiement").dt.to_period("M").astype(str)
     pym = dfpay2.groupby("_mois")["Montant"].sum().reset_index().rename(columns={"_mois":"Mois","Montant":"CA_Regle"})
     page_pym, filt_pym = filter_and_paginate(pym, key_prefix="rep_act_pay", page_size_default=20,
                                              suggested_filters=["Mois"])
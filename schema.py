@@ -0,0 +1,158 @@
+# schema.py — registre des tables : colonnes (ordre) et types, conversion texte <-> colonnes typées
+from __future__ import annotations
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# Types : str (texte), category (peu de valeurs distinctes), fcfa / int (Int64), date / timestamp (datetime64),
+# bool (booléen nullable). Le stockage reste en texte (CSV / Sheets / SQLite) : les types ne vivent qu'en mémoire.
+AUDIT = [("Created_At", "timestamp"), ("Created_By", "str"), ("Updated_At", "timestamp"), ("Updated_By", "str")]
+
+SCHEMAS: Dict[str, List[tuple]] = {
+    "contacts": [("ID", "str"), ("Nom", "str"), ("Prenom", "str"), ("Email", "str"), ("Telephone", "str"),
+                 ("Type", "category"), ("Statut", "category"), ("Entreprise", "str"), ("Fonction", "str"),
+                 ("Pays", "category"), ("Ville", "category"), ("Top20", "bool"), *AUDIT, ("Genre", "category")],
+    "entreprises": [("ID_Entreprise", "str"), ("Nom_Entreprise", "str"), ("Secteur", "category"),
+                    ("Contact_Principal_ID", "str"), ("CA_Annuel", "fcfa"), ("Nb_Employes", "int"),
+                    ("Pays", "category"), ("Ville", "category"), *AUDIT],
+    "events": [("ID_Événement", "str"), ("Nom_Événement", "str"), ("Type", "category"), ("Date", "date"),
+               ("Ville", "category"), ("Pays", "category"),
+               ("Cout_Salle", "fcfa"), ("Cout_Formateur", "fcfa"), ("Cout_Logistique", "fcfa"),
+               ("Cout_Pub", "fcfa"), ("Cout_Autres", "fcfa"), ("Cout_Total", "fcfa"), *AUDIT],
+    "parts": [("ID_Participation", "str"), ("ID", "str"), ("ID_Événement", "str"), ("Rôle", "category"),
+              ("Note", "str"), *AUDIT],
+    "pay": [("ID_Paiement", "str"), ("ID", "str"), ("ID_Événement", "str"), ("Montant", "fcfa"),
+            ("Statut", "category"), ("Date_Paiement", "date"), *AUDIT],
+    "cert": [("ID_Certif", "str"), ("ID", "str"), ("Intitulé", "str"), ("Résultat", "category"),
+             ("Date_Obtention", "date"), ("Date_Examen", "date"), *AUDIT],
+    "inter": [("ID_Interaction", "str"), ("ID", "str"), ("Canal", "category"), ("Objet", "str"), ("Date", "date"),
+              ("Responsable", "category"), ("Cible", "category"), ("ID_Cible", "str"), *AUDIT],
+    "entreprise_parts": [("ID_EntPart", "str"), ("ID_Entreprise", "str"), ("ID_Événement", "str"),
+                         ("Type_Lien", "category"), ("Nb_Employes", "int"), ("Sponsoring_FCFA", "fcfa"), *AUDIT],
+    "params": [("key", "str"), ("value", "str")],
+    "users": [("user_id", "str"), ("email", "str"), ("password_hash", "str"), ("role", "category"),
+              ("is_active", "bool"), ("display_name", "str"), *AUDIT],
+}
+
+# Colonnes hors registre rencontrées dans les fichiers existants
+EXTRA_TYPES = {"Date_Creation": "date"}
+
+TRUE_VALUES = {"1", "true", "vrai", "oui", "yes", "x"}
+FALSE_VALUES = {"0", "false", "faux", "non", "no"}
+
+def columns(name: str) -> List[str]:
+    return [c for c, _ in SCHEMAS.get(name, [])]
+
+def dtypes(name: Optional[str] = None) -> Dict[str, str]:
+    """{colonne: type} d'une table, ou de toutes les tables (par nom de colonne) si name=None."""
+    if name is not None:
+        return dict(SCHEMAS.get(name, []))
+    out = dict(EXTRA_TYPES)
+    for spec in SCHEMAS.values():
+        out.update(spec)
+    return out
+
+def parse_date(col: pd.Series) -> pd.Series:
+    """Texte -> datetime (NaT : vide ou illisible). ISO 8601 d'abord, puis JJ/MM/AAAA (saisie de
+       l'application) : jour en premier, jamais le mois."""
+    s = col.fillna("").astype(str).str.strip()
+    filled = s != ""
+    out = pd.to_datetime(s.where(filled), errors="coerce", format="ISO8601")
+    rest = filled & out.isna()
+    if rest.any():
+        out[rest] = pd.to_datetime(s[rest], errors="coerce", dayfirst=True, format="mixed")
+    return out
+
+def parse_number(col: pd.Series) -> pd.Series:
+    """Texte -> nombre ("2 500", "1,5" acceptés ; NaN : vide ou illisible)."""
+    s = col.fillna("").astype(str).str.strip()
+    return pd.to_numeric(s.str.replace(r"[\s\u00a0]", "", regex=True).str.replace(",", ".", regex=False)
+                         .where(s != ""), errors="coerce")
+
+def as_dates(col: pd.Series) -> pd.Series:
+    """Colonne de dates : telle quelle si déjà typée au chargement (to_typed), parse_date sinon
+       (colonne restée en texte parce qu'une valeur ne se convertit pas)."""
+    return col if pd.api.types.is_datetime64_any_dtype(col) else parse_date(col)
+
+def as_numbers(col: pd.Series) -> pd.Series:
+    """Montants / entiers : tels quels si déjà typés au chargement, parse_number sinon."""
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return col
+    return parse_number(col)
+
+def _parse(col: pd.Series, kind: str) -> Optional[pd.Series]:
+    """Texte -> type `kind`, ou None si une valeur non vide ne se convertit pas (colonne laissée en texte)."""
+    s = col.fillna("").astype(str).str.strip()
+    filled = s != ""
+    if kind in ("date", "timestamp"):
+        out = parse_date(s)
+        if kind == "date" and (out.dropna() != out.dropna().dt.normalize()).any():
+            return None  # une heure serait perdue au format AAAA-MM-JJ
+    elif kind in ("fcfa", "int"):
+        num = parse_number(s)
+        if (num.dropna() % 1 != 0).any():
+            return None
+        out = num.astype("Int64")
+    elif kind == "bool":
+        low = s.str.lower()
+        if not low[filled].isin(TRUE_VALUES | FALSE_VALUES).all():
+            return None
+        out = low.isin(TRUE_VALUES).astype("boolean")
+    elif kind == "category":
+        return s.astype(pd.CategoricalDtype(sorted(set(s) | {""})))  # "" inclus : fillna("") reste valide
+    else:
+        return s
+    if out[filled].isna().any():
+        return None
+    return out
+
+def to_typed(df: pd.DataFrame, name: Optional[str] = None) -> pd.DataFrame:
+    """Texte -> colonnes typées selon le registre (table `name`, ou par nom de colonne).
+       Sans perte : une colonne dont une valeur ne se convertit pas reste en texte ; le texte d'origine
+       d'une valeur convertie se retrouve à l'écriture via to_text(source=…)."""
+    kinds = dtypes(name) if name is not None else dtypes()
+    out = df.copy()
+    for c in out.columns:
+        kind = kinds.get(c, EXTRA_TYPES.get(c))
+        parsed = _parse(out[c], kind) if kind and kind != "str" else None
+        out[c] = parsed if parsed is not None else out[c].fillna("").astype(str)
+    return out
+
+def _canonical(col: pd.Series, kind: Optional[str]) -> pd.Series:
+    """Colonne typée -> texte canonique."""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        fmt = "%Y-%m-%d %H:%M:%S" if kind == "timestamp" else "%Y-%m-%d"
+        return col.dt.strftime(fmt).fillna("").astype(object)
+    if pd.api.types.is_bool_dtype(col):
+        return col.map({True: "1", False: ""}).astype(object).where(col.notna(), "")
+    return col.astype("object").where(col.notna(), "").astype(str)
+
+def to_text(df: pd.DataFrame, name: Optional[str] = None, source: Optional[pd.DataFrame] = None,
+            key: Optional[str] = None) -> pd.DataFrame:
+    """Colonnes typées -> texte canonique (même forme que la lecture CSV dtype=str).
+       `source` : texte d'origine de la table (lignes identifiées par `key`) ; une cellule dont la valeur n'a
+       pas changé garde son texte d'origine ("007", "oui", "03/04/2024"…), seules les cellules modifiées ou
+       ajoutées prennent la forme canonique."""
+    kinds = dtypes(name) if name is not None else dtypes()
+    out = df.copy()
+    typed = [c for c in out.columns if not pd.api.types.is_object_dtype(out[c].dtype)]
+    for c in out.columns:
+        out[c] = _canonical(out[c], kinds.get(c))
+    if source is None or not key or key not in out.columns or key not in source.columns:
+        return out
+    src = source[~source[key].astype(str).duplicated(keep="last")]
+    src = src.set_index(src[key].astype(str))
+    found = out[key].astype(str).isin(src.index).to_numpy()
+    for c in typed:
+        if c not in src.columns or not found.any():
+            continue
+        orig = src[c].reindex(out[key].astype(str)).fillna("").astype(str)
+        parsed = _parse(orig, kinds.get(c))
+        if parsed is None:
+            continue
+        keep = found & (_canonical(parsed, kinds.get(c)).to_numpy() == out[c].to_numpy())
+        out[c] = out[c].where(~keep, orig.to_numpy())
+    return out
+
+def is_typed(df: pd.DataFrame) -> bool:
+    return not all(pd.api.types.is_object_dtype(dt) or pd.api.types.is_string_dtype(dt) for dt in df.dtypes)
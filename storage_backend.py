@@ -1,12 +1,21 @@
-# storage_backend.py — accès unifié CSV / Google Sheets + ETag simple
+# storage_backend.py — accès unifié CSV / Parquet / SQLite / Google Sheets + ETag simple
 from __future__ import annotations
-import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 import pandas as pd
 import streamlit as st
 
+import schema
+
 # gspread_dataframe (optional)
 try:
     from gspread_dataframe import set_with_dataframe as _set_with_dataframe_gs
@@ -15,6 +24,62 @@ except Exception:
     _set_with_dataframe_gs = None
     _get_as_dataframe_gs = None
 
+# Miroir local des onglets Google Sheets (optional)
+try:
+    import gs_cache
+except Exception:
+    gs_cache = None
+
+# Écriture différée (optional)
+try:
+    import write_behind
+except Exception:
+    write_behind = None
+
+# Journal d'écriture anticipée des tables CSV (optional)
+try:
+    import wal
+except Exception:
+    wal = None
+
+# Flux des modifications (optional)
+try:
+    import changefeed
+except Exception:
+    changefeed = None
+
+# Jeu de données partagé entre sessions (optional)
+try:
+    import dataset_store
+except Exception:
+    dataset_store = None
+
+# Contexte Streamlit des threads de chargement (optional : API interne selon les versions)
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except Exception:
+    add_script_run_ctx = get_script_run_ctx = None
+
+# Verrous inter-process (optional : absent sous Windows, les écritures restent atomiques)
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+# pyarrow (optional, backend 'parquet')
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except Exception:
+    HAS_PARQUET = False
+
+# zstandard (optional, compression zstd des CSV)
+try:
+    import zstandard  # noqa: F401
+    HAS_ZSTD = True
+except Exception:
+    HAS_ZSTD = False
+
 AUDIT_COLS = ["Created_At","Created_By","Updated_At","Updated_By"]
 SHEET_NAME = {
     "contacts":"contacts",
@@ -29,29 +94,1266 @@ SHEET_NAME = {
     "entreprise_parts":"entreprise_participations",
 }
 
+# Clé de ligne de chaque table (INSERT/UPDATE ligne à ligne) et clés de jointure indexées
+ROW_KEYS = {
+    "contacts":"ID",
+    "inter":"ID_Interaction",
+    "events":"ID_Événement",
+    "parts":"ID_Participation",
+    "pay":"ID_Paiement",
+    "cert":"ID_Certif",
+    "entreprises":"ID_Entreprise",
+    "params":"key",
+    "users":"user_id",
+    "entreprise_parts":"ID_EntPart",
+}
+JOIN_KEYS = ["ID","ID_Événement","ID_Entreprise"]
+SQLITE_FILE = "iiba_crm.sqlite"
+
+# Types des colonnes (Parquet, vues typées) : voir schema.py
+# ---------- État de session ----------
+# Les fonctions de ce module lisent/écrivent ETags et bases de fusion dans st.session_state. Le thread
+# d'écriture différée (write_behind) n'a pas de session : il fournit son propre état via
+# session_state_override().
+_LOCAL = threading.local()
+
+def _state():
+    override = getattr(_LOCAL, "state", None)
+    return override if override is not None else st.session_state
+
+@contextmanager
+def session_state_override(state: dict):
+    """Utilise `state` à la place de st.session_state dans le thread courant."""
+    previous = getattr(_LOCAL, "state", None)
+    _LOCAL.state = state
+    try:
+        yield state
+    finally:
+        _LOCAL.state = previous
+
+def _detached() -> bool:
+    """Hors session (thread write_behind) : personne pour voir un avertissement ni recharger la page."""
+    return getattr(_LOCAL, "state", None) is not None
+
+def _session_user() -> str:
+    user = _state().get("auth_user") or {}
+    return str(user.get("email") or user.get("user_id") or "system") if isinstance(user, dict) else "system"
+
+class WriteConflictError(RuntimeError):
+    """Conflit non fusionnable rencontré hors session (pas d'utilisateur à qui demander de recharger)."""
+
 def _backend_effective() -> str:
     """Lecture prioritaire depuis session (override quand GSheets down), sinon secrets."""
-    b = st.session_state.get("BACKEND_EFFECTIVE", "").strip().lower()
+    b = _state().get("BACKEND_EFFECTIVE", "").strip().lower()
     if b:
         return b
     return st.secrets.get("storage_backend","csv").strip().lower()
 
+# ---------- ETag : somme (mod 2**64) des hachages de lignes ----------
+# Indépendant de l'ordre des lignes et des colonnes ; un ajout/une modification de lignes
+# se répercute sans rehacher la table (etag_add_rows / etag_replace_rows).
+_ETAG_PREFIX = "rh"
+_MASK64 = (1 << 64) - 1
+
+def _row_hashes(df: pd.DataFrame) -> "pd.Series":
+    norm = df.reindex(columns=sorted(map(str, df.columns)))
+    # Texte sans valeur manquante (cas courant, lecture dtype=str) : haché tel quel, sans copie ; les autres
+    # colonnes sont normalisées comme avant (fillna("") puis texte) : mêmes hachages, mêmes ETags
+    todo = [c for c in norm.columns if norm[c].dtype != object or norm[c].hasnans]
+    if todo:
+        norm = norm.assign(**{c: norm[c].fillna("").astype(str) for c in todo})
+    return pd.util.hash_pandas_object(norm, index=False)
+
+def _format_etag(n: int, total: int) -> str:
+    return "empty" if n <= 0 else f"{_ETAG_PREFIX}-{n}-{total & _MASK64:016x}"
+
+def _parse_etag(etag: str) -> Optional[tuple]:
+    if etag == "empty":
+        return 0, 0
+    try:
+        prefix, n, total = str(etag).split("-")
+        if prefix == _ETAG_PREFIX:
+            return int(n), int(total, 16)
+    except Exception:
+        pass
+    return None
+
+def _hash_sum(df: pd.DataFrame) -> int:
+    # Somme en uint64 (débordement = modulo 2**64 voulu)
+    return int(_row_hashes(df).to_numpy().sum(dtype="uint64")) if len(df) else 0
+
 def compute_etag(df: pd.DataFrame, name: str) -> str:
     try:
         if df is None or df.empty:
             return "empty"
-        cols = [c for c in df.columns if c.lower() in {"id","updated_at","id_événement","user_id"}]
-        if cols:
-            payload = df[cols].astype(str).fillna("").sort_values(by=cols).to_csv(index=False)
-        else:
-            payload = df.astype(str).fillna("").to_csv(index=False)
-        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return _format_etag(len(df), _hash_sum(df))
+    except Exception:
+        return "empty"
+
+def etag_add_rows(etag: str, rows: pd.DataFrame) -> Optional[str]:
+    """ETag après ajout de `rows` (mêmes colonnes que la table) ; None si l'ETag n'est pas incrémental."""
+    parsed = _parse_etag(etag)
+    if parsed is None:
+        return None
+    n, total = parsed
+    return _format_etag(n + len(rows), total + _hash_sum(rows))
+
+def etag_replace_rows(etag: str, old_rows: pd.DataFrame, new_rows: pd.DataFrame) -> Optional[str]:
+    """ETag après remplacement de `old_rows` par `new_rows` (mise à jour ou suppression si new_rows vide)."""
+    parsed = _parse_etag(etag)
+    if parsed is None:
+        return None
+    n, total = parsed
+    return _format_etag(n - len(old_rows) + len(new_rows), total - _hash_sum(old_rows) + _hash_sum(new_rows))
+
+# ---------- Verrous par table et écritures atomiques ----------
+# Plusieurs process (workers Streamlit, scripts sur ./data) : verrou fcntl par table sur <table>.lock,
+# exclusif pour écrire (vérification d'ETag comprise), partagé pour parser. Les lectures servies par le
+# cache process ou un instantané ne prennent aucun verrou.
+def _lock_path(path: Path) -> Path:
+    return path.with_name(path.name + ".lock")
+
+@contextmanager
+def table_lock(path: Path, shared: bool = False):
+    """Verrou de la table stockée dans `path`. Réentrant dans un même thread (un verrou exclusif couvre
+       les lectures et écritures imbriquées)."""
+    path = Path(path)
+    held = getattr(_LOCAL, "locks", None)
+    if held is None:
+        held = _LOCAL.locks = {}
+    key = str(path.resolve())
+    if key in held:
+        if held[key] == "sh" and not shared:
+            raise RuntimeError(f"Verrou partagé de {path.name} détenu : passage en exclusif impossible")
+        yield
+        return
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(_lock_path(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[key] = "sh" if shared else "ex"
+        try:
+            yield
+        finally:
+            held.pop(key, None)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+def _fsync_dir(directory: Path) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _atomic_replace(path: Path, write) -> None:
+    """write(tmp) puis fsync + os.replace : un lecteur (ou un arrêt brutal) voit l'ancien fichier
+       ou le nouveau, jamais un fichier à moitié écrit."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp)
+        with open(tmp, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    _fsync_dir(path.parent)
+
+def write_csv_atomic(path: Path, df: pd.DataFrame) -> None:
+    """Écriture CSV atomique (scripts de maintenance : à appeler sous table_lock). Compressé selon
+       l'extension (.csv.gz, .csv.zst)."""
+    opts = _csv_compression(Path(path))
+    _atomic_replace(Path(path), lambda tmp: df.to_csv(tmp, index=False, encoding="utf-8", compression=opts))
+
+# ---------- Sidecar CSV (nb lignes + ETag) ----------
+def _meta_path(path: Path) -> Path:
+    return path.with_name(path.name + ".meta.json")
+
+def _read_meta(path: Path) -> Optional[dict]:
+    """Renvoie le sidecar si il correspond encore au fichier (taille + mtime), sinon None."""
+    try:
+        meta = json.loads(_meta_path(path).read_text(encoding="utf-8"))
+        stt = path.stat()
+        if meta.get("size") == stt.st_size and meta.get("mtime_ns") == stt.st_mtime_ns:
+            return meta
+    except Exception:
+        pass
+    return None
+
+def _write_meta(path: Path, rows: int, etag: str) -> None:
+    try:
+        stt = path.stat()
+        meta = {"rows": int(rows), "size": stt.st_size, "mtime_ns": stt.st_mtime_ns, "etag": etag}
+        _atomic_replace(_meta_path(path), lambda tmp: tmp.write_text(json.dumps(meta), encoding="utf-8"))
+    except Exception:
+        pass
+
+# ---------- Compression des CSV ----------
+# secrets: table_compression = "gzip" | "zstd" : chaque table est stockée en <table>.csv.gz / .csv.zst
+# (converti au premier accès, ETag inchangé). pandas décompresse en flux à la lecture ; sidecar, journal,
+# verrou et instantané suivent le nom du fichier compressé. users/parametres restent en clair : petits,
+# et lus directement par les scripts de maintenance (fix_admin_urgent.py).
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+UNCOMPRESSED_TABLES = {"users", "params"}
+CSV_COMPRESSION_OPTS = {"gzip": {"method": "gzip", "compresslevel": 6, "mtime": 0},
+                        "zstd": {"method": "zstd", "level": 3}}
+
+def _compression() -> str:
+    """secrets: table_compression (défaut "" : CSV en clair). zstd sans le paquet zstandard : gzip."""
+    try:
+        codec = str(st.secrets.get("table_compression", "") or "").strip().lower()
+    except Exception:
+        codec = ""
+    if codec == "zstd" and not HAS_ZSTD:
+        codec = "gzip"
+    return codec if codec in COMPRESSED_SUFFIXES else ""
+
+def _codec_of(path: Path) -> Optional[str]:
+    return next((c for c, suffix in COMPRESSED_SUFFIXES.items() if path.name.endswith(".csv" + suffix)), None)
+
+def _is_csv(path: Path) -> bool:
+    return path.suffix == ".csv" or _codec_of(path) is not None
+
+def _plain_path(path: Path) -> Path:
+    """interactions.csv.gz -> interactions.csv"""
+    codec = _codec_of(path)
+    return path.with_name(path.name[:-len(COMPRESSED_SUFFIXES[codec])]) if codec else path
+
+def _csv_compression(path: Path) -> Optional[dict]:
+    codec = _codec_of(path)
+    return dict(CSV_COMPRESSION_OPTS[codec]) if codec else None
+
+def _stored_csv_path(name: str, path: Path) -> Path:
+    """Fichier effectif d'une table CSV : variante compressée si configurée (conversion du fichier existant
+       au premier accès) ; sans compression configurée, une table déjà compressée est lue telle quelle."""
+    codec = _compression() if name not in UNCOMPRESSED_TABLES else ""
+    variants = [path.with_name(path.name + s) for s in COMPRESSED_SUFFIXES.values()]
+    if not codec:
+        return path if path.exists() else next((v for v in variants if v.exists()), path)
+    target = path.with_name(path.name + COMPRESSED_SUFFIXES[codec])
+    if not target.exists():
+        source = next((v for v in [path] + variants if v != target and v.exists()), None)
+        if source is not None:
+            _convert_csv(name, source, target)
+    return target
+
+def _convert_csv(name: str, source: Path, target: Path) -> None:
+    """Réécrit la table de `source` dans `target` (autre compression) puis retire `source` et ses annexes."""
+    with table_lock(source), table_lock(target):
+        if target.exists() or not source.exists():
+            return
+        _wal_checkpoint(name, source)  # journal compacté : `source` contient toute la table
+        df = _read_table_file(source)
+        meta = _read_meta(source)
+        write_csv_atomic(target, df)
+        _write_meta(target, len(df), meta["etag"] if meta else compute_etag(df, name))
+        for old in (source, _meta_path(source), _snapshot_path(source)):
+            old.unlink(missing_ok=True)
+        _cache_drop(source)
+
+def _append_csv_rows(path: Path, rows: pd.DataFrame) -> None:
+    """Ajoute des lignes en fin de CSV (sous table_lock exclusif, fsync). CSV compressé : fichier réécrit
+       (atomique) ; un ajout en place laisserait un flux tronqué illisible en cas d'arrêt brutal."""
+    if _codec_of(path):
+        write_csv_atomic(path, pd.concat([_read_table_file(path), rows], ignore_index=True))
+        return
+    payload = rows.to_csv(index=False, header=False)
+    with open(path, "rb+") as fh:
+        fh.seek(0, os.SEEK_END)
+        if fh.tell() > 0:
+            fh.seek(-1, os.SEEK_END)
+            if fh.read(1) != b"\n":
+                fh.write(b"\n")
+        fh.write(payload.encode("utf-8"))
+        fh.flush()
+        os.fsync(fh.fileno())
+
+def storage_footprint(paths: Optional[Dict[str, Path]] = None) -> list:
+    """Taille sur disque de chaque table locale (diagnostic de la compression)."""
+    out = []
+    for name in SHEET_NAME:
+        path = _table_path(name, paths, "csv")
+        if path.exists():
+            meta = _read_meta(path) or {}
+            out.append({"table": name, "fichier": path.name, "octets": path.stat().st_size, "lignes": meta.get("rows")})
+    return out
+
+# ---------- Parquet (colonnes typées) ----------
+def _to_typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Texte -> types Parquet (registre schema.py ; une colonne non convertible reste en texte)."""
+    return schema.to_typed(df)
+
+def _to_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Types Parquet -> texte (même forme que la lecture CSV dtype=str)."""
+    return schema.to_text(df)
+
+def _parquet_path(name: str, paths: Optional[Dict[str, Path]] = None) -> Path:
+    path = (paths or {}).get(name, Path(f"data/{name}.csv"))
+    return path.with_suffix(".parquet")
+
+def _read_table_file(path: Path, columns=None) -> pd.DataFrame:
+    """Lecture brute (texte) d'un fichier de table, CSV ou Parquet selon l'extension."""
+    if path.suffix == ".parquet":
+        if columns:
+            import pyarrow.parquet as pq
+            present = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in present]
+        return _to_text(pd.read_parquet(path, columns=columns))
+    usecols = (lambda c: c in set(columns)) if columns else None
+    return pd.read_csv(path, dtype=str, usecols=usecols).fillna("")  # .gz / .zst : décompression en flux
+
+def _write_table_file(path: Path, df: pd.DataFrame) -> None:
+    if path.suffix == ".parquet":
+        _atomic_replace(path, lambda tmp: _to_typed(df).to_parquet(tmp, index=False))
+    else:
+        write_csv_atomic(path, df)
+        if wal is not None:
+            wal.reset(path)  # le fichier contient toute la table : journal obsolète
+
+def csv_to_parquet(csv_path: Path, parquet_path: Optional[Path] = None) -> int:
+    """Convertit un CSV existant en Parquet typé ; renvoie le nombre de lignes migrées."""
+    parquet_path = parquet_path or csv_path.with_suffix(".parquet")
+    df = pd.read_csv(csv_path, dtype=str).fillna("")
+    _write_table_file(parquet_path, df)
+    _write_meta(parquet_path, len(df), compute_etag(_read_table_file(parquet_path), parquet_path.stem))
+    return len(df)
+
+def _file_base_etag(path: Path, columns) -> str:
+    """ETag du fichier seul : sidecar si valide, sinon relecture complète (fichier modifié hors app)."""
+    meta = _read_meta(path)
+    if meta is not None:
+        return meta.get("etag", "empty")
+    try:
+        cur = _read_table_file(path)
+    except Exception:
+        cur = pd.DataFrame(columns=columns)
+    etag = compute_etag(cur, path.stem)
+    if path.exists():
+        _write_meta(path, len(cur), etag)
+    return etag
+
+# ---------- Cache process (empreinte stat des fichiers) ----------
+# Partagé par toutes les sessions ; survit à importlib.reload(storage_backend) fait par les pages.
+_FILE_CACHE: Dict[str, tuple] = globals().get("_FILE_CACHE", {})
+_FILE_CACHE_LOCK = globals().get("_FILE_CACHE_LOCK", threading.Lock())
+
+def _stat_fingerprint(path: Path) -> Optional[tuple]:
+    try:
+        stt = path.stat()
+        return (stt.st_mtime_ns, stt.st_size, stt.st_ino)
+    except OSError:
+        return None
+
+def _cache_get(path: Path, fp: Optional[tuple]):
+    """(df, etag) si le fichier n'a pas bougé depuis la dernière lecture, sinon None."""
+    if fp is None:
+        return None
+    with _FILE_CACHE_LOCK:
+        hit = _FILE_CACHE.get(str(path))
+    if hit is not None and hit[0] == fp:
+        return hit[1], hit[2]
+    return None
+
+def _cache_put(path: Path, fp: Optional[tuple], df: pd.DataFrame, etag: str) -> None:
+    if fp is None:
+        return
+    with _FILE_CACHE_LOCK:
+        _FILE_CACHE[str(path)] = (fp, df, etag)
+
+def _cache_drop(path: Path) -> None:
+    with _FILE_CACHE_LOCK:
+        _FILE_CACHE.pop(str(path), None)
+
+def clear_file_cache() -> None:
+    """Vide le cache process (ex. après une modification manuelle de ./data)."""
+    with _FILE_CACHE_LOCK:
+        _FILE_CACHE.clear()
+
+# ---------- Instantanés Arrow (démarrage à froid) ----------
+# Après un redémarrage, la première lecture d'une table lit son instantané Arrow/Feather (non compressé,
+# lu en memory-map) au lieu de reparser le CSV. L'instantané porte l'empreinte stat du fichier source
+# dans ses métadonnées : fichier modifié depuis = instantané ignoré (puis réécrit).
+SNAPSHOT_DIR = ".snapshots"
+_SNAPSHOT_META = b"iiba_snapshot"
+
+def _snapshots_on() -> bool:
+    """secrets: table_snapshots (défaut true si pyarrow est installé)."""
+    if not HAS_PARQUET:
+        return False
+    try:
+        return bool(st.secrets.get("table_snapshots", True))
+    except Exception:
+        return True
+
+def _snapshot_path(path: Path) -> Path:
+    return path.parent / SNAPSHOT_DIR / f"{path.name}.arrow"
+
+def _snapshot_read(path: Path, fp: Optional[tuple], columns=None) -> Optional[Tuple[pd.DataFrame, Optional[str]]]:
+    """(df texte, ETag) depuis l'instantané de `path` s'il a été pris sur cette version du fichier, sinon None."""
+    if fp is None or not _snapshots_on():
+        return None
+    try:
+        import pyarrow.feather as feather
+        snap = _snapshot_path(path)
+        table = feather.read_table(snap, memory_map=True)
+        meta = json.loads(table.schema.metadata[_SNAPSHOT_META])
+        if tuple(meta.get("source_fp", ())) != tuple(fp):
+            return None
+        if columns:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table.to_pandas(), meta.get("etag")
+    except Exception:
+        return None
+
+def _snapshot_write(path: Path, fp: Optional[tuple], df: pd.DataFrame, etag: Optional[str]) -> None:
+    """Écrit l'instantané (fichier temporaire + os.replace : données et empreinte changent ensemble)."""
+    if fp is None or not _snapshots_on():
+        return
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        snap = _snapshot_path(path)
+        snap.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df.fillna("").astype(str), preserve_index=False)
+        meta = {"source_fp": list(fp), "etag": etag, "rows": int(len(df))}
+        table = table.replace_schema_metadata({_SNAPSHOT_META: json.dumps(meta).encode("utf-8")})
+        tmp = snap.with_name(snap.name + ".tmp")
+        # Non compressé : memory-map possible ; zstd si les tables sont compressées (disque avant vitesse)
+        feather.write_feather(table, tmp, compression="zstd" if _compression() else "uncompressed")
+        os.replace(tmp, snap)
+    except Exception:
+        pass
+
+# ---------- Journal d'écriture anticipée (CSV) ----------
+# secrets: table_wal = true : un save ou un ajout sur une table CSV à clé ne réécrit plus le fichier, il ajoute
+# une transaction (insert/update/delete ligne à ligne, colonnes d'audit comprises) à data/.wal/<fichier>.wal,
+# fsync compris (voir wal.py). Les lectures rejouent le journal sur le fichier (ou son instantané) ; la
+# compaction réécrit le fichier puis vide le journal : au premier chargement de la table dans le process
+# (reprise après arrêt), au-delà des seuils wal.CHECKPOINT_MAX_*, ou via checkpoint_table().
+_WAL_RECOVERED = globals().get("_WAL_RECOVERED", set())
+
+def _wal_on() -> bool:
+    """secrets: table_wal (défaut false : le CSV reste à jour pour les outils qui le lisent directement)."""
+    if wal is None:
+        return False
+    try:
+        return bool(st.secrets.get("table_wal", False))
+    except Exception:
+        return False
+
+def _table_fingerprint(path: Path) -> Optional[tuple]:
+    """Empreinte stat du fichier et de son journal : la table a changé si l'un ou l'autre a bougé."""
+    fp = _stat_fingerprint(path)
+    if fp is None or wal is None:
+        return fp
+    jfp = _stat_fingerprint(wal.wal_path(path))
+    return fp if jfp is None else fp + jfp
+
+def _wal_pending(path: Path, base_etag: str) -> list:
+    """Transactions à rejouer sur le fichier d'ETag `base_etag` : [] si aucune, si le journal est déjà
+       compacté (arrêt entre réécriture et purge) ou s'il porte sur une autre version du fichier."""
+    if wal is None or not _is_csv(path):
+        return []
+    records = wal.read(path)
+    if not records or records[-1]["etag"] == base_etag or records[0]["base"] != base_etag:
+        return []
+    return records
+
+def _file_current_etag(path: Path, columns) -> str:
+    """ETag courant de la table : celui du fichier, ou celui de la dernière transaction du journal."""
+    base = _file_base_etag(path, columns)
+    records = _wal_pending(path, base)
+    return records[-1]["etag"] if records else base
+
+def _wal_apply(name: str, path: Path, df: pd.DataFrame, base_etag: str) -> Tuple[pd.DataFrame, str]:
+    """(df, ETag) après rejeu du journal sur `df`, contenu du fichier d'ETag `base_etag`."""
+    records = _wal_pending(path, base_etag)
+    key = ROW_KEYS.get(name)
+    if not records or not _keyed(df, key):
+        return df, base_etag
+    return wal.replay(df, records, key), records[-1]["etag"]
+
+def _read_current(name: str, path: Path, columns=None) -> pd.DataFrame:
+    """Contenu courant de la table (fichier + journal) ; à lire sous table_lock."""
+    key = ROW_KEYS.get(name)
+    want = (list(columns) + ([key] if key and key not in columns else [])) if columns else None
+    df = _read_table_file(path, columns=want)
+    if wal is not None and _is_csv(path) and wal.wal_path(path).exists():
+        df, _ = _wal_apply(name, path, df, _file_base_etag(path, list(df.columns)))
+    return df[[c for c in columns if c in df.columns]] if columns else df
+
+def _current_frame(name: str, path: Path) -> pd.DataFrame:
+    """État stocké : cache process s'il est à jour, sinon relecture (fichier + journal)."""
+    hit = _cache_get(path, _table_fingerprint(path))
+    return hit[0] if hit is not None else _read_current(name, path)
+
+def _wal_ops(name: str, path: Path, df: pd.DataFrame, current: pd.DataFrame) -> Optional[list]:
+    """Opérations qui mènent de `current` (état stocké) à `df` ; None si la table ne se journalise pas
+       (journal désactivé, Parquet, table sans clé, colonnes ajoutées/retirées) : réécriture complète."""
+    key = ROW_KEYS.get(name)
+    if (not _wal_on() or not _is_csv(path) or not path.exists() or not _keyed(df, key)
+            or not _keyed(current, key) or set(map(str, current.columns)) != set(map(str, df.columns))):
+        return None
+    inserted, (_, updated), deleted = _row_diff(current, df, key)
+    user = _session_user()
+    return (wal.row_ops("insert", inserted, key, user) + wal.row_ops("update", updated, key, user)
+            + wal.delete_ops(deleted[key].astype(str), user))
+
+def _wal_append(path: Path, ops: list, base_etag: str, etag: str) -> None:
+    """Ajoute une transaction (sous table_lock exclusif). Un journal sans transaction à rejouer sur ce fichier
+       (déjà compacté, ou orphelin : mis de côté) est d'abord vidé, sinon il masquerait la nouvelle."""
+    if not _wal_pending(path, base_etag):
+        records = wal.read(path)
+        wal.reset(path, keep=bool(records) and records[-1]["etag"] != base_etag and records[0]["base"] != base_etag)
+    wal.append(path, ops, base=base_etag, etag=etag)
+
+def _wal_checkpoint(name: str, path: Path, df: Optional[pd.DataFrame] = None, etag: Optional[str] = None) -> bool:
+    """Compaction, sous table_lock exclusif : fichier réécrit avec l'état courant (`df` s'il est connu),
+       journal vidé. Un journal qui ne correspond pas au fichier est mis de côté (.orphan), jamais rejoué."""
+    if wal is None or not _is_csv(path) or not wal.wal_path(path).exists():
+        return False
+    if df is None:
+        raw = _read_table_file(path)
+        base = _file_base_etag(path, list(raw.columns))
+        records = wal.read(path)
+        if not records or records[-1]["etag"] == base:
+            wal.reset(path)  # vide, ou déjà compacté
+            return False
+        if records[0]["base"] != base or not _keyed(raw, ROW_KEYS.get(name)):
+            wal.reset(path, keep=True)
+            return False
+        df, etag = wal.replay(raw, records, ROW_KEYS[name]), records[-1]["etag"]
+    _write_table_file(path, df)  # purge le journal
+    _write_meta(path, len(df), etag)
+    _cache_drop(path)
+    return True
+
+def _wal_maybe_checkpoint(name: str, path: Path, df: Optional[pd.DataFrame] = None,
+                          etag: Optional[str] = None) -> None:
+    """Compaction si le journal dépasse les seuils (sous table_lock exclusif)."""
+    if wal is not None and wal.needs_checkpoint(path, wal.read(path)):
+        _wal_checkpoint(name, path, df, etag)
+
+def _wal_recover(name: str, path: Path) -> None:
+    """Premier chargement de la table dans ce process : journal laissé par le process précédent compacté."""
+    if wal is None or not _is_csv(path) or str(path) in _WAL_RECOVERED:
+        return
+    _WAL_RECOVERED.add(str(path))
+    if wal.wal_path(path).exists():
+        with table_lock(path):
+            _wal_checkpoint(name, path)
+
+def checkpoint_table(name: str, paths: Optional[Dict[str, Path]] = None) -> bool:
+    """Compacte le journal de la table dans son CSV (maintenance ; scripts qui lisent le CSV directement)."""
+    path = _table_path(name, paths, "csv")
+    with table_lock(path):
+        return _wal_checkpoint(name, path)
+
+def wal_status(paths: Optional[Dict[str, Path]] = None) -> list:
+    base = next(iter((paths or {}).values()), Path("data/contacts.csv"))
+    return wal.status(base.parent) if wal is not None else []
+
+# ---------- Flux des modifications (CDC) ----------
+# Chaque écriture réussie publie ses insert/update/delete (avant/après, auteur, ETag) dans data/.changes
+# (voir changefeed.py), dans l'ordre des écritures sur la table (publication sous son verrou en CSV).
+# Les vues dérivées s'abonnent (changefeed.subscribe, change_subscription) au lieu de relire les tables.
+def _changes_on() -> bool:
+    """secrets: change_log (défaut true)."""
+    if changefeed is None:
+        return False
+    try:
+        return bool(st.secrets.get("change_log", True))
+    except Exception:
+        return True
+
+def _changes_dir(paths: Optional[Dict[str, Path]]) -> Path:
+    base = next(iter((paths or {}).values()), Path("data/contacts.csv"))
+    return base.parent / ".changes"
+
+def _publish_changes(name: str, events: list, paths: Optional[Dict[str, Path]], etag: Optional[str]) -> None:
+    log_dir = _changes_dir(paths)
+    try:
+        changefeed.publish(events, etag, log_dir=log_dir, lock=table_lock(log_dir / "changes"))
+    except Exception as e:
+        st.warning(f"Flux des modifications non publié ({name}) : {e}")
+
+def _emit_changes(name: str, before: Optional[pd.DataFrame], after: pd.DataFrame,
+                  paths: Optional[Dict[str, Path]], etag: Optional[str] = None) -> None:
+    """Publie les opérations qui mènent de `before` (état stocké avant l'écriture) à `after`. Sans clé
+       exploitable : un seul événement 'reload' (les abonnés relisent la table)."""
+    if not _changes_on():
+        return
+    key = ROW_KEYS.get(name)
+    user = _session_user()
+    diff = _row_diff(before, after, key) if before is not None else None
+    if diff is None:
+        events = [{"table": name, "op": "reload", "key": None, "before": None, "after": None, "user": user}]
+    else:
+        inserted, (old, new), deleted = diff
+        events = (changefeed.row_events(name, "insert", inserted, key, user)
+                  + changefeed.row_events(name, "update", new, key, user, before=old)
+                  + changefeed.row_events(name, "delete", None, key, user, before=deleted))
+    _publish_changes(name, events, paths, etag)
+
+def _emit_rows(name: str, rows: pd.DataFrame, paths: Optional[Dict[str, Path]], etag: Optional[str] = None) -> None:
+    """Publie l'ajout de `rows` (append_rows)."""
+    if _changes_on():
+        _publish_changes(name, changefeed.row_events(name, "insert", rows, ROW_KEYS.get(name), _session_user()),
+                         paths, etag)
+
+def change_subscription(tables=None, name: Optional[str] = None, paths: Optional[Dict[str, Path]] = None):
+    """Abonnement au flux (tous process) : .poll() renvoie les nouveaux événements ; `name` = curseur durable."""
+    return changefeed.Subscription(tables, name=name, log_dir=_changes_dir(paths)) if changefeed is not None else None
+
+# ---------- Partitions mensuelles (interactions, paiements) ----------
+# Tables CSV qui ne font que grandir : avec secrets partition_hot_months = N, les lignes de inter/pay datées
+# d'un mois antérieur aux N derniers sont archivées dans <table>.parts/AAAA-MM.csv.gz (gzip, sidecar
+# .meta.json : lignes + ETag). Le CSV garde les mois récents et les lignes sans date lisible. Lecture
+# complète = archives + CSV (ETag de session = somme des ETags, base de fusion = table entière) ;
+# query_period() ne lit que les archives des mois demandés. Un save ne réécrit que les archives modifiées.
+PARTITION_COLS = {"inter": "Date", "pay": "Date_Paiement"}
+PARTITION_SUFFIX = ".csv.gz"
+_PARTITIONS_ARCHIVED = globals().get("_PARTITIONS_ARCHIVED", set())
+
+def _partition_hot_months() -> int:
+    """secrets: partition_hot_months (défaut 0 : pas d'archivage, le CSV reste complet pour les outils qui le lisent)."""
+    try:
+        return max(0, int(st.secrets.get("partition_hot_months", 0)))
     except Exception:
+        return 0
+
+def _partition_dir(path: Path) -> Path:
+    path = _plain_path(path)  # mêmes archives que le CSV soit compressé ou non
+    return path.with_name(path.stem + ".parts")
+
+def _partitions(name: str, path: Optional[Path]) -> Dict[str, Path]:
+    """{'AAAA-MM': archive} de la table, mois croissants ({} : table non partitionnée)."""
+    if name not in PARTITION_COLS or path is None or not _is_csv(path) or not _partition_dir(path).is_dir():
+        return {}
+    return {p.name[:-len(PARTITION_SUFFIX)]: p for p in sorted(_partition_dir(path).glob("*" + PARTITION_SUFFIX))}
+
+def _local_table_path(name: str, paths: Optional[Dict[str, Path]], ws_func) -> Optional[Path]:
+    """Fichier local de la table ; None si elle est stockée en SQLite ou dans Google Sheets."""
+    backend = _backend_effective()
+    if backend == "sqlite" or (backend == "gsheets" and ws_func is not None):
+        return None
+    return _table_path(name, paths, backend)
+
+def _row_months(df: pd.DataFrame, col: str) -> pd.Series:
+    """'AAAA-MM' de chaque ligne ('' : date absente ou illisible, la ligne reste dans le CSV)."""
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return schema.parse_date(df[col]).dt.strftime("%Y-%m").fillna("")  # mêmes règles que schema (JJ/MM/AAAA)
+
+def _sum_etags(etags: list) -> str:
+    """ETag de la table entière à partir de ceux de ses fichiers (CSV + archives)."""
+    if len(etags) == 1:
+        return etags[0]
+    n = total = 0
+    for etag in etags:
+        parsed = _parse_etag(etag)
+        if parsed is None:
+            return "+".join(map(str, etags))  # ancien format : comparable, mais pas incrémental
+        n, total = n + parsed[0], total + parsed[1]
+    return _format_etag(n, total)
+
+def _partition_read(ppath: Path) -> Tuple[pd.DataFrame, str]:
+    """(lignes, ETag) d'une archive ; cache process comme les fichiers de table."""
+    fp = _stat_fingerprint(ppath)
+    hit = _cache_get(ppath, fp)
+    if hit is not None:
+        return hit
+    df = _read_table_file(ppath)  # .gz : décompression à la lecture
+    meta = _read_meta(ppath)
+    etag = meta.get("etag", "empty") if meta is not None else compute_etag(df, ppath.name)
+    if meta is None:
+        _write_meta(ppath, len(df), etag)
+    _cache_put(ppath, fp, df, etag)
+    return df, etag
+
+def _partition_etag(ppath: Path) -> str:
+    meta = _read_meta(ppath)
+    return meta.get("etag", "empty") if meta is not None else _partition_read(ppath)[1]
+
+def _partition_write(ppath: Path, df: pd.DataFrame) -> str:
+    """Réécrit une archive (atomique, sous table_lock exclusif) ; sans ligne, elle est supprimée. Renvoie son ETag."""
+    _cache_drop(ppath)
+    if df.empty:
+        ppath.unlink(missing_ok=True)
+        _meta_path(ppath).unlink(missing_ok=True)
         return "empty"
+    df = df.fillna("").astype(str)
+    ppath.parent.mkdir(parents=True, exist_ok=True)
+    write_csv_atomic(ppath, df)  # .csv.gz : compressé
+    etag = compute_etag(df, ppath.name)
+    _write_meta(ppath, len(df), etag)
+    return etag
+
+def _join_partitions(df: pd.DataFrame, parts: Dict[str, Path]) -> pd.DataFrame:
+    """Archives (mois croissants) puis lignes du CSV, aux colonnes de `df`."""
+    if not parts:
+        return df
+    frames = [_partition_read(p)[0].reindex(columns=df.columns, fill_value="") for p in parts.values()]
+    return pd.concat(frames + [df], ignore_index=True)
+
+def _with_partitions(name: str, path: Optional[Path], df: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """Chargement : CSV lu par _load_df_source complété par les archives ; ETag et base de session
+       deviennent ceux de la table entière."""
+    parts = _partitions(name, path)
+    if not parts:
+        return df
+    full = _join_partitions(df, parts)
+    _state()[f"etag_{name}"] = _sum_etags([_state().get(f"etag_{name}", "empty")]
+                                          + [_partition_etag(p) for p in parts.values()])
+    if not columns:
+        _remember_base(name, full)
+    return full
+
+def _save_partitions(name: str, df: pd.DataFrame, parts: Dict[str, Path]) -> Tuple[pd.DataFrame, list]:
+    """Save d'une table partitionnée (sous table_lock exclusif) : lignes des mois archivés réécrites dans
+       leur archive si elles ont changé. Renvoie (lignes du CSV, ETags des archives)."""
+    months = _row_months(df, PARTITION_COLS[name])
+    etags = []
+    for month, ppath in parts.items():
+        rows = df[(months == month).to_numpy()]
+        etag = compute_etag(rows, ppath.name)
+        if etag != _partition_etag(ppath):
+            etag = _partition_write(ppath, rows)
+        etags.append(etag)
+    return df[~months.isin(list(parts)).to_numpy()], etags
+
+def _append_partitions(name: str, rows: pd.DataFrame, parts: Dict[str, Path]) -> Tuple[pd.DataFrame, list]:
+    """Ajout sur une table partitionnée (sous table_lock exclusif) : lignes datées d'un mois archivé
+       ajoutées à son archive. Renvoie (lignes pour le CSV, ETags des archives)."""
+    months = _row_months(rows, PARTITION_COLS[name])
+    etags = []
+    for month, ppath in parts.items():
+        mine = rows[(months == month).to_numpy()]
+        if mine.empty:
+            etags.append(_partition_etag(ppath))
+        else:
+            etags.append(_partition_write(ppath, pd.concat([_partition_read(ppath)[0], mine], ignore_index=True)))
+    return rows[~months.isin(list(parts)).to_numpy()], etags
+
+def archive_partitions(name: str, paths: Optional[Dict[str, Path]] = None, hot_months: Optional[int] = None) -> int:
+    """Déplace du CSV vers les archives les lignes des mois antérieurs aux `hot_months` derniers (mois courant
+       compris). Le contenu de la table ne change pas (même ETag) : les sessions ouvertes enregistrent sans
+       conflit. Archives écrites avant le CSV : un archivage interrompu est repris au suivant (dédoublonné
+       par clé). Renvoie le nombre de lignes archivées."""
+    col = PARTITION_COLS.get(name)
+    hot_months = _partition_hot_months() if hot_months is None else int(hot_months)
+    path = _table_path(name, paths, "csv")
+    if col is None or hot_months <= 0 or not path.exists():
+        return 0
+    with table_lock(path):
+        hot = _read_current(name, path)
+        months = _row_months(hot, col)
+        cutoff = (pd.Timestamp.today().to_period("M") - (hot_months - 1)).strftime("%Y-%m")
+        old = ((months != "") & (months < cutoff)).to_numpy()
+        if not old.any():
+            return 0
+        parts = _partitions(name, path)
+        key = ROW_KEYS.get(name)
+        for month, rows in hot[old].groupby(months[old].to_numpy()):
+            ppath = parts.get(month, _partition_dir(path) / f"{month}{PARTITION_SUFFIX}")
+            if month in parts:
+                rows = pd.concat([_partition_read(ppath)[0], rows], ignore_index=True).fillna("")
+                if key in rows.columns:
+                    rows = rows[~(rows[key].duplicated(keep="last") & rows[key].ne("")).to_numpy()]
+            _partition_write(ppath, rows)
+        keep = hot[~old]
+        _write_table_file(path, keep)  # purge aussi le journal, déjà rejoué dans `hot`
+        _write_meta(path, len(keep), compute_etag(keep, name))
+        _cache_drop(path)
+    return int(old.sum())
+
+def _partition_maintenance(name: str, paths: Optional[Dict[str, Path]], ws_func) -> None:
+    """Premier chargement de la table dans ce process : archivage des mois sortis de la fenêtre récente."""
+    if name not in PARTITION_COLS or _partition_hot_months() <= 0:
+        return
+    path = _local_table_path(name, paths, ws_func)
+    if path is None or not _is_csv(path) or str(path) in _PARTITIONS_ARCHIVED:
+        return
+    _PARTITIONS_ARCHIVED.add(str(path))
+    try:
+        archive_partitions(name, paths)
+    except Exception as e:
+        st.warning(f"Archivage mensuel de « {name} » impossible : {e}")
+
+def _hot_frame(name: str, cols: list, paths: Optional[Dict[str, Path]], ws_func, columns=None) -> pd.DataFrame:
+    """Lignes du CSV seul (sans archives), sans toucher à l'ETag ni à la base de fusion de la session."""
+    with session_state_override({"BACKEND_EFFECTIVE": _backend_effective()}):
+        return _load_df_source(name, cols, paths, ws_func, columns)
+
+def query_period(name: str, cols: list, start=None, end=None, paths: Optional[Dict[str, Path]] = None,
+                 ws_func=None, columns: Optional[list] = None) -> pd.DataFrame:
+    """Lignes de `name` (inter, pay) datées entre `start` et `end` inclus (None : sans borne ; lignes sans
+       date exclues). Table partitionnée : seules les archives des mois concernés sont lues (résultat en
+       lecture seule, à ne pas enregistrer) ; sinon filtre pandas sur la table chargée."""
+    col = PARTITION_COLS[name]
+    lo = pd.Timestamp(start) if start is not None else None
+    hi = pd.Timestamp(end) if end is not None else None
+    parts = _partitions(name, _local_table_path(name, paths, ws_func))
+    if not parts or _write_behind_pending(name, paths):
+        df = ensure_df_source(name, cols, paths, ws_func)
+    else:
+        first = lo.strftime("%Y-%m") if lo is not None else ""
+        last = hi.strftime("%Y-%m") if hi is not None else "9999-12"
+        df = _join_partitions(_hot_frame(name, cols, paths, ws_func),
+                              {m: p for m, p in parts.items() if first <= m <= last})
+    d = schema.parse_date(df[col] if col in df.columns else pd.Series("", index=df.index, dtype=object))
+    mask = d.notna()
+    if lo is not None:
+        mask &= d >= lo
+    if hi is not None:
+        mask &= d <= hi
+    out = df[mask.to_numpy()]
+    return out[[c for c in columns if c in out.columns]] if columns else out
+
+def table_months(name: str, cols: list, paths: Optional[Dict[str, Path]] = None, ws_func=None) -> list:
+    """Mois ('AAAA-MM') présents dans la table : noms des archives + dates du CSV (archives non lues)."""
+    col = PARTITION_COLS[name]
+    parts = _partitions(name, _local_table_path(name, paths, ws_func))
+    if parts:
+        df = _hot_frame(name, cols, paths, ws_func, columns=[col])
+    else:
+        df = ensure_df_source(name, cols, paths, ws_func, columns=[col])
+    return sorted((set(_row_months(df, col)) - {""}) | set(parts))
+
+def partition_status(paths: Optional[Dict[str, Path]] = None) -> list:
+    out = []
+    for name in PARTITION_COLS:
+        path = _table_path(name, paths, "csv")
+        parts = _partitions(name, path)
+        if parts:
+            metas = [_read_meta(p) or {} for p in parts.values()]
+            out.append({"table": name, "archives": len(parts), "de": min(parts), "à": max(parts),
+                        "lignes_archivées": sum(int(m.get("rows", 0)) for m in metas),
+                        "octets": sum(p.stat().st_size for p in parts.values())})
+    return out
+
+# ---------- SQLite (tables indexées, écritures ligne à ligne) ----------
+def _sqlite_path(paths: Optional[Dict[str, Path]] = None) -> Path:
+    base = next(iter((paths or {}).values()), Path("data/contacts.csv"))
+    return base.parent / SQLITE_FILE
+
+def _q(ident: str) -> str:
+    return '"' + str(ident).replace('"', '""') + '"'
+
+def _sqlite_connect(paths: Optional[Dict[str, Path]] = None) -> sqlite3.Connection:
+    path = _sqlite_path(paths)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(path), timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS _meta (tbl TEXT PRIMARY KEY, etag TEXT, rows INTEGER)")
+    return con
+
+def _sqlite_columns(con: sqlite3.Connection, name: str) -> list:
+    return [r[1] for r in con.execute(f"PRAGMA table_info({_q(name)})").fetchall()]
+
+def _sqlite_ensure_table(con: sqlite3.Connection, name: str, columns) -> list:
+    """Crée la table (colonnes TEXT) + index sur la clé de ligne et les clés de jointure ; ajoute les colonnes manquantes."""
+    existing = _sqlite_columns(con, name)
+    if not existing:
+        con.execute(f"CREATE TABLE {_q(name)} ({', '.join(_q(c) + ' TEXT' for c in columns)})")
+        existing = list(columns)
+    for c in columns:
+        if c not in existing:
+            con.execute(f"ALTER TABLE {_q(name)} ADD COLUMN {_q(c)} TEXT")
+            existing.append(c)
+    key = ROW_KEYS.get(name)
+    if key in existing:
+        try:
+            con.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_q('ux_' + name + '_key')} ON {_q(name)} ({_q(key)})")
+        except sqlite3.IntegrityError:
+            # Doublons historiques : index simple
+            con.execute(f"CREATE INDEX IF NOT EXISTS {_q('ix_' + name + '_key')} ON {_q(name)} ({_q(key)})")
+    for i, c in enumerate(JOIN_KEYS):
+        if c in existing and c != key:
+            con.execute(f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{name}_{i}')} ON {_q(name)} ({_q(c)})")
+    return existing
+
+def _sqlite_etag(con: sqlite3.Connection, name: str) -> str:
+    row = con.execute("SELECT etag FROM _meta WHERE tbl=?", (name,)).fetchone()
+    return row[0] if row else "empty"
+
+def _sqlite_set_etag(con: sqlite3.Connection, name: str, etag: str) -> None:
+    rows = con.execute(f"SELECT COUNT(*) FROM {_q(name)}").fetchone()[0]
+    con.execute("INSERT INTO _meta (tbl, etag, rows) VALUES (?,?,?) "
+                "ON CONFLICT(tbl) DO UPDATE SET etag=excluded.etag, rows=excluded.rows", (name, etag, rows))
+
+def _sqlite_insert(con: sqlite3.Connection, name: str, df: pd.DataFrame) -> None:
+    if df.empty:
+        return
+    cols = list(df.columns)
+    sql = f"INSERT INTO {_q(name)} ({', '.join(map(_q, cols))}) VALUES ({', '.join('?' * len(cols))})"
+    con.executemany(sql, df.fillna("").astype(str).values.tolist())
+
+def _sqlite_init_table(con: sqlite3.Connection, name: str, full_cols: list, paths: Optional[Dict[str, Path]]) -> None:
+    """Première ouverture : crée la table et importe le CSV existant (migration transparente)."""
+    if _sqlite_columns(con, name):
+        return
+    csv_path = _table_path(name, paths, "csv")
+    try:
+        df = pd.read_csv(csv_path, dtype=str).fillna("") if csv_path.exists() else pd.DataFrame(columns=full_cols)
+    except Exception:
+        df = pd.DataFrame(columns=full_cols)
+    cols = list(df.columns) + [c for c in full_cols if c not in df.columns]
+    with con:
+        _sqlite_ensure_table(con, name, cols)
+        _sqlite_insert(con, name, df)
+        _sqlite_set_etag(con, name, compute_etag(df, name))
+
+def _sqlite_save(con: sqlite3.Connection, name: str, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Écrit df en ne touchant que les lignes insérées / modifiées / supprimées (diff sur la clé de ligne).
+       Renvoie l'état précédent de la table (None si elle a été réécrite faute de clé exploitable)."""
+    new = df.fillna("").astype(str)
+    cols = _sqlite_ensure_table(con, name, list(new.columns))
+    key = ROW_KEYS.get(name)
+    keyed = key in new.columns and new[key].str.strip().ne("").all() and not new[key].duplicated().any()
+    if not keyed:
+        con.execute(f"DELETE FROM {_q(name)}")
+        _sqlite_insert(con, name, new)
+        return None
+    before = pd.read_sql_query(f"SELECT * FROM {_q(name)}", con).fillna("").astype(str)
+    old = before.drop_duplicates(subset=[key], keep="last").set_index(key)
+    new_idx = new.set_index(key)
+    gone = old.index.difference(new_idx.index)
+    if len(gone):
+        con.executemany(f"DELETE FROM {_q(name)} WHERE {_q(key)}=?", [(k,) for k in gone])
+    _sqlite_insert(con, name, new[~new[key].isin(old.index)])
+    both = new_idx.index.intersection(old.index)
+    if len(both):
+        value_cols = [c for c in new_idx.columns if c in cols]
+        cur = old.reindex(columns=value_cols, fill_value="").loc[both]
+        nxt = new_idx.loc[both, value_cols]
+        changed = nxt[(nxt != cur).any(axis=1)]
+        if not changed.empty:
+            sets = ", ".join(f"{_q(c)}=?" for c in value_cols)
+            con.executemany(f"UPDATE {_q(name)} SET {sets} WHERE {_q(key)}=?",
+                            [list(v) + [k] for k, v in zip(changed.index, changed.values.tolist())])
+    return before
+
+def query_rows(name: str, cols: list, where: Dict[str, object], paths: Optional[Dict[str, Path]] = None,
+               ws_func=None, columns: Optional[list] = None) -> pd.DataFrame:
+    """Lignes de `name` filtrées par égalité (valeur simple) ou appartenance (liste) : where={"ID": [...]}.
+       En SQLite : requête indexée, seules les lignes utiles sont lues ; autres backends : filtre pandas."""
+    if _backend_effective() == "sqlite":
+        full_cols = cols + [c for c in AUDIT_COLS if c not in cols]
+        con = _sqlite_connect(paths)
+        try:
+            _sqlite_init_table(con, name, full_cols, paths)
+            present = _sqlite_columns(con, name)
+            clauses, params = [], []
+            for c, v in (where or {}).items():
+                if c not in present:
+                    return pd.DataFrame(columns=columns or full_cols)
+                vals = [str(x) for x in v] if isinstance(v, (list, tuple, set, pd.Series)) else [str(v)]
+                if not vals:
+                    return pd.DataFrame(columns=columns or full_cols)
+                clauses.append(f"{_q(c)} IN ({', '.join('?' * len(vals))})")
+                params += vals
+            sel = ", ".join(_q(c) for c in (columns or present) if c in present)
+            sql = f"SELECT {sel} FROM {_q(name)}" + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+            return pd.read_sql_query(sql, con, params=params).fillna("").astype(str)
+        finally:
+            con.close()
+    df = ensure_df_source(name, cols, paths, ws_func)
+    mask = pd.Series(True, index=df.index)
+    for c, v in (where or {}).items():
+        vals = [str(x) for x in v] if isinstance(v, (list, tuple, set, pd.Series)) else [str(v)]
+        mask &= df[c].astype(str).isin(vals) if c in df.columns else False
+    out = df[mask]
+    return out[[c for c in columns if c in out.columns]] if columns else out
+
+# ---------- Concurrence ligne à ligne (fusion à trois voies) ----------
+def _keyed(df: pd.DataFrame, key: Optional[str]) -> bool:
+    return (df is not None and key in df.columns
+            and not df[key].astype(str).str.strip().eq("").any() and not df[key].duplicated().any())
+
+def _remember_base(name: str, df: pd.DataFrame) -> None:
+    """Mémorise l'état lu (référence, sans copie) : base de la fusion à trois voies au prochain save."""
+    _state()[f"base_{name}"] = df
+
+def _base_frame(name: str, key: str) -> Optional[pd.DataFrame]:
+    base = _state().get(f"base_{name}")
+    return base if isinstance(base, pd.DataFrame) and _keyed(base, key) else None
+
+def _row_diff(before: pd.DataFrame, after: pd.DataFrame, key: str) -> Optional[tuple]:
+    """(insérées, (avant, après) des lignes modifiées, supprimées) entre deux états d'une table ;
+       None si l'un des deux n'a pas de clé de ligne exploitable."""
+    if before is not None and before.empty and key not in before.columns:
+        before = pd.DataFrame(columns=after.columns)
+    if not (_keyed(before, key) and _keyed(after, key)):
+        return None
+    before, after = before.fillna("").astype(str), after.fillna("").astype(str)
+    cols = sorted((set(before.columns) | set(after.columns)) - {key})
+    old_h = pd.Series(_row_hashes(before.reindex(columns=cols, fill_value="")).to_numpy(), index=before[key])
+    keys = after[key]
+    in_before = keys.isin(old_h.index).to_numpy()
+    new_h = _row_hashes(after.reindex(columns=cols, fill_value="")).to_numpy()
+    changed = in_before.copy()
+    changed[in_before] = new_h[in_before] != old_h.loc[keys[in_before].to_numpy()].to_numpy()
+    old_rows = before.set_index(before[key]).loc[keys[changed].to_numpy()].reset_index(drop=True)
+    return after[~in_before], (old_rows, after[changed]), before[~before[key].isin(keys).to_numpy()]
+
+def _next_free_id(value: str, taken: set) -> str:
+    """INT00042 -> INT00043 (ou suivant libre) ; garde préfixe et largeur."""
+    m = re.match(r"^(.*?)(\d+)$", str(value))
+    prefix, width = (m.group(1), len(m.group(2))) if m else (str(value) + "-", 1)
+    nums = [int(t[len(prefix):]) for t in taken if t.startswith(prefix) and t[len(prefix):].isdigit()]
+    nxt = max(nums + [int(m.group(2)) if m else 1]) + 1
+    return f"{prefix}{nxt:0{width}d}"
+
+def _rekey_new_rows(rows: pd.DataFrame, existing_keys, key: Optional[str]) -> pd.DataFrame:
+    """Renumérote les lignes nouvelles dont l'ID a été pris entre-temps par un autre utilisateur."""
+    if key not in rows.columns:
+        return rows
+    taken = set(map(str, existing_keys))
+    clash = rows[key].astype(str).isin(taken)
+    if not clash.any():
+        return rows
+    rows = rows.copy()
+    for i in rows.index[clash]:
+        new_id = _next_free_id(rows.at[i, key], taken)
+        taken.add(new_id)
+        rows.at[i, key] = new_id
+    return rows
+
+def merge_three_way(base: pd.DataFrame, mine: pd.DataFrame, theirs: pd.DataFrame, key: str) -> Tuple[pd.DataFrame, list]:
+    """Fusion ligne à ligne : base=table lue par la session, mine=à écrire, theirs=état actuel du stockage.
+       Renvoie (table fusionnée, clés rejetées car modifiées des deux côtés). Les lignes modifiées d'un seul
+       côté sont prises de ce côté ; les nouvelles lignes des deux côtés sont conservées (renumérotées si
+       leurs IDs se chevauchent). Lignes comparées sur toutes les colonnes des trois états (absente : "")."""
+    base = base.fillna("").astype(str)
+    mine = mine.fillna("").astype(str)
+    theirs = theirs.fillna("").astype(str)
+    cols = sorted((set(base.columns) | set(mine.columns) | set(theirs.columns)) - {key})
+
+    def hashes(df: pd.DataFrame) -> pd.Series:
+        return pd.Series(_row_hashes(df.reindex(columns=cols, fill_value="")).to_numpy(), index=df[key])
+    base_h, hm, ht = hashes(base), hashes(mine), hashes(theirs)
+    in_base = set(base_h.index)
+    mine_changed = {k for k in hm.index if k not in in_base or hm[k] != base_h[k]} | (in_base - set(hm.index))
+    theirs_changed = {k for k in ht.index if k not in in_base or ht[k] != base_h[k]} | (in_base - set(ht.index))
+    both = mine_changed & theirs_changed
+    conflicts, fresh = [], []
+    for k in sorted(both):
+        if k in hm.index and k in ht.index and hm[k] == ht[k]:
+            continue  # même modification des deux côtés
+        if k not in hm.index and k not in ht.index:
+            continue  # supprimée des deux côtés
+        if k not in in_base and k in hm.index and k in ht.index:
+            fresh.append(k)  # deux créations avec le même ID
+            continue
+        conflicts.append(k)
+    take_mine = (mine_changed - set(conflicts) - set(fresh))
+    out = theirs.set_index(key, drop=False)
+    drop = [k for k in take_mine if k not in hm.index and k in out.index]
+    out = out.drop(index=drop)
+    upd = [k for k in take_mine if k in hm.index and k in out.index]
+    all_cols = list(out.columns) + [c for c in mine.columns if c not in out.columns]
+    out = out.reindex(columns=all_cols, fill_value="")
+    mine_idx = mine.set_index(key, drop=False).reindex(columns=all_cols, fill_value="")
+    if upd:
+        out.loc[upd] = mine_idx.loc[upd].values
+    added = mine_idx.loc[[k for k in hm.index if k in take_mine and k not in out.index]]
+    renamed = _rekey_new_rows(mine_idx.loc[fresh], set(out.index) | set(added.index), key)
+    out = pd.concat([out, added, renamed], ignore_index=True)
+    return out.reset_index(drop=True), conflicts
+
+def _resolve_conflict(name: str, df: pd.DataFrame, current: pd.DataFrame, label: str) -> pd.DataFrame:
+    """ETag différent : fusionne si possible (lignes disjointes), sinon comportement historique (arrêt)."""
+    key = ROW_KEYS.get(name)
+    base = _base_frame(name, key) if _keyed(df, key) and _keyed(current, key) else None
+    if base is None:
+        if _detached():
+            raise WriteConflictError(f"Conflit de modification détecté sur '{label}' (fusion impossible).")
+        st.error(f"Conflit de modification détecté sur '{label}'. Veuillez recharger la page.")
+        st.stop()
+    merged, conflicts = merge_three_way(base, df, current, key)
+    _state()[f"conflicts_{name}"] = conflicts
+    if _detached():
+        return merged  # write_behind met les lignes rejetées de côté (rejected/)
+    if conflicts:
+        st.warning(f"'{label}' : {len(conflicts)} ligne(s) modifiée(s) entre-temps par un autre utilisateur, "
+                   f"vos changements sur ces lignes sont ignorés : {', '.join(conflicts[:10])}"
+                   + ("…" if len(conflicts) > 10 else ""))
+    else:
+        st.info(f"'{label}' : modifications concurrentes fusionnées automatiquement.")
+    return merged
+
+def _clean_remote(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Feuille lue par gspread_dataframe -> même forme que la lecture CSV (sans colonnes/lignes vides)."""
+    if df is None:
+        return pd.DataFrame()
+    df = df[[c for c in df.columns if not str(c).startswith("Unnamed")]]
+    # Seules les lignes vides de fin sont retirées : les numéros de ligne restent alignés sur la feuille
+    filled = [i for i, v in enumerate(df.notna().any(axis=1).tolist()) if v]
+    df = df.iloc[:filled[-1] + 1] if filled else df.iloc[0:0]
+    return df.fillna("").astype(str)
+
+# ---------- Google Sheets : écriture différentielle ----------
+GS_DIFF_MAX_RATIO = 0.5  # au-delà de 50 % de cellules modifiées, une réécriture complète coûte moins cher
+
+def _a1_col(n: int) -> str:
+    out = ""
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        out = chr(65 + r) + out
+    return out
+
+def _a1(row: int, col: int) -> str:
+    return f"{_a1_col(col)}{row}"
+
+def _gs_diff_write(ws, old: pd.DataFrame, new: pd.DataFrame) -> dict:
+    """Écrit `new` en n'envoyant que la différence avec `old` (dernier état distant connu) :
+       cellules modifiées regroupées par plages contiguës (batch_update), lignes ajoutées (append_rows),
+       lignes en trop effacées (batch_clear). Réécriture complète si le schéma change."""
+    new = new.fillna("").astype(str)
+    old = old.fillna("").astype(str) if old is not None else pd.DataFrame()
+    if len(old.columns) == 0 or set(new.columns) != set(old.columns):
+        _set_with_dataframe(ws, new, include_index=False, include_column_header=True, resize=True)
+        return {"mode": "full", "cells": int(new.size), "appended": 0, "cleared": 0}
+    cols = list(old.columns)
+    new = new[cols]
+    n_common = min(len(old), len(new))
+    a = new.iloc[:n_common].to_numpy()
+    b = old.iloc[:n_common].to_numpy()
+    diff = a != b
+    n_cells = int(diff.sum())
+    if n_cells > GS_DIFF_MAX_RATIO * max(new.size, 1):
+        _set_with_dataframe(ws, new, include_index=False, include_column_header=True, resize=True)
+        return {"mode": "full", "cells": int(new.size), "appended": 0, "cleared": 0}
+    updates = []
+    for i in range(n_common):
+        row = diff[i]
+        if not row.any():
+            continue
+        j = 0
+        while j < len(cols):
+            if not row[j]:
+                j += 1
+                continue
+            k = j
+            while k + 1 < len(cols) and row[k + 1]:
+                k += 1
+            updates.append({"range": f"{_a1(i + 2, j + 1)}:{_a1(i + 2, k + 1)}",
+                            "values": [a[i, j:k + 1].tolist()]})
+            j = k + 1
+    if updates:
+        ws.batch_update(updates, value_input_option="USER_ENTERED")
+    appended = 0
+    if len(new) > len(old):
+        ws.append_rows(new.iloc[len(old):].values.tolist(), value_input_option="USER_ENTERED")
+        appended = len(new) - len(old)
+    cleared = 0
+    if len(new) < len(old):
+        ws.batch_clear([f"A{len(new) + 2}:{_a1(len(old) + 1, len(cols))}"])
+        cleared = len(old) - len(new)
+    return {"mode": "diff", "cells": n_cells, "appended": appended, "cleared": cleared, "ranges": len(updates)}
+
+def _record_gs_write(name: str, stats: dict) -> None:
+    _state().setdefault("GS_WRITE_STATS", {})[name] = stats
+
+# ---------- Google Sheets : versions par onglet (_meta) ----------
+# Onglet caché `_meta` : une ligne par onglet dans un ordre fixe (ligne 2 = premier onglet de SHEET_NAME…),
+# colonne B = compteur de version incrémenté à chaque écriture. Vérifier une cellule suffit à savoir
+# si l'onglet a changé depuis la lecture, sans retélécharger la table.
+GS_META_TAB = "_meta"
+GS_META_HEADER = ["tab", "version", "updated_at"]
+GS_META_TABS = list(SHEET_NAME.values())
+_GS_META_READY = globals().get("_GS_META_READY", set())
+
+def _gs_meta_row(tab: str) -> Optional[int]:
+    return GS_META_TABS.index(tab) + 2 if tab in GS_META_TABS else None
+
+def _gs_meta_versions(values: list) -> Dict[str, int]:
+    """Contenu de `_meta` (liste de lignes, en-tête compris) -> {onglet: version}."""
+    out = {}
+    for row in (values or [])[1:]:
+        if len(row) >= 2 and str(row[1]).strip().isdigit():
+            out[str(row[0])] = int(row[1])
+    return out
+
+def _gs_meta_ws(ws_func):
+    """Onglet `_meta` (créé, initialisé et masqué une fois par process)."""
+    ws = ws_func(GS_META_TAB)
+    ready_key = id(_spreadsheet_of(ws_func))
+    if ready_key in _GS_META_READY:
+        return ws
+    values = ws.get_all_values()
+    versions = _gs_meta_versions(values)
+    expected = [GS_META_HEADER] + [[t, str(versions.get(t, 0))] for t in GS_META_TABS]
+    if [r[:2] for r in values[:len(expected)]] != [r[:2] for r in expected]:
+        rows = [GS_META_HEADER] + [[t, str(versions.get(t, 0)), ""] for t in GS_META_TABS]
+        ws.batch_update([{"range": f"A1:C{len(rows)}", "values": rows}], value_input_option="RAW")
+        try:
+            ws.hide()
+        except Exception:
+            pass
+    _GS_META_READY.add(ready_key)
+    return ws
+
+def _gs_version_read(ws_func, tab: str) -> Optional[int]:
+    """Version courante de l'onglet : lecture d'une seule cellule. None si indisponible."""
+    row = _gs_meta_row(tab)
+    if row is None:
+        return None
+    try:
+        value = _gs_meta_ws(ws_func).acell(f"B{row}").value
+        return int(value) if str(value).strip().isdigit() else 0
+    except Exception:
+        return None
+
+def _gs_version_bump(ws_func, tab: str, current: Optional[int]) -> Optional[int]:
+    """Écrit version+1 pour l'onglet (après l'écriture des données) ; renvoie la nouvelle version."""
+    row = _gs_meta_row(tab)
+    if row is None or current is None:
+        return None
+    new = current + 1
+    try:
+        _gs_meta_ws(ws_func).batch_update(
+            [{"range": f"B{row}:C{row}", "values": [[str(new), time.strftime("%Y-%m-%dT%H:%M:%S")]]}],
+            value_input_option="RAW")
+    except Exception:
+        return None
+    return new
+
+def _gs_remember_versions(names: list, versions: Dict[str, int]) -> None:
+    for name in names:
+        tab = SHEET_NAME.get(name, name)
+        if tab in versions:
+            _state()[f"gsver_{name}"] = versions[tab]
+
+def _gs_remote_state(name: str, ws, ws_func, columns) -> Tuple[pd.DataFrame, Optional[int], bool]:
+    """(contenu distant, version, inchangé?) avant une écriture. Si la version n'a pas bougé depuis
+       la lecture, la base mémorisée est le contenu distant : aucun téléchargement de l'onglet."""
+    tab = SHEET_NAME.get(name, name)
+    version = _gs_version_read(ws_func, tab)
+    base = _state().get(f"base_{name}")
+    if version is not None and version == _state().get(f"gsver_{name}") and isinstance(base, pd.DataFrame):
+        return base.fillna("").astype(str), version, True
+    try:
+        df_remote = _clean_remote(_get_as_dataframe(ws, evaluate_formulas=True, header=0))
+    except Exception:
+        df_remote = pd.DataFrame(columns=columns)
+    return df_remote, version, False
 
 def _get_as_dataframe(ws, **kwargs) -> pd.DataFrame:
     if _get_as_dataframe_gs is None:
         raise RuntimeError("gspread_dataframe non disponible")
+    kwargs.setdefault("dtype", str)  # comme la lecture CSV : pas d'inférence de types (ETag stable)
     return _get_as_dataframe_gs(ws, **kwargs)
 
 def _set_with_dataframe(ws, df: pd.DataFrame, **kwargs):
@@ -59,88 +1361,719 @@ def _set_with_dataframe(ws, df: pd.DataFrame, **kwargs):
         raise RuntimeError("gspread_dataframe non disponible")
     return _set_with_dataframe_gs(ws, df, **kwargs)
 
-def ensure_df_source(name: str, cols: list, paths: Dict[str, Path] = None, ws_func=None) -> pd.DataFrame:
+def _table_path(name: str, paths: Optional[Dict[str, Path]], backend: str) -> Path:
+    """Fichier local de la table : .parquet si backend 'parquet' (pyarrow requis), sinon le CSV."""
+    if backend == "parquet":
+        if HAS_PARQUET:
+            return _parquet_path(name, paths)
+        st.warning("Backend 'parquet' demandé mais pyarrow absent : fallback CSV.")
+    return _stored_csv_path(name, (paths or {}).get(name, Path(f"data/{name}.csv")))
+
+# ---------- Google Sheets : miroir local (lecture) ----------
+def _gs_cache_dir(paths: Optional[Dict[str, Path]]) -> Path:
+    base = next(iter((paths or {}).values()), Path("data/contacts.csv"))
+    return base.parent / ".gs_cache"
+
+def _gs_cache_ttl() -> float:
+    """secrets: gs_cache_ttl_s (secondes, 0 = miroir désactivé)."""
+    if gs_cache is None:
+        return 0
+    try:
+        return float(st.secrets.get("gs_cache_ttl_s", gs_cache.DEFAULT_TTL_S))
+    except Exception:
+        return float(gs_cache.DEFAULT_TTL_S)
+
+def _gs_mirror_read(tab: str, paths: Optional[Dict[str, Path]], ws_func) -> Optional[pd.DataFrame]:
+    """Miroir de l'onglet (même périmé : le thread de fond le rafraîchit) ; None si absent/désactivé."""
+    ttl = _gs_cache_ttl()
+    if ttl <= 0:
+        return None
+    hit = gs_cache.read_mirror(tab, _gs_cache_dir(paths))
+    if hit is None:
+        return None
+    try:
+        gs_cache.ensure_refresher(_spreadsheet_of(ws_func), GS_META_TABS + [GS_META_TAB], ttl_s=ttl,
+                                  cache_dir=_gs_cache_dir(paths))
+    except Exception:
+        pass
+    return hit[0]
+
+def _gs_mirror_write(tab: str, df: pd.DataFrame, paths: Optional[Dict[str, Path]]) -> None:
+    if _gs_cache_ttl() <= 0:
+        return
+    try:
+        gs_cache.write_mirror(tab, df, cache_dir=_gs_cache_dir(paths))
+    except Exception:
+        pass
+
+def _finish_gs_frame(name: str, df: Optional[pd.DataFrame], full_cols: list, ws,
+                     columns: Optional[list] = None) -> pd.DataFrame:
+    """Onglet lu -> DataFrame de la table (ETag, base de fusion, colonnes attendues ; en-têtes si onglet vide)."""
+    tab = SHEET_NAME.get(name, name)
+    df = _clean_remote(df)
+    if df.empty and len(df.columns) == 0:
+        df = pd.DataFrame(columns=full_cols)
+        try:
+            _set_with_dataframe(ws() if callable(ws) else ws, df, include_index=False,
+                                include_column_header=True, resize=True)
+        except Exception as e:
+            st.warning(f"Init vide '{tab}' non écrit: {e}")
+    _state()[f"etag_{name}"] = compute_etag(df, name)  # même forme qu'au save (_clean_remote)
+    _remember_base(name, df)  # forme exacte de l'onglet (base de fusion et du diff à l'écriture)
+    df = df.reindex(columns=full_cols, fill_value="")
+    if columns:
+        return df[[c for c in df.columns if c in columns]]
+    return df
+
+def _values_to_frame(values: list) -> pd.DataFrame:
+    """Réponse values_batch_get (liste de lignes, 1re = en-têtes) -> DataFrame texte."""
+    if not values:
+        return pd.DataFrame()
+    header = [str(h) for h in values[0]]
+    width = len(header)
+    rows = [list(r[:width]) + [""] * (width - len(r)) for r in values[1:]]
+    df = pd.DataFrame(rows, columns=header, dtype=str)
+    return df[[c for c in df.columns if c != ""]]
+
+def _spreadsheet_of(ws_func):
+    ss = getattr(ws_func, "spreadsheet", None)
+    if ss is None:
+        ss = ws_func(SHEET_NAME["users"]).spreadsheet
+    return ss
+
+def ensure_df_sources(specs: Dict[str, list], paths: Optional[Dict[str, Path]] = None,
+                      ws_func=None, max_workers: Optional[int] = None,
+                      on_error: str = "warn", typed: bool = False) -> Dict[str, pd.DataFrame]:
+    """Charge plusieurs tables d'un coup. En Google Sheets : un seul appel values_batch_get pour tous
+       les onglets (au lieu d'un aller-retour par table) ; temps par onglet dans
+       st.session_state["GS_LOAD_TIMINGS"]. Autres backends (ou repli) : tables lues en parallèle,
+       voir _load_parallel. `typed` : voir ensure_df_source."""
+    out = _ensure_df_sources_text(specs, paths, ws_func, max_workers, on_error)
+    if typed:
+        return {name: (schema.to_typed(df, name) if _write_behind_pending(name, paths) else _typed_view(name, df))
+                for name, df in out.items()}
+    return out
+
+def _ensure_df_sources_text(specs: Dict[str, list], paths: Optional[Dict[str, Path]], ws_func,
+                            max_workers: Optional[int], on_error: str) -> Dict[str, pd.DataFrame]:
+    backend = _backend_effective()
+    if backend == "gsheets" and ws_func is not None:
+        names = list(specs)
+        tabs = [SHEET_NAME.get(n, n) for n in names]
+        mirrors = {tab: _gs_mirror_read(tab, paths, ws_func) for tab in tabs + [GS_META_TAB]}
+        if all(m is not None for m in mirrors.values()):
+            # Lecture locale : aucun appel réseau (le thread de fond rafraîchit les miroirs)
+            meta = mirrors[GS_META_TAB]
+            _gs_remember_versions(names, _gs_meta_versions([list(meta.columns)] + meta.values.tolist()))
+            out = {}
+            for name, tab in zip(names, tabs):
+                full_cols = specs[name] + [c for c in AUDIT_COLS if c not in specs[name]]
+                _state().setdefault(f"etag_{name}", "empty")
+                out[name] = _with_pending(name, _finish_gs_frame(name, mirrors[tab], full_cols,
+                                                                 lambda tab=tab: ws_func(tab)), paths)
+            _state()["GS_LOAD_TIMINGS"] = {"batch_get_s": 0.0, "source": "miroir local",
+                                           "tabs": {t: {"rows": len(out[n])} for n, t in zip(names, tabs)}}
+            return out
+        try:
+            t0 = time.perf_counter()
+            ss = _spreadsheet_of(ws_func)
+            existing = {w.title for w in ss.worksheets()}
+            for tab in tabs:
+                if tab not in existing:
+                    ws_func(tab)  # crée l'onglet manquant
+            _gs_meta_ws(ws_func)
+            # Versions lues dans le même appel que les données (cohérentes avec elles)
+            resp = ss.values_batch_get([f"'{t}'" for t in tabs + [GS_META_TAB]])
+            t_net = time.perf_counter() - t0
+            meta_values = (resp.get("valueRanges", []) + [{}])[len(tabs)].get("values", [])
+            _gs_remember_versions(names, _gs_meta_versions(meta_values))
+            _gs_mirror_write(GS_META_TAB, _values_to_frame(meta_values), paths)
+        except Exception as e:
+            st.warning(f"Lecture groupée Google Sheets échouée, lecture onglet par onglet : {e}")
+        else:
+            timings = {"batch_get_s": round(t_net, 3), "tabs": {}}
+            out = {}
+            for name, tab, vr in zip(names, tabs, resp.get("valueRanges", [])[:len(tabs)]):
+                t1 = time.perf_counter()
+                cols = specs[name]
+                _state().setdefault(f"etag_{name}", "empty")
+                full_cols = cols + [c for c in AUDIT_COLS if c not in cols]
+                frame = _clean_remote(_values_to_frame(vr.get("values", [])))
+                _gs_mirror_write(tab, frame, paths)
+                out[name] = _with_pending(name, _finish_gs_frame(name, frame, full_cols,
+                                                                 lambda tab=tab: ws_func(tab)), paths)
+                timings["tabs"][tab] = {"rows": len(out[name]),
+                                        "build_ms": round((time.perf_counter() - t1) * 1000, 1)}
+            _state()["GS_LOAD_TIMINGS"] = timings
+            if len(out) == len(names):
+                return out
+    return _load_parallel(specs, paths, ws_func, max_workers=max_workers, on_error=on_error)
+
+# ---------- Chargement parallèle ----------
+LOAD_MAX_WORKERS = 8
+
+def _load_parallel(specs: Dict[str, list], paths: Optional[Dict[str, Path]], ws_func,
+                   max_workers: Optional[int] = None, on_error: str = "warn") -> Dict[str, pd.DataFrame]:
+    """Charge les tables dans un pool de threads (lecture fichiers / réseau : le GIL est relâché).
+       Erreurs traitées table par table, dans l'ordre de `specs` (indépendant de l'ordre d'achèvement) :
+       on_error="warn" → avertissement + table vide aux colonnes attendues ; "raise" → première erreur levée."""
+    names = list(specs)
+    if not names:
+        return {}
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+    def _one(name):
+        if ctx is not None:  # session_state / st.* utilisables depuis le thread
+            add_script_run_ctx(threading.current_thread(), ctx)
+        t0 = time.perf_counter()
+        try:
+            return ensure_df_source(name, specs[name], paths, ws_func), None, time.perf_counter() - t0
+        except Exception as e:
+            return None, e, time.perf_counter() - t0
+
+    workers = max(1, min(int(max_workers or LOAD_MAX_WORKERS), len(names)))
+    t0 = time.perf_counter()
+    if workers == 1:
+        results = [_one(n) for n in names]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="load-table") as pool:
+            results = list(pool.map(_one, names))
+    out, errors, timings = {}, {}, {}
+    for name, (df, err, dt) in zip(names, results):
+        timings[name] = round(dt * 1000, 1)
+        if err is None:
+            out[name] = df
+            continue
+        if on_error == "raise":
+            raise err
+        errors[name] = str(err)
+        st.warning(f"Chargement de la table « {name} » impossible : {err}")
+        out[name] = pd.DataFrame(columns=specs[name] + [c for c in AUDIT_COLS if c not in specs[name]])
+    _state()["LOAD_TIMINGS"] = {"total_ms": round((time.perf_counter() - t0) * 1000, 1),
+                                "workers": workers, "tables_ms": timings}
+    _state()["LOAD_ERRORS"] = errors
+    return out
+
+def ensure_df_source(name: str, cols: list, paths: Dict[str, Path] = None, ws_func=None,
+                     columns: Optional[list] = None, typed: bool = False) -> pd.DataFrame:
     """Charge une table depuis Google Sheets si ws_func est fourni et backend effectif=='gsheets',
-       sinon depuis CSV. Crée la structure si manquante. Met à jour st.session_state ETag."""
+       sinon depuis les fichiers locaux (Parquet si backend=='parquet', CSV sinon).
+       Crée la structure si manquante. Met à jour st.session_state ETag.
+       `columns` : projection optionnelle (seules ces colonnes sont lues/renvoyées).
+       `typed` : colonnes converties selon schema.py (montants Int64, dates, catégories, booléens).
+       Écriture différée active : les écritures encore dans le journal sont appliquées à la vue."""
+    if _write_behind_pending(name, paths):
+        df = _with_pending(name, _load_df_now(name, cols, paths, ws_func), paths, columns)
+        return schema.to_typed(df, name) if typed else df
+    df = _load_df_now(name, cols, paths, ws_func, columns)
+    return _typed_view(name, df) if typed else df
+
+# ---------- Vues typées ----------
+_TYPED_CACHE: Dict[str, tuple] = globals().get("_TYPED_CACHE", {})
+
+def _typed_view(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Conversion texte -> types faite une seule fois par version (ETag) de la table, partagée par les sessions."""
+    key = (_state().get(f"etag_{name}"), tuple(df.columns), len(df))
+    hit = _TYPED_CACHE.get(name)
+    if hit is None or hit[0] != key or key[0] in (None, "empty"):
+        hit = (key, schema.to_typed(df, name))
+        _TYPED_CACHE[name] = hit
+    return dataset_store.view(hit[1]) if dataset_store is not None else hit[1].copy()
+
+def _as_text(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Vue typée -> texte avant écriture (le stockage et l'ETag restent en texte). Les cellules inchangées
+       depuis la lecture gardent le texte stocké (base de fusion de la session), les autres la forme canonique."""
+    if df is None or not schema.is_typed(df):
+        return df
+    base = _state().get(f"base_{name}")
+    return schema.to_text(df, name, source=base if isinstance(base, pd.DataFrame) else None, key=ROW_KEYS.get(name))
+
+# ---------- Jeu de données partagé (dataset_store) ----------
+# Une seule copie de chaque table par process : les sessions reçoivent des vues (Copy-on-Write) et
+# l'état de session associé (ETag, base de fusion, version Sheets). Validité vérifiée par un jeton
+# bon marché : empreinte stat du fichier (ou du miroir Sheets), ETag SQLite.
+def _store_source(name: str, paths: Optional[Dict[str, Path]], backend: str, ws_func) -> Tuple[Optional[str], object]:
+    """(source, jeton) ; jeton None = source non vérifiable sans la relire (pas de partage)."""
+    try:
+        if backend == "gsheets" and ws_func is not None:
+            if _gs_cache_ttl() <= 0:
+                return None, None
+            cache_dir = _gs_cache_dir(paths)
+            fps = tuple(_stat_fingerprint(gs_cache._paths(t, cache_dir)[0])
+                        for t in (SHEET_NAME.get(name, name), GS_META_TAB))
+            return f"gsheets:{cache_dir}", (None if None in fps else fps)
+        if backend == "sqlite":
+            con = _sqlite_connect(paths)
+            try:
+                return f"sqlite:{_sqlite_path(paths)}", _sqlite_etag(con, name)
+            finally:
+                con.close()
+        path = _table_path(name, paths, backend)
+        token = _table_fingerprint(path)
+        if token is not None and _partitions(name, path):
+            token = token + (_stat_fingerprint(_partition_dir(path)),)  # archive ajoutée, réécrite ou retirée
+        return f"file:{path}", token
+    except Exception:
+        return None, None
+
+def _store_invalidate(name: str) -> None:
+    if dataset_store is not None:
+        dataset_store.get_store().invalidate(name)
+
+def data_version(name: str) -> int:
+    """Version (compteur process) de la table : change à chaque écriture faite par l'application."""
+    return dataset_store.get_store().data_version(name) if dataset_store is not None else 0
+
+# Dernière lecture de chaque table dans ce process (cols, paths, ws_func) : jeton de source et état de
+# session pour les calculs mis en cache (dataset_store.cached_on), qui ne relisent pas la table.
+_LAST_READ: Dict[str, tuple] = globals().get("_LAST_READ", {})
+
+def table_source_token(name: str):
+    """Jeton de la source stockée de `name` (empreinte du fichier, ETag SQLite…), indépendant de la session.
+       None : table pas encore lue par ce process, source non vérifiable ou écritures en attente."""
+    args = _LAST_READ.get(name)
+    if args is None or _write_behind_pending(name, args[1]):
+        return None
+    source, token = _store_source(name, args[1], _backend_effective(), args[2])
+    return None if token is None else (source, token)
+
+def sync_session_state(name: str) -> None:
+    """ETag et base de fusion de `name` dans la session, sans relire la table (servie par le jeu partagé) :
+       un résultat de cached_on servi depuis le cache doit pouvoir être enregistré comme une lecture."""
+    args = _LAST_READ.get(name)
+    if args is not None:
+        _load_df_now(name, *args)
+
+def _load_df_now(name: str, cols: list, paths: Dict[str, Path] = None, ws_func=None,
+                 columns: Optional[list] = None) -> pd.DataFrame:
+    """Lecture via le jeu partagé : publiée une fois, puis servie en vue tant que la source n'a pas bougé."""
+    _LAST_READ[name] = (cols, paths, ws_func)
+    backend = _backend_effective()
+    _partition_maintenance(name, paths, ws_func)
+    path = _local_table_path(name, paths, ws_func)
+    if path is not None:
+        _wal_recover(name, path)  # avant le jeu partagé : une table servie par le store ne passe pas par la lecture
+    source, token = _store_source(name, paths, backend, ws_func) if dataset_store is not None else (None, None)
+    if token is None:
+        return _load_df_table(name, cols, paths, ws_func, columns)
+    full_cols = cols + [c for c in AUDIT_COLS if c not in cols]
+    store = dataset_store.get_store()
+    source = (source, tuple(full_cols))
+    entry = store.get(name, source, token)
+    if entry is None:
+        if columns:
+            return _load_df_table(name, cols, paths, ws_func, columns)
+        df = _load_df_table(name, cols, paths, ws_func)
+        keys = [f"etag_{name}", f"base_{name}"] + ([f"gsver_{name}"] if backend == "gsheets" else [])
+        entry = store.publish(name, source, token, df, {k: _state()[k] for k in keys if k in _state()})
+    else:
+        _state().update(entry["state"])
+    df = entry["df"]
+    if columns:
+        df = df[[c for c in full_cols if c in columns] + [c for c in columns if c in df.columns and c not in full_cols]]
+    return dataset_store.view(df)
+
+def _load_df_table(name: str, cols: list, paths: Dict[str, Path] = None, ws_func=None,
+                   columns: Optional[list] = None) -> pd.DataFrame:
+    """Table entière : source principale (_load_df_source) + archives mensuelles s'il y en a."""
+    df = _load_df_source(name, cols, paths, ws_func, columns)
+    if name in PARTITION_COLS:
+        df = _with_partitions(name, _local_table_path(name, paths, ws_func), df, columns)
+    return df
+
+def _load_df_source(name: str, cols: list, paths: Dict[str, Path] = None, ws_func=None,
+                    columns: Optional[list] = None) -> pd.DataFrame:
     full_cols = cols + [c for c in AUDIT_COLS if c not in cols]
     backend = _backend_effective()
-    st.session_state.setdefault(f"etag_{name}", "empty")
+    _state().setdefault(f"etag_{name}", "empty")
 
     if backend == "gsheets" and ws_func is not None:
         tab = SHEET_NAME.get(name, name)
+        mirror = _gs_mirror_read(tab, paths, ws_func)
+        meta = _gs_mirror_read(GS_META_TAB, paths, ws_func) if mirror is not None else None
+        if mirror is not None and meta is not None:
+            _gs_remember_versions([name], _gs_meta_versions([list(meta.columns)] + meta.values.tolist()))
+            return _finish_gs_frame(name, mirror, full_cols, lambda: ws_func(tab), columns)
         try:
             ws = ws_func(tab)
-            df = _get_as_dataframe(ws, evaluate_formulas=True, header=0)
+            version = _gs_version_read(ws_func, tab)  # lue avant les données : au pire, relecture au save
+            if version is not None:
+                _state()[f"gsver_{name}"] = version
+            df = _clean_remote(_get_as_dataframe(ws, evaluate_formulas=True, header=0))
         except Exception as e:
             st.warning(f"Lecture Google Sheets échouée ({tab}), fallback CSV: {e}")
             backend = "csv"  # bascule locale pour cette lecture
         else:
-            if df is None or df.empty:
-                df = pd.DataFrame(columns=full_cols)
-                try:
-                    _set_with_dataframe(ws, df, include_index=False, include_column_header=True, resize=True)
-                except Exception as e:
-                    st.warning(f"Init vide '{tab}' non écrit: {e}")
-            else:
-                for c in full_cols:
-                    if c not in df.columns:
-                        df[c] = ""
-                df = df[full_cols].fillna("")
-            st.session_state[f"etag_{name}"] = compute_etag(df, name)
+            _gs_mirror_write(tab, df, paths)
+            return _finish_gs_frame(name, df, full_cols, ws, columns)
+
+    if backend == "sqlite":
+        con = _sqlite_connect(paths)
+        try:
+            _sqlite_init_table(con, name, full_cols, paths)
+            with con:
+                present = _sqlite_ensure_table(con, name, full_cols)
+            want = [c for c in (columns or present) if c in present]
+            df = pd.read_sql_query(f"SELECT {', '.join(map(_q, want))} FROM {_q(name)}", con).fillna("").astype(str)
+            _state()[f"etag_{name}"] = _sqlite_etag(con, name)
+        finally:
+            con.close()
+        if columns:
             return df
+        _remember_base(name, df)
+        return df[full_cols + [c for c in df.columns if c not in full_cols]]
 
-    # CSV fallback
-    paths = paths or {}
-    path = paths.get(name, Path(f"data/{name}.csv"))
+    # Fichiers locaux : CSV (fallback) ou Parquet
+    path = _table_path(name, paths, backend)
     path.parent.mkdir(parents=True, exist_ok=True)
     if not path.exists():
-        df = pd.DataFrame(columns=full_cols)
-        df.to_csv(path, index=False, encoding="utf-8")
-    try:
-        df = pd.read_csv(path, dtype=str).fillna("")
-    except Exception:
-        df = pd.DataFrame(columns=full_cols)
+        with table_lock(path):
+            if not path.exists():
+                _write_table_file(path, pd.DataFrame(columns=full_cols))
+    _wal_recover(name, path)
+    fp = _table_fingerprint(path)
+    hit = _cache_get(path, fp)
+    if columns:
+        want = [c for c in full_cols if c in columns] + [c for c in columns if c not in full_cols]
+        if hit is not None:
+            df, etag = hit[0].reindex(columns=want, fill_value=""), hit[1]
+            _state()[f"etag_{name}"] = etag
+            return df
+        # Projection : l'ETag vient du sidecar (ou d'une relecture complète s'il est périmé)
+        key = ROW_KEYS.get(name)
+        read = want + ([key] if key and key not in want else [])  # clé : rejeu du journal
+        with table_lock(path, shared=True):  # ETag et données de la même version du fichier
+            etag = _file_base_etag(path, full_cols)
+            snap = _snapshot_read(path, _stat_fingerprint(path), columns=read)
+            try:
+                df = snap[0] if snap is not None else _read_table_file(path, columns=read)
+                df, etag = _wal_apply(name, path, df, etag)
+                df = df[[c for c in want if c in df.columns]]
+            except Exception:
+                df = pd.DataFrame(columns=want)
+        for c in want:
+            if c not in df.columns:
+                df[c] = ""
+        _state()[f"etag_{name}"] = etag
+        return df[want]
+    if hit is not None:
+        # Fichier et journal inchangés (mtime/taille/inode) : ni lecture ni hachage
+        raw, etag = hit
+    else:
+        snap = _snapshot_read(path, _stat_fingerprint(path))  # démarrage à froid : pas de parsing si à jour
+        if snap is not None and snap[1]:
+            raw, etag = snap
+        else:
+            with table_lock(path, shared=True):  # pas de lecture pendant un ajout en cours
+                fp = _table_fingerprint(path)  # version effectivement lue
+                try:
+                    raw = _read_table_file(path)
+                except Exception:
+                    raw = pd.DataFrame(columns=full_cols)
+                meta = _read_meta(path)
+                if meta is not None:
+                    etag = meta.get("etag", "empty")
+                else:
+                    etag = compute_etag(raw, name)
+                    _write_meta(path, len(raw), etag)
+                _snapshot_write(path, _stat_fingerprint(path), raw, etag)
+        raw, etag = _wal_apply(name, path, raw, etag)  # fichier (ou instantané) = base, journal rejoué dessus
+        _cache_put(path, fp, raw, etag)
+    _remember_base(name, raw)
+    df = raw.copy(deep=False)  # colonnes ajoutées/réordonnées sur un nouvel objet, `raw` (partagé) intact
     for c in full_cols:
         if c not in df.columns:
             df[c] = ""
     df = df[full_cols]
-    st.session_state[f"etag_{name}"] = compute_etag(df, name)
+    _state()[f"etag_{name}"] = etag
+    return df
+
+# ---------- Écriture différée (write_behind) ----------
+def _write_behind_dir(paths: Optional[Dict[str, Path]]) -> Path:
+    base = next(iter((paths or {}).values()), Path("data/contacts.csv"))
+    return base.parent / ".write_behind"
+
+def _write_behind_on() -> bool:
+    """secrets: write_behind = true (ou st.session_state["WRITE_BEHIND"]) ; jamais dans le thread de flush."""
+    if write_behind is None or getattr(_LOCAL, "state", None) is not None:
+        return False
+    flag = _state().get("WRITE_BEHIND")
+    if flag is None:
+        try:
+            flag = st.secrets.get("write_behind", False)
+        except Exception:
+            flag = False
+    return bool(flag)
+
+def _write_behind_pending(name: str, paths: Optional[Dict[str, Path]]) -> bool:
+    return write_behind is not None and bool(write_behind.pending_entries(name, _write_behind_dir(paths)))
+
+def _with_pending(name: str, df: pd.DataFrame, paths: Optional[Dict[str, Path]],
+                  columns: Optional[list] = None) -> pd.DataFrame:
+    """Vue = stockage + écritures en attente (l'utilisateur relit ce qu'il vient de saisir)."""
+    journal = _write_behind_dir(paths)
+    entries = write_behind.pending_entries(name, journal) if write_behind is not None else []
+    if entries:
+        df = write_behind.overlay(name, df, _state().get(f"etag_{name}"), journal)
+        _state()[f"wb_seen_{name}"] = entries[-1]["seq"]
+    if columns:
+        return df[[c for c in df.columns if c in columns]]
     return df
 
 def save_df_target(name: str, df: pd.DataFrame, paths: Optional[Dict[str, Path]] = None, ws_func=None):
-    """Sauvegarde avec verrou optimiste simple via ETag (sur la session)."""
+    """Sauvegarde la table (voir _save_df_backend). Écriture différée active : journalisée puis écrite
+       en tâche de fond, l'appel rend la main immédiatement."""
+    df = _as_text(name, df)
+    if _write_behind_on():
+        write_behind.enqueue(name, "save", df, backend=_backend_effective(), paths=paths,
+                             etag=_state().get(f"etag_{name}"), base=_state().get(f"base_{name}"),
+                             seen=_state().get(f"wb_seen_{name}"), journal_dir=_write_behind_dir(paths))
+        write_behind.ensure_worker(ws_func, journal_dir=_write_behind_dir(paths))
+        return
+    _save_df_now(name, df, paths, ws_func)
+
+def append_rows_target(name: str, rows: pd.DataFrame, paths: Optional[Dict[str, Path]] = None, ws_func=None):
+    """Ajoute des lignes en fin de table (voir _append_rows_backend), en différé si l'écriture différée est active."""
+    if rows is None or rows.empty:
+        return
+    rows = _as_text(name, rows)
+    if _write_behind_on():
+        write_behind.enqueue(name, "append", rows, backend=_backend_effective(), paths=paths,
+                             etag=_state().get(f"etag_{name}"), journal_dir=_write_behind_dir(paths))
+        write_behind.ensure_worker(ws_func, journal_dir=_write_behind_dir(paths))
+        return
+    _append_rows_now(name, rows, paths, ws_func)
+
+def _save_df_now(name: str, df: pd.DataFrame, paths: Optional[Dict[str, Path]] = None, ws_func=None):
+    """Écrit la table (voir _save_df_backend) puis invalide sa version dans le jeu partagé."""
+    try:
+        _save_df_backend(name, df, paths, ws_func)
+    finally:
+        _store_invalidate(name)  # nouvelle version de cette table seulement
+
+def _save_df_backend(name: str, df: pd.DataFrame, paths: Optional[Dict[str, Path]] = None, ws_func=None):
+    """Sauvegarde avec verrou optimiste via ETag (sur la session). Si la table a changé depuis la lecture,
+       fusion à trois voies ligne à ligne (merge_three_way) : seules les lignes modifiées des deux côtés
+       sont rejetées (liste dans st.session_state["conflicts_<table>"])."""
+    df = _as_text(name, df)
     backend = _backend_effective()
     if backend == "gsheets" and ws_func is not None:
         tab = SHEET_NAME.get(name, name)
         try:
             ws = ws_func(tab)
-            try:
-                df_remote = _get_as_dataframe(ws, evaluate_formulas=True, header=0)
-            except Exception:
-                df_remote = pd.DataFrame(columns=df.columns)
-            expected = st.session_state.get(f"etag_{name}")
-            current = compute_etag(df_remote, name)
-            if expected and expected != current:
-                st.error(f"Conflit de modification détecté sur '{tab}'. Veuillez recharger la page.")
-                st.stop()
-            _set_with_dataframe(ws, df, include_index=False, include_column_header=True, resize=True)
-            st.session_state[f"etag_{name}"] = compute_etag(df, name)
+            df_remote, version, unchanged = _gs_remote_state(name, ws, ws_func, df.columns)
+            if not unchanged:
+                expected = _state().get(f"etag_{name}")
+                current = compute_etag(df_remote, name)
+                if expected and expected != current:
+                    df = _resolve_conflict(name, df, df_remote, tab)
+            stats = _gs_diff_write(ws, df_remote, df)
+            _record_gs_write(name, {**stats, "version_check": "1 cellule" if unchanged else "onglet relu"})
+            written = df.fillna("").astype(str)
+            if stats["mode"] == "diff":
+                written = written[list(df_remote.columns)]  # ordre des colonnes de l'onglet
+            _gs_mirror_write(tab, written, paths)
+            _state()[f"etag_{name}"] = compute_etag(written, name)
+            _state()[f"gsver_{name}"] = _gs_version_bump(ws_func, tab, version)
+            _remember_base(name, written)
+            _emit_changes(name, df_remote, written, paths, _state()[f"etag_{name}"])
             return
         except Exception as e:
+            if _detached():
+                raise  # écriture différée : l'entrée reste dans le journal, nouvel essai plus tard
             st.warning(f"Écriture Google Sheets échouée ({tab}), fallback CSV: {e}")
 
-    # CSV fallback
-    paths = paths or {}
-    path = paths.get(name, Path(f"data/{name}.csv"))
+    if backend == "sqlite":
+        con = _sqlite_connect(paths)
+        try:
+            _sqlite_init_table(con, name, list(df.columns), paths)
+            with con:
+                con.execute("BEGIN IMMEDIATE")  # ETag vérifié et écrit dans la même transaction
+                expected = _state().get(f"etag_{name}")
+                if expected and expected != _sqlite_etag(con, name):
+                    current = pd.read_sql_query(f"SELECT * FROM {_q(name)}", con).fillna("").astype(str)
+                    df = _resolve_conflict(name, df, current, name)
+                before = _sqlite_save(con, name, df)
+                etag = compute_etag(df, name)
+                _sqlite_set_etag(con, name, etag)
+        finally:
+            con.close()
+        _emit_changes(name, before, df, paths, etag)
+        _state()[f"etag_{name}"] = etag
+        _remember_base(name, df)
+        return
+
+    # Fichiers locaux : CSV (fallback) ou Parquet
+    path = _table_path(name, paths, backend)
     path.parent.mkdir(parents=True, exist_ok=True)
+    with table_lock(path):  # vérification d'ETag et écriture indivisibles (autres sessions et process)
+        expected = _state().get(f"etag_{name}")
+        base_etag = _file_base_etag(path, df.columns)
+        records = _wal_pending(path, base_etag)
+        current = records[-1]["etag"] if records else base_etag
+        parts = _partitions(name, path)
+        if parts:
+            current = _sum_etags([current] + [_partition_etag(p) for p in parts.values()])
+        cur = None
+        if expected and expected != current:
+            cur = _read_current(name, path)
+            df = _resolve_conflict(name, df, _join_partitions(cur, parts), name)
+        before = cur
+        if before is None and (_wal_on() or _changes_on()):
+            before = _current_frame(name, path) if path.exists() else pd.DataFrame(columns=df.columns)
+        full, full_before = df, (_join_partitions(before, parts) if before is not None else None)
+        part_etags = []
+        if parts:
+            df, part_etags = _save_partitions(name, df, parts)  # reste : lignes du CSV
+        ops = _wal_ops(name, path, df, before) if _wal_on() else None
+        if ops is not None:
+            # Journal : seules les lignes modifiées sont écrites (fsync), le fichier n'est pas réécrit
+            etag = compute_etag(df, name)
+            if ops:
+                _wal_append(path, ops, base_etag, etag)
+                _cache_drop(path)
+                _wal_maybe_checkpoint(name, path, df, etag)
+            etag = _sum_etags([etag] + part_etags)
+            if etag != current:
+                _emit_changes(name, full_before, full, paths, etag)
+            _state()[f"etag_{name}"] = etag
+            _remember_base(name, full)
+            return
+        _write_table_file(path, df)
+        _cache_drop(path)
+        if path.suffix == ".parquet":
+            df = full = _read_table_file(path)  # ETag sur la forme relue (types normalisés)
+        etag = compute_etag(df, name)
+        _write_meta(path, len(df), etag)
+        etag = _sum_etags([etag] + part_etags)
+        _emit_changes(name, full_before, full, paths, etag)  # sous le verrou : ordre des écritures conservé
+    _state()[f"etag_{name}"] = etag
+    _remember_base(name, full)
+
+def _append_rows_now(name: str, rows: pd.DataFrame, paths: Optional[Dict[str, Path]] = None, ws_func=None):
+    """Ajoute les lignes (voir _append_rows_backend) puis invalide la version partagée de la table."""
     try:
-        cur = pd.read_csv(path, dtype=str).fillna("")
-    except Exception:
-        cur = pd.DataFrame(columns=df.columns)
-    expected = st.session_state.get(f"etag_{name}")
-    current = compute_etag(cur, name)
-    if expected and expected != current:
-        st.error(f"Conflit de modification détecté sur '{name}'. Veuillez recharger la page.")
-        st.stop()
-    df.to_csv(path, index=False, encoding="utf-8")
-    st.session_state[f"etag_{name}"] = compute_etag(df, name)
+        _append_rows_backend(name, rows, paths, ws_func)
+    finally:
+        _store_invalidate(name)
+
+def _append_rows_backend(name: str, rows: pd.DataFrame, paths: Optional[Dict[str, Path]] = None, ws_func=None):
+    """Ajoute des lignes en fin de table sans réécrire le fichier (création d'interactions, paiements…).
+       En CSV l'ETag est vérifié via le sidecar `<table>.csv.meta.json`, donc sans relire la table.
+       Des ajouts concurrents ne sont pas un conflit : les IDs déjà pris sont renumérotés."""
+    if rows is None or rows.empty:
+        return
+    rows = _as_text(name, rows).fillna("").astype(str)
+    backend = _backend_effective()
+    if backend == "gsheets" and ws_func is not None:
+        tab = SHEET_NAME.get(name, name)
+        try:
+            ws = ws_func(tab)
+            df_remote, version, unchanged = _gs_remote_state(name, ws, ws_func, rows.columns)
+            expected = _state().get(f"etag_{name}")
+            current = expected if unchanged else compute_etag(df_remote, name)
+            key = ROW_KEYS.get(name)
+            if expected and expected != current and key in df_remote.columns:
+                # Ajouts concurrents : pas de conflit, seuls les IDs déjà pris sont renumérotés
+                rows = _rekey_new_rows(rows, df_remote[key], key)
+            header = list(df_remote.columns)
+            if not header or any(c not in header for c in rows.columns):
+                # Nouvelle colonne : réécriture complète
+                df_all = pd.concat([df_remote, rows], ignore_index=True).fillna("")
+                _set_with_dataframe(ws, df_all, include_index=False, include_column_header=True, resize=True)
+            else:
+                values = rows.reindex(columns=header, fill_value="").values.tolist()
+                ws.append_rows(values, value_input_option="USER_ENTERED")
+                df_all = pd.concat([df_remote, rows], ignore_index=True).fillna("")
+            _gs_mirror_write(tab, df_all, paths)
+            _state()[f"etag_{name}"] = compute_etag(df_all, name)
+            _state()[f"gsver_{name}"] = _gs_version_bump(ws_func, tab, version)
+            _remember_base(name, df_all)
+            _emit_rows(name, rows, paths, _state()[f"etag_{name}"])
+            return
+        except Exception as e:
+            if _detached():
+                raise  # écriture différée : l'entrée reste dans le journal, nouvel essai plus tard
+            st.warning(f"Ajout Google Sheets échoué ({tab}), fallback CSV: {e}")
+
+    if backend == "sqlite":
+        con = _sqlite_connect(paths)
+        try:
+            _sqlite_init_table(con, name, list(rows.columns), paths)
+            with con:
+                con.execute("BEGIN IMMEDIATE")
+                current = _sqlite_etag(con, name)
+                expected = _state().get(f"etag_{name}")
+                present = _sqlite_ensure_table(con, name, list(rows.columns))
+                key = ROW_KEYS.get(name)
+                if expected and expected != current and key in present:
+                    taken = [r[0] for r in con.execute(f"SELECT {_q(key)} FROM {_q(name)}").fetchall()]
+                    rows = _rekey_new_rows(rows, taken, key)
+                _sqlite_insert(con, name, rows)
+                etag = etag_add_rows(current, rows.reindex(columns=present, fill_value=""))
+                if etag is None:
+                    etag = compute_etag(pd.read_sql_query(f"SELECT * FROM {_q(name)}", con).fillna("").astype(str), name)
+                _sqlite_set_etag(con, name, etag)
+        finally:
+            con.close()
+        _emit_rows(name, rows, paths, etag)
+        _state()[f"etag_{name}"] = etag
+        return
+
+    # Fichiers locaux : CSV (fallback) ou Parquet
+    path = _table_path(name, paths, backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with table_lock(path):  # ETag relu, ajout et sidecar sous le même verrou
+        try:
+            header = list(pd.read_csv(path, dtype=str, nrows=0).columns) if path.exists() and _is_csv(path) else []
+        except Exception:
+            header = []
+        parts = _partitions(name, path)
+        if not header or any(c not in header for c in rows.columns):
+            # Parquet (non extensible), fichier absent ou schéma élargi : réécriture complète
+            try:
+                cur = _join_partitions(_read_current(name, path), parts)
+            except Exception:
+                cur = pd.DataFrame(columns=rows.columns)
+            _save_df_now(name, pd.concat([cur, rows], ignore_index=True).fillna(""), paths, ws_func)
+            return
+        expected = _state().get(f"etag_{name}")
+        base_etag = _file_base_etag(path, header)
+        records = _wal_pending(path, base_etag)
+        current = records[-1]["etag"] if records else base_etag
+        part_etags = [_partition_etag(p) for p in parts.values()]
+        key = ROW_KEYS.get(name)
+        journal = _wal_on() and key in header and _keyed(rows, key)
+        if key in header and (journal or (expected and expected != _sum_etags([current] + part_etags))):
+            # Ajouts concurrents : pas de conflit, seuls les IDs déjà pris sont renumérotés
+            # (journal : toujours vérifié, un insert rejoué remplacerait la ligne de même ID)
+            taken = (_current_frame(name, path) if journal else _read_current(name, path, columns=[key]))[key]
+            taken = pd.concat([taken] + [_partition_read(p)[0].get(key, pd.Series(dtype=str)) for p in parts.values()])
+            rows = _rekey_new_rows(rows, taken.fillna(""), key)
+        rows = rows.reindex(columns=header, fill_value="")
+        added = rows
+        if parts:
+            rows, part_etags = _append_partitions(name, rows, parts)  # mois archivés : dans leur archive
+        if rows.empty:
+            etag = current
+        elif journal:
+            etag = etag_add_rows(current, rows)
+            if etag is None:
+                etag = compute_etag(pd.concat([_current_frame(name, path), rows], ignore_index=True), name)
+            _wal_append(path, wal.row_ops("insert", rows, key, _session_user()), base_etag, etag)
+            _cache_drop(path)
+            _wal_maybe_checkpoint(name, path)
+        else:
+            if records:
+                _wal_checkpoint(name, path)  # journal en attente (désactivé depuis) : compacté avant l'ajout en place
+            meta = _read_meta(path) or {}
+            _append_csv_rows(path, rows)
+            _cache_drop(path)
+            etag = etag_add_rows(current, rows)
+            if etag is None:
+                # ETag d'un ancien format : recalcul complet une fois
+                etag = compute_etag(_read_table_file(path), name)
+            _write_meta(path, int(meta.get("rows", 0)) + len(rows), etag)
+        etag = _sum_etags([etag] + part_etags)
+        _emit_rows(name, added, paths, etag)
+        _state()[f"etag_{name}"] = etag
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+import streamlit as st
+
+import changefeed
+import storage_backend as sb
+
+COLS = ["ID_Interaction", "ID", "Objet"]
+
+@pytest.fixture()
+def paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # répertoires par défaut (data/.changes…) hors de l'arbre
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    return {"inter": tmp_path / "interactions.csv"}
+
+def _row(i, objet="x", by=""):
+    return {"ID_Interaction": f"INT{i:05d}", "ID": f"CNT{i:05d}", "Objet": objet, "Updated_By": by}
+
+def test_writes_publish_row_changes_to_subscribers(paths):
+    sb.save_df_target("inter", pd.DataFrame([_row(1), _row(2)]), paths)
+    sub = sb.change_subscription(["inter"], paths=paths)
+    pushed = []
+    unsubscribe = changefeed.subscribe(pushed.extend, tables=["inter"])
+    try:
+        df = sb.ensure_df_source("inter", COLS, paths)
+        df.loc[df["ID_Interaction"] == "INT00001", ["Objet", "Updated_By"]] = ["modifié", "alice@iiba.cm"]
+        sb.save_df_target("inter", df[df["ID_Interaction"] != "INT00002"], paths)
+        sb.append_rows_target("inter", pd.DataFrame([_row(3, by="bob@iiba.cm")]), paths)
+    finally:
+        unsubscribe()
+    events = sub.poll()
+    assert [(e["op"], e["key"]) for e in events] == [("update", "INT00001"), ("delete", "INT00002"),
+                                                     ("insert", "INT00003")]
+    update = events[0]
+    assert update["before"]["Objet"] == "x" and update["after"]["Objet"] == "modifié"
+    assert update["user"] == "alice@iiba.cm" and events[2]["user"] == "bob@iiba.cm"
+    assert events[-1]["etag"] == st.session_state["etag_inter"]
+    assert [e["seq"] for e in pushed] == [e["seq"] for e in events]
+    assert sub.poll() == []
+
+def test_interrupted_publication_is_dropped_and_view_follows_events(tmp_path):
+    changefeed.publish(changefeed.row_events("t", "insert", pd.DataFrame([{"k": "1", "v": "a"}]), "k", "u"),
+                       log_dir=tmp_path)
+    seg = changefeed._segments(tmp_path)[-1]
+    with open(seg, "ab") as fh:
+        fh.write(b'{"seq": 2, "table": "t"')  # arrêt brutal pendant l'écriture
+    changefeed.publish(changefeed.row_events("t", "update", pd.DataFrame([{"k": "1", "v": "b"}]), "k", "u"),
+                       log_dir=tmp_path)
+    events = changefeed.read_since(0, log_dir=tmp_path)
+    assert [e["seq"] for e in events] == [1, 2]
+    view = changefeed.apply_events(pd.DataFrame(columns=["k", "v"]), events, "k")
+    assert view.to_dict("records") == [{"k": "1", "v": "b"}]
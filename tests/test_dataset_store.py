@@ -0,0 +1,52 @@
+import pandas as pd
+import streamlit as st
+
+import dataset_store
+import storage_backend as sb
+
+def test_write_invalidates_only_dependent_computations(tmp_path):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    paths = {"inter": tmp_path / "interactions.csv", "events": tmp_path / "evenements.csv"}
+    calls = []
+
+    @dataset_store.cached_on("inter")
+    def count_inter():
+        calls.append("inter")
+        return len(sb.ensure_df_source("inter", ["ID_Interaction", "ID"], paths))
+
+    @dataset_store.cached_on("events")
+    def count_events():
+        calls.append("events")
+        return len(sb.ensure_df_source("events", ["ID_Événement"], paths))
+
+    assert (count_inter(), count_events()) == (0, 0)
+    count_inter(), count_events()  # ETags désormais connus de la session : résultats en cache
+    before = list(calls)
+    sb.append_rows_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001"}]), paths)
+    assert (count_inter(), count_events()) == (1, 0)
+    assert calls[len(before):] == ["inter"]  # events n'a pas bougé : pas de recalcul
+    stats = dataset_store.get_store().derived.status()["fonctions"]
+    assert stats["test_dataset_store.py:test_write_invalidates_only_dependent_computations.<locals>.count_events"]["hits"] >= 1
+
+def test_cached_result_is_shared_by_sessions_and_follows_the_file(tmp_path):
+    paths = {"users": tmp_path / "users.csv"}
+    cols = ["user_id", "email"]
+    pd.DataFrame([{"user_id": "U1", "email": "a@x"}]).to_csv(paths["users"], index=False)
+    calls = []
+
+    @dataset_store.cached_on("users")
+    def load_users():
+        calls.append(1)
+        return sb.ensure_df_source("users", cols, paths)
+
+    with sb.session_state_override({"BACKEND_EFFECTIVE": "csv"}):
+        load_users(), load_users()
+    with sb.session_state_override({"BACKEND_EFFECTIVE": "csv"}) as fresh:
+        assert len(load_users()) == 1 and len(calls) == 2  # servi depuis le cache
+        assert fresh["etag_users"] == sb.compute_etag(pd.read_csv(paths["users"], dtype=str), "users")
+        assert list(fresh["base_users"]["user_id"]) == ["U1"]  # l'enregistrement aura sa base de fusion
+    pd.DataFrame([{"user_id": "U1", "email": "a@x"}, {"user_id": "U2", "email": "b@x"}]).to_csv(
+        paths["users"], index=False)  # modifié hors de l'application
+    with sb.session_state_override({"BACKEND_EFFECTIVE": "csv"}):
+        assert len(load_users()) == 2
@@ -0,0 +1,17 @@
+import time
+
+import pandas as pd
+
+import gs_cache
+
+def test_mirror_roundtrip_and_ttl(tmp_path):
+    df = pd.DataFrame({"ID": ["CNT00001"], "Nom": ["Mbarga"], "Ville": [""]})
+    gs_cache.write_mirror("contacts", df, revision="r1", cache_dir=tmp_path)
+    got, meta = gs_cache.read_mirror("contacts", cache_dir=tmp_path)
+    assert got.equals(df)
+    assert meta["revision"] == "r1" and meta["rows"] == 1
+    assert not gs_cache.is_stale(meta, ttl_s=60)
+    assert gs_cache.is_stale({**meta, "fetched_at": time.time() - 120}, ttl_s=60)
+
+def test_missing_mirror_is_none(tmp_path):
+    assert gs_cache.read_mirror("paiements", cache_dir=tmp_path) is None
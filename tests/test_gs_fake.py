@@ -0,0 +1,49 @@
+import pytest
+import streamlit as st
+
+import storage_backend as sb
+from gs_fake import Client, FakeAPIError, FakeServer, make_fake_ws_func, parse_range
+from gs_scheduler import RequestScheduler, Scheduled
+
+COLS = ["ID_Interaction", "ID", "Objet"]
+
+@pytest.fixture()
+def sheet(tmp_path, monkeypatch):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "gsheets"
+    monkeypatch.setattr(sb, "_gs_cache_ttl", lambda: 0)
+    server = FakeServer()
+    ss = Client(server).create("IIBA CRM DB")
+    ss.add_worksheet("interactions").update("A1", [COLS, ["INT00001", "CNT00001", "a"], ["INT00002", "CNT00002", "b"]])
+    return server, ss, make_fake_ws_func(ss), {"inter": tmp_path / "interactions.csv"}
+
+def test_parse_range():
+    assert parse_range("'interactions'") == ("interactions", (1, 1, None, None))
+    assert parse_range("B3:C4") == (None, (3, 2, 4, 3))
+    assert parse_range("'_meta'!B2") == ("_meta", (2, 2, 2, 2))
+
+def test_batch_load_then_diff_save_roundtrip(sheet):
+    server, ss, ws_func, paths = sheet
+    df = sb.ensure_df_sources({"inter": COLS}, paths, ws_func)["inter"]
+    assert df["Objet"].tolist() == ["a", "b"]
+    before = server.stats()["by_method"].get("get_all_values", 0)
+    df.loc[df["ID_Interaction"] == "INT00002", "Objet"] = "B"
+    sb.save_df_target("inter", df[COLS], paths, ws_func)
+    assert ss.worksheet("interactions").get_all_values()[2] == ["INT00002", "CNT00002", "B"]
+    assert server.stats()["by_method"].get("get_all_values", 0) == before + 1  # la relecture de contrôle ci-dessus
+
+def test_scheduler_retries_fake_server_errors_on_reads():
+    server = FakeServer(seed=3)
+    ss = Client(server).create("x")
+    ws = Scheduled(ss, RequestScheduler(per_min=6000, sleep=lambda s: None)).add_worksheet("t")
+    ws.append_rows([["a"]])
+    server.error_rate = 0.5  # écritures non relancées sur 503 : voir test_gs_scheduler
+    assert all(ws.get_all_values() == [["a"]] for _ in range(5))
+
+def test_quota_exceeded_raises_429():
+    server = FakeServer(quota_per_min=1)
+    client = Client(server)
+    client.create("x")
+    with pytest.raises(FakeAPIError) as exc:
+        client.open("x")
+    assert exc.value.code == 429
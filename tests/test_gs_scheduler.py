@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from gs_scheduler import RequestScheduler, Scheduled
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+def test_retries_429_then_succeeds():
+    sleeps = []
+    sched = RequestScheduler(per_min=6000, sleep=sleeps.append)
+    answers = iter([FakeAPIError(429), FakeAPIError(503), "ok"])
+    def flaky():
+        a = next(answers)
+        if isinstance(a, Exception):
+            raise a
+        return a
+    assert sched.call(flaky) == "ok"
+    assert sched.stats()["retries"] == 2 and len(sleeps) == 2
+
+def test_non_retryable_error_is_raised():
+    sched = RequestScheduler(per_min=6000, sleep=lambda s: None)
+    with pytest.raises(FakeAPIError):
+        sched.call(lambda: (_ for _ in ()).throw(FakeAPIError(403)))
+    assert sched.stats()["errors"] == 1
+
+def test_identical_reads_are_coalesced():
+    sched = RequestScheduler(per_min=6000)
+    gate, calls = threading.Event(), []
+    def slow_read():
+        calls.append(1)
+        gate.wait(2)
+        return [["ID"], ["CNT00001"]]
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sched.call(slow_read, key=("get_all_values",))))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    while sched.stats()["coalesced"] < 2:
+        pass
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len(results) == 3
+
+def test_write_is_not_retried_on_5xx():
+    sched = RequestScheduler(per_min=6000, sleep=lambda s: None)
+    class Sheet:
+        calls = 0
+        def append_rows(self, rows):
+            Sheet.calls += 1
+            raise FakeAPIError(503)  # peut avoir été appliqué côté serveur
+    with pytest.raises(FakeAPIError):
+        Scheduled(Sheet(), sched).append_rows([["INT00001"]])
+    assert Sheet.calls == 1 and sched.stats()["retries"] == 0
@@ -0,0 +1,53 @@
+import pandas as pd
+import streamlit as st
+
+import schema
+import storage_backend as sb
+
+def test_typed_roundtrip_is_lossless():
+    df = pd.DataFrame([{"ID_Paiement": "PAY00001", "Montant": "15000", "Statut": "Réglé", "Date_Paiement": "2024-03-01"},
+                       {"ID_Paiement": "PAY00002", "Montant": "", "Statut": "", "Date_Paiement": ""}])
+    typed = schema.to_typed(df, "pay")
+    assert str(typed["Montant"].dtype) == "Int64"
+    assert pd.api.types.is_datetime64_any_dtype(typed["Date_Paiement"])
+    assert isinstance(typed["Statut"].dtype, pd.CategoricalDtype)
+    assert schema.to_text(typed, "pay").equals(df)
+
+def test_unparseable_column_stays_text():
+    df = pd.DataFrame({"Montant": ["1000", "mille"], "Date_Paiement": ["2024-03-01", "bientôt"]})
+    typed = schema.to_typed(df, "pay")
+    assert typed["Montant"].tolist() == ["1000", "mille"]
+    assert typed["Date_Paiement"].tolist() == ["2024-03-01", "bientôt"]
+
+def test_typed_frame_saved_as_text(tmp_path):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    paths = {"pay": tmp_path / "paiements.csv"}
+    cols = ["ID_Paiement", "Montant", "Date_Paiement"]
+    df = pd.DataFrame([{"ID_Paiement": "PAY00001", "Montant": "2500", "Date_Paiement": "2024-05-02"}])
+    sb.save_df_target("pay", df, paths)
+    typed = sb.ensure_df_source("pay", cols, paths, typed=True)
+    assert typed["Montant"].sum() == 2500
+    sb.save_df_target("pay", typed, paths)
+    saved = pd.read_csv(paths["pay"], dtype=str, keep_default_na=False)
+    assert list(saved.columns) == cols + sb.AUDIT_COLS
+    assert saved[cols].values.tolist() == [["PAY00001", "2500", "2024-05-02"]]
+
+def test_unedited_cells_keep_their_stored_text(tmp_path):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    paths = {"entreprises": tmp_path / "entreprises.csv"}
+    cols = ["ID_Entreprise", "CA_Annuel", "Nb_Employes"]
+    df = pd.DataFrame([{"ID_Entreprise": "ENT001", "CA_Annuel": "15000.0", "Nb_Employes": "007"},
+                       {"ID_Entreprise": "ENT002", "CA_Annuel": "2 500", "Nb_Employes": "12"}])
+    sb.save_df_target("entreprises", df, paths)
+    typed = sb.ensure_df_source("entreprises", cols, paths, typed=True)
+    assert typed["Nb_Employes"].tolist() == [7, 12]
+    typed.loc[typed["ID_Entreprise"] == "ENT002", "Nb_Employes"] = 13
+    sb.save_df_target("entreprises", typed, paths)
+    saved = pd.read_csv(paths["entreprises"], dtype=str, keep_default_na=False)
+    assert saved[cols].values.tolist() == [["ENT001", "15000.0", "007"], ["ENT002", "2 500", "13"]]
+
+def test_day_first_dates():
+    df = pd.DataFrame({"Date_Paiement": ["03/04/2024", "2024-05-02"]})
+    assert schema.to_typed(df, "pay")["Date_Paiement"].dt.month.tolist() == [4, 5]
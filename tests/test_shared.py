@@ -0,0 +1,39 @@
+import pandas as pd
+import streamlit as st
+
+import _shared
+
+def test_load_all_tables_loads_only_tables_read(monkeypatch):
+    st.session_state.clear()
+    batches = []
+
+    def fake_load(names, typed=False):
+        batches.append(list(names))
+        return {n: pd.DataFrame({"n": [n]}) for n in names}
+
+    monkeypatch.setattr(_shared, "_load_tables", fake_load)
+    dfs = _shared.load_all_tables()
+    assert batches == [] and "pay" in dfs
+    assert dfs["events"].iloc[0]["n"] == "events"
+    dfs.get("parts")
+    dfs["events"]
+    assert batches == [["events"], ["parts"]]
+    assert st.session_state["TABLES_LOADED"]["test_shared.py"] == ["events", "parts"]
+    # Run suivant de la même page : les tables déjà lues arrivent en un seul lot
+    _shared.load_all_tables()["parts"]
+    assert batches[-1] == ["parts", "events"]
+
+def test_bundle_roundtrip_detects_tampering():
+    dfs = {"contacts": pd.DataFrame({"ID": ["CNT00001", "CNT00002"], "Nom": ["Éto'o", ""]}),
+           "pay": pd.DataFrame(columns=["ID_Paiement", "Montant"])}
+    for codec in _shared.bundle_codecs():
+        tables, manifest = _shared.read_bundle(_shared.build_bundle(dfs, codec))
+        assert tables["contacts"].equals(dfs["contacts"]) and list(tables["pay"].columns) == ["ID_Paiement", "Montant"]
+        assert manifest["tables"]["contacts"]["rows"] == 2
+    data = _shared.build_bundle(dfs, "gzip")
+    try:
+        _shared.read_bundle(data[: len(data) // 2])
+    except Exception:
+        pass
+    else:
+        raise AssertionError("archive tronquée acceptée")
@@ -0,0 +1,309 @@
+import os
+import pandas as pd
+import pytest
+import streamlit as st
+
+import storage_backend as sb
+
+COLS = ["ID_Interaction", "ID", "Objet"]
+
+@pytest.fixture()
+def paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # répertoires par défaut (data/.changes, data/.gs_cache…) hors de l'arbre
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    return {"inter": tmp_path / "interactions.csv"}
+
+def test_append_rows_writes_only_new_rows(paths):
+    sb.save_df_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}]), paths)
+    sb.append_rows_target("inter", pd.DataFrame([{"ID_Interaction": "INT00002", "ID": "CNT00002", "Objet": "b"}]), paths)
+    lines = paths["inter"].read_text(encoding="utf-8").splitlines()
+    assert lines == ["ID_Interaction,ID,Objet", "INT00001,CNT00001,a", "INT00002,CNT00002,b"]
+    meta = sb._read_meta(paths["inter"])
+    assert meta["rows"] == 2
+    assert meta["etag"] == st.session_state["etag_inter"]
+
+def test_reload_keeps_appended_etag(paths):
+    sb.ensure_df_source("inter", COLS, paths)
+    sb.append_rows_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}]), paths)
+    etag = st.session_state["etag_inter"]
+    df = sb.ensure_df_source("inter", COLS, paths)
+    assert len(df) == 1
+    assert st.session_state["etag_inter"] == etag
+
+def test_external_rewrite_invalidates_sidecar(paths):
+    sb.ensure_df_source("inter", COLS, paths)
+    pd.DataFrame([{"ID_Interaction": "X", "ID": "Y", "Objet": "z"}]).to_csv(paths["inter"], index=False)
+    assert sb._read_meta(paths["inter"]) is None
+
+def test_parquet_roundtrip_keeps_types(tmp_path):
+    pytest.importorskip("pyarrow")
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "parquet"
+    paths = {"pay": tmp_path / "paiements.csv"}
+    df = pd.DataFrame([{"ID_Paiement": "PAY00001", "Montant": "15 000", "Date_Paiement": "2025-03-01", "Top20": "1"}])
+    sb.save_df_target("pay", df, paths)
+    typed = pd.read_parquet(tmp_path / "paiements.parquet")
+    assert str(typed["Montant"].dtype) == "Int64"
+    assert pd.api.types.is_datetime64_any_dtype(typed["Date_Paiement"])
+    back = sb.ensure_df_source("pay", ["ID_Paiement", "Montant"], paths, columns=["Montant"])
+    assert list(back.columns) == ["Montant"]
+    assert back.iloc[0]["Montant"] == "15000"
+
+def test_sqlite_row_level_save_and_query(tmp_path):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "sqlite"
+    paths = {"pay": tmp_path / "paiements.csv"}
+    cols = ["ID_Paiement", "ID", "Montant"]
+    df = sb.ensure_df_source("pay", cols, paths)
+    df = pd.concat([df, pd.DataFrame([{"ID_Paiement": "PAY00001", "ID": "CNT00001", "Montant": "100"},
+                                      {"ID_Paiement": "PAY00002", "ID": "CNT00002", "Montant": "200"}])]).fillna("")
+    sb.save_df_target("pay", df, paths)
+    df.loc[df["ID_Paiement"] == "PAY00002", "Montant"] = "250"
+    sb.save_df_target("pay", df, paths)
+    got = sb.query_rows("pay", cols, {"ID": ["CNT00002"]}, paths)
+    assert got["Montant"].tolist() == ["250"]
+    con = sb._sqlite_connect(paths)
+    idx = [r[1] for r in con.execute("PRAGMA index_list(pay)").fetchall()]
+    con.close()
+    assert "ux_pay_key" in idx and "ix_pay_0" in idx
+
+def test_unchanged_file_served_from_stat_cache(paths, monkeypatch):
+    sb.clear_file_cache()
+    sb.save_df_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}]), paths)
+    first = sb.ensure_df_source("inter", COLS, paths)
+    monkeypatch.setattr(sb, "_read_table_file", lambda *a, **k: pytest.fail("CSV re-parsed"))
+    again = sb.ensure_df_source("inter", COLS, paths)
+    assert again.equals(first)
+    monkeypatch.undo()
+    sb.append_rows_target("inter", pd.DataFrame([{"ID_Interaction": "INT00002", "ID": "CNT00002", "Objet": "b"}]), paths)
+    assert len(sb.ensure_df_source("inter", COLS, paths)) == 2
+
+def test_row_hash_etag_is_order_independent_and_incremental():
+    df = pd.DataFrame([{"ID_Paiement": f"PAY{i:05d}", "Montant": str(i)} for i in range(5)])
+    assert sb.compute_etag(df, "pay") == sb.compute_etag(df.iloc[::-1][["Montant", "ID_Paiement"]], "pay")
+    head, tail = df.iloc[:3], df.iloc[3:]
+    assert sb.etag_add_rows(sb.compute_etag(head, "pay"), tail) == sb.compute_etag(df, "pay")
+    edited = df.copy(); edited.loc[1, "Montant"] = "99"
+    etag = sb.etag_replace_rows(sb.compute_etag(df, "pay"), df.iloc[[1]], edited.iloc[[1]])
+    assert etag == sb.compute_etag(edited, "pay") != sb.compute_etag(df, "pay")
+
+def test_concurrent_edits_on_different_rows_are_merged(paths):
+    start = pd.DataFrame([{"ID_Interaction": f"INT0000{i}", "ID": f"CNT0000{i}", "Objet": "x"} for i in (1, 2)])
+    sb.save_df_target("inter", start, paths)
+    mine = sb.ensure_df_source("inter", COLS, paths)
+    # Un autre utilisateur modifie INT00001 et ajoute INT00003
+    theirs = start.copy(); theirs.loc[0, "Objet"] = "autre"
+    theirs = pd.concat([theirs, pd.DataFrame([{"ID_Interaction": "INT00003", "ID": "CNT00003", "Objet": "new"}])])
+    theirs.to_csv(paths["inter"], index=False)
+    mine.loc[mine["ID_Interaction"] == "INT00002", "Objet"] = "moi"
+    mine = pd.concat([mine, pd.DataFrame([{"ID_Interaction": "INT00003", "ID": "CNT00009", "Objet": "mien"}])]).fillna("")
+    sb.save_df_target("inter", mine, paths)
+    out = pd.read_csv(paths["inter"], dtype=str).fillna("").set_index("ID_Interaction")
+    assert out.loc["INT00001", "Objet"] == "autre"
+    assert out.loc["INT00002", "Objet"] == "moi"
+    assert out.loc["INT00003", "ID"] == "CNT00003"
+    assert out.loc["INT00004", "ID"] == "CNT00009"  # création concurrente renumérotée
+    assert st.session_state["conflicts_inter"] == []
+
+def test_same_row_edited_twice_keeps_theirs(paths):
+    sb.save_df_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "x"}]), paths)
+    mine = sb.ensure_df_source("inter", COLS, paths)
+    pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "autre"}]).to_csv(paths["inter"], index=False)
+    mine["Objet"] = "moi"
+    sb.save_df_target("inter", mine, paths)
+    assert pd.read_csv(paths["inter"], dtype=str).loc[0, "Objet"] == "autre"
+    assert st.session_state["conflicts_inter"] == ["INT00001"]
+
+def test_edits_on_columns_added_after_the_base_are_seen():
+    base = pd.DataFrame([{"ID_Interaction": f"INT0000{i}", "ID": "CNT00001", "Objet": "x"} for i in (1, 2)])
+    theirs = base.assign(Note=["", "ajoutée"])            # colonne créée ailleurs, renseignée sur INT00002
+    theirs.loc[0, "Objet"] = "autre"
+    mine = base.assign(Note=["mienne", ""])               # seule modification : la nouvelle colonne
+    mine.loc[1, "Objet"] = "moi"
+    out, conflicts = sb.merge_three_way(base, mine, theirs, "ID_Interaction")
+    assert conflicts == ["INT00001", "INT00002"]          # modifiées des deux côtés, rien d'écrasé en silence
+    out = out.set_index("ID_Interaction")
+    assert out.loc["INT00001", "Objet"] == "autre" and out.loc["INT00002", "Note"] == "ajoutée"
+
+class _RecordingWS:
+    def __init__(self):
+        self.calls = []
+    def batch_update(self, data, **kw):
+        self.calls.append(("batch_update", data))
+    def append_rows(self, values, **kw):
+        self.calls.append(("append_rows", values))
+    def batch_clear(self, ranges):
+        self.calls.append(("batch_clear", ranges))
+
+def test_gs_diff_write_sends_only_changes():
+    old = pd.DataFrame({"ID": ["C1", "C2", "C3"], "Nom": ["a", "b", "c"], "Ville": ["x", "y", "z"]})
+    new = old.copy()
+    new.loc[1, ["Nom", "Ville"]] = ["B", "Y"]
+    new = pd.concat([new, pd.DataFrame([{"ID": "C4", "Nom": "d", "Ville": "w"}])], ignore_index=True)
+    ws = _RecordingWS()
+    stats = sb._gs_diff_write(ws, old, new)
+    assert stats["mode"] == "diff" and stats["cells"] == 2 and stats["appended"] == 1
+    assert ws.calls == [("batch_update", [{"range": "B3:C3", "values": [["B", "Y"]]}]),
+                        ("append_rows", [["C4", "d", "w"]])]
+
+def test_parallel_load_reports_failing_table_without_blocking_others(tmp_path, monkeypatch):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    paths = {"inter": tmp_path / "interactions.csv", "pay": tmp_path / "paiements.csv"}
+    real = sb.ensure_df_source
+    def flaky(name, *a, **k):
+        if name == "pay":
+            raise OSError("disque indisponible")
+        return real(name, *a, **k)
+    monkeypatch.setattr(sb, "ensure_df_source", flaky)
+    out = sb.ensure_df_sources({"inter": COLS, "pay": ["ID_Paiement", "Montant"]}, paths, max_workers=4)
+    assert list(out) == ["inter", "pay"]
+    assert out["pay"].empty and "ID_Paiement" in out["pay"].columns
+    assert st.session_state["LOAD_ERRORS"] == {"pay": "disque indisponible"}
+    with pytest.raises(OSError):
+        sb.ensure_df_sources({"inter": COLS, "pay": ["ID_Paiement"]}, paths, on_error="raise")
+
+class _Cell:
+    def __init__(self, value):
+        self.value = value
+
+class _MetaWS(_RecordingWS):
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+    def get_all_values(self):
+        return self.rows
+    def acell(self, a1):
+        row = int(a1[1:]) - 1
+        return _Cell(self.rows[row][1] if row < len(self.rows) else "")
+    def batch_update(self, data, **kw):
+        super().batch_update(data, **kw)
+        for upd in data:
+            if upd["range"].startswith("B"):
+                self.rows[int(upd["range"].split(":")[0][1:]) - 1][1:3] = upd["values"][0]
+    def hide(self):
+        pass
+
+def test_gs_save_skips_download_when_version_unchanged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "gsheets"
+    meta = _MetaWS([sb.GS_META_HEADER] + [[t, "3", ""] for t in sb.GS_META_TABS])
+    data = _RecordingWS()
+    def ws_func(tab):
+        return meta if tab == sb.GS_META_TAB else data
+    ws_func.spreadsheet = object()
+    base = pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}])
+    st.session_state.update({"gsver_inter": 3, "base_inter": base, "etag_inter": sb.compute_etag(base, "inter")})
+    monkeypatch.setattr(sb, "_get_as_dataframe", lambda *a, **k: pytest.fail("onglet retéléchargé"))
+    edited = base.copy(); edited.loc[0, "Objet"] = "b"
+    sb.save_df_target("inter", edited, {"inter": tmp_path / "interactions.csv"}, ws_func=ws_func)
+    assert data.calls == [("batch_update", [{"range": "C2:C2", "values": [["b"]]}])]
+    assert st.session_state["gsver_inter"] == 4
+    assert meta.rows[1 + sb.GS_META_TABS.index("interactions")][1] == "4"
+
+def test_sessions_share_one_frame_and_writes_bump_only_their_table(tmp_path):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    paths = {"inter": tmp_path / "interactions.csv", "pay": tmp_path / "paiements.csv"}
+    sb.save_df_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}]), paths)
+    sb.ensure_df_source("pay", ["ID_Paiement"], paths)
+    a = sb.ensure_df_source("inter", COLS, paths)
+    with sb.session_state_override({"BACKEND_EFFECTIVE": "csv"}) as other:
+        b = sb.ensure_df_source("inter", COLS, paths)
+        assert other["etag_inter"] == st.session_state["etag_inter"]
+    assert a is not b and a.equals(b)
+    a.loc[0, "Objet"] = "modifié localement"
+    assert b.loc[0, "Objet"] == "a"  # la vue d'une session ne touche pas les autres
+    pay_version = sb.data_version("pay")
+    inter_version = sb.data_version("inter")
+    sb.append_rows_target("inter", pd.DataFrame([{"ID_Interaction": "INT00002", "ID": "CNT00002", "Objet": "b"}]), paths)
+    assert sb.data_version("inter") > inter_version
+    assert sb.data_version("pay") == pay_version
+    assert len(sb.ensure_df_source("inter", COLS, paths)) == 2
+
+def test_cold_start_reads_snapshot_until_file_changes(paths, monkeypatch):
+    pytest.importorskip("pyarrow")
+    sb.save_df_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}]), paths)
+    sb.clear_file_cache()
+    sb.dataset_store.get_store.clear()
+    first = sb.ensure_df_source("inter", COLS, paths)  # parsing + instantané
+    assert sb._snapshot_path(paths["inter"]).exists()
+    sb.clear_file_cache()
+    sb.dataset_store.get_store.clear()
+    monkeypatch.setattr(sb, "_read_table_file", lambda *a, **k: pytest.fail("CSV re-parsed"))
+    assert sb.ensure_df_source("inter", COLS, paths).equals(first)
+    monkeypatch.undo()
+    pd.DataFrame([{"ID_Interaction": "X", "ID": "Y", "Objet": "z"}]).to_csv(paths["inter"], index=False)
+    sb.clear_file_cache()
+    assert sb.ensure_df_source("inter", COLS, paths)["ID_Interaction"].tolist() == ["X"]
+
+def test_table_lock_excludes_other_writers_and_leaves_no_temp_files(paths):
+    fcntl = pytest.importorskip("fcntl")
+    sb.save_df_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}]), paths)
+    with sb.table_lock(paths["inter"]):
+        with sb.table_lock(paths["inter"]):  # réentrant
+            pass
+        fd = os.open(sb._lock_path(paths["inter"]), os.O_RDWR)
+        try:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)  # autre écrivain (autre descripteur)
+        finally:
+            os.close(fd)
+    assert not list(paths["inter"].parent.glob(".*.tmp"))
+
+def test_old_months_are_archived_and_period_queries_skip_other_archives(paths, monkeypatch):
+    cols = COLS + ["Date"]
+
+    def rows(*items):
+        return pd.DataFrame([{"ID_Interaction": f"INT{i:05d}", "ID": "CNT00001", "Objet": "x", "Date": d}
+                             for i, d in items]).reindex(columns=cols + sb.AUDIT_COLS, fill_value="")
+    recent = pd.Timestamp.today().strftime("%Y-%m-%d")
+    sb.save_df_target("inter", rows((1, "2020-01-15"), (2, "2020-02-03"), (3, recent), (4, "")), paths)
+    etag = st.session_state["etag_inter"]
+    assert sb.archive_partitions("inter", paths, hot_months=12) == 2
+    parts = sb._partitions("inter", paths["inter"])
+    assert list(parts) == ["2020-01", "2020-02"] and parts["2020-01"].name.endswith(".csv.gz")
+    assert len(pd.read_csv(paths["inter"], dtype=str)) == 2
+    df = sb.ensure_df_source("inter", cols, paths)
+    assert len(df) == 4 and st.session_state["etag_inter"] == etag  # même table, même ETag
+    read = []
+    monkeypatch.setattr(sb, "_partition_read", lambda p, f=sb._partition_read: read.append(p.name) or f(p))
+    sb.clear_file_cache()
+    jan = sb.query_period("inter", cols, "2020-01-01", "2020-01-31", paths)
+    assert list(jan["ID_Interaction"]) == ["INT00001"] and read == ["2020-01.csv.gz"]
+    # Save : seule l'archive modifiée est réécrite ; ajout daté d'un mois archivé : dans son archive
+    feb = parts["2020-02"].stat().st_mtime_ns
+    df.loc[df["ID_Interaction"] == "INT00001", "Objet"] = "modifié"
+    sb.save_df_target("inter", df, paths)
+    assert parts["2020-02"].stat().st_mtime_ns == feb
+    assert pd.read_csv(parts["2020-01"], dtype=str)["Objet"].tolist() == ["modifié"]
+    sb.append_rows_target("inter", rows((5, "2020-02-20")), paths)
+    assert pd.read_csv(parts["2020-02"], dtype=str)["ID_Interaction"].tolist() == ["INT00002", "INT00005"]
+    assert len(pd.read_csv(paths["inter"], dtype=str)) == 2
+    etag = st.session_state["etag_inter"]
+    assert etag == sb.compute_etag(sb.ensure_df_source("inter", cols, paths), "inter")
+
+def test_day_first_dates_go_to_their_month(paths):
+    cols = COLS + ["Date"]
+    df = pd.DataFrame([{"ID_Interaction": f"INT{i:05d}", "ID": "CNT00001", "Objet": "x", "Date": d}
+                       for i, d in [(1, "2020-01-15"), (2, "03/04/2020"), (3, "2020-02-03")]])
+    sb.save_df_target("inter", df.reindex(columns=cols + sb.AUDIT_COLS, fill_value=""), paths)
+    assert sb.table_months("inter", cols, paths) == ["2020-01", "2020-02", "2020-04"]
+    assert sb.archive_partitions("inter", paths, hot_months=12) == 3
+    assert list(sb._partitions("inter", paths["inter"])) == ["2020-01", "2020-02", "2020-04"]
+    april = sb.query_period("inter", cols, "2020-04-01", "2020-04-30", paths)
+    assert list(april["ID_Interaction"]) == ["INT00002"]
+
+def test_compressed_tables_are_converted_and_stay_readable(paths, monkeypatch):
+    sb.save_df_target("inter", pd.DataFrame([{"ID_Interaction": "INT00001", "ID": "CNT00001", "Objet": "a"}]), paths)
+    etag = st.session_state["etag_inter"]
+    monkeypatch.setattr(sb, "_compression", lambda: "gzip")
+    df = sb.ensure_df_source("inter", COLS, paths)
+    gz = paths["inter"].with_name("interactions.csv.gz")
+    assert gz.exists() and not paths["inter"].exists()
+    assert len(df) == 1 and st.session_state["etag_inter"] == etag
+    sb.append_rows_target("inter", pd.DataFrame([{"ID_Interaction": "INT00002", "ID": "CNT00002", "Objet": "b"}]), paths)
+    assert pd.read_csv(gz, dtype=str)["ID_Interaction"].tolist() == ["INT00001", "INT00002"]
+    assert sb._read_meta(gz)["etag"] == st.session_state["etag_inter"]
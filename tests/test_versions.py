@@ -0,0 +1,28 @@
+import time
+
+import pandas as pd
+
+import versions
+
+def _df(rows):
+    return pd.DataFrame(rows, columns=["ID", "Nom"])
+
+def test_row_deltas_restore_at_date_diff_and_retention(tmp_path):
+    v1 = versions.record("contacts", _df([["C1", "a"], ["C2", "b"]]), "ID", root=tmp_path)
+    v2 = versions.record("contacts", _df([["C1", "a"], ["C2", "B"], ["C3", "c"]]), "ID", root=tmp_path)
+    assert versions.record("contacts", _df([["C1", "a"], ["C2", "B"], ["C3", "c"]]), "ID", root=tmp_path) is None
+    cut = time.time()
+    time.sleep(0.01)
+    v3 = versions.record("contacts", _df([]), "ID", reason="réinitialisation", root=tmp_path)
+    hist = versions.history("contacts", tmp_path)
+    assert [h["kind"] for h in hist] == ["full", "delta", "delta"]
+    assert (hist[1]["ajouts"], hist[1]["modifications"], hist[2]["suppressions"]) == (1, 1, 3)
+    assert versions.restore_at("contacts", cut, tmp_path).values.tolist() == [["C1", "a"], ["C2", "B"], ["C3", "c"]]
+    changes = versions.diff("contacts", v1, v2, "ID", tmp_path)
+    assert changes["ajoutées"]["ID"].tolist() == ["C3"] and changes["supprimées"].empty
+    assert changes["modifiées"].values.tolist() == [["C2", "Nom", "b", "B"]]
+    # Rétention : la plus ancienne version gardée devient un état complet, les autres fichiers sont retirés
+    assert versions.compact("contacts", keep_days=0, keep_min=1, root=tmp_path) == 2
+    assert [h["kind"] for h in versions.history("contacts", tmp_path)] == ["full"]
+    assert versions.state("contacts", root=tmp_path).empty and versions.state("contacts", v2, tmp_path) is None
+    assert [p.name for p in (tmp_path / "contacts").glob("full-*")] == [f"full-{v3:06d}.csv.gz"]
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+import streamlit as st
+
+import dataset_store
+import storage_backend as sb
+import wal
+
+COLS = ["ID_Interaction", "ID", "Objet"]
+
+@pytest.fixture()
+def paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # répertoires par défaut (data/.changes…) hors de l'arbre
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    monkeypatch.setattr(sb, "_wal_on", lambda: True)
+    return {"inter": tmp_path / "interactions.csv"}
+
+def _row(i, objet="x"):
+    return {"ID_Interaction": f"INT{i:05d}", "ID": f"CNT{i:05d}", "Objet": objet}
+
+def test_torn_tail_is_ignored_and_replay_is_idempotent(tmp_path):
+    path = tmp_path / "t.csv"
+    wal.append(path, wal.row_ops("insert", pd.DataFrame([_row(2)]), "ID_Interaction"), base="b", etag="e1")
+    wal.append(path, wal.delete_ops(["INT00001"]), base="b", etag="e2")
+    with open(wal.wal_path(path), "ab") as fh:
+        fh.write(b"0000 {\"lsn\": 3")  # arrêt brutal pendant l'écriture
+    records = wal.read(path)
+    assert [r["lsn"] for r in records] == [1, 2]
+    base = pd.DataFrame([_row(1), _row(3)])
+    once = wal.replay(base, records, "ID_Interaction")
+    assert list(once["ID_Interaction"]) == ["INT00003", "INT00002"]
+    assert wal.replay(once, records, "ID_Interaction").equals(once)
+    wal.append(path, wal.delete_ops(["INT00003"]), base="b", etag="e3")  # la ligne interrompue est tronquée
+    assert [r["lsn"] for r in wal.read(path)] == [1, 2, 3]
+
+def test_save_is_journaled_then_recovered_into_the_csv(paths):
+    sb.save_df_target("inter", pd.DataFrame([_row(1), _row(2)]).reindex(columns=COLS + sb.AUDIT_COLS, fill_value=""), paths)
+    before = paths["inter"].read_bytes()
+    df = sb.ensure_df_source("inter", COLS, paths)
+    df.loc[df["ID_Interaction"] == "INT00001", "Objet"] = "modifié"
+    sb.save_df_target("inter", df[df["ID_Interaction"] != "INT00002"], paths)
+    sb.append_rows_target("inter", pd.DataFrame([_row(3)]), paths)
+    assert paths["inter"].read_bytes() == before  # fichier non réécrit
+    assert [o["op"] for r in wal.read(paths["inter"]) for o in r["ops"]] == ["update", "delete", "insert"]
+    etag = st.session_state["etag_inter"]
+    view = sb.ensure_df_source("inter", COLS, paths).set_index("ID_Interaction")
+    assert list(view.index) == ["INT00001", "INT00003"] and view.loc["INT00001", "Objet"] == "modifié"
+    assert st.session_state["etag_inter"] == etag
+    # Redémarrage : journal rejoué puis compacté dans le CSV
+    sb.clear_file_cache()
+    dataset_store.get_store.clear()
+    sb._WAL_RECOVERED.clear()
+    sb.ensure_df_source("inter", COLS, paths)
+    out = pd.read_csv(paths["inter"], dtype=str).set_index("ID_Interaction")
+    assert list(out.index) == ["INT00001", "INT00003"] and out.loc["INT00001", "Objet"] == "modifié"
+    assert not wal.wal_path(paths["inter"]).exists()
+    assert st.session_state["etag_inter"] == etag
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+import streamlit as st
+
+import storage_backend as sb
+import write_behind as wb
+
+COLS = ["ID_Interaction", "ID", "Objet"]
+
+@pytest.fixture()
+def paths(tmp_path, monkeypatch):
+    st.session_state.clear()
+    st.session_state["BACKEND_EFFECTIVE"] = "csv"
+    monkeypatch.setattr(wb, "ensure_worker", lambda *a, **k: None)  # flush piloté par le test
+    return {"inter": tmp_path / "interactions.csv"}
+
+def _row(i, objet="x"):
+    return {"ID_Interaction": f"INT{i:05d}", "ID": f"CNT{i:05d}", "Objet": objet}
+
+def test_pending_writes_are_visible_then_flushed(paths):
+    sb.save_df_target("inter", pd.DataFrame([_row(1)]), paths)
+    st.session_state["WRITE_BEHIND"] = True
+    df = sb.ensure_df_source("inter", COLS, paths)
+    sb.append_rows_target("inter", pd.DataFrame([_row(2)]), paths)
+    df = sb.ensure_df_source("inter", COLS, paths)
+    df.loc[df["ID_Interaction"] == "INT00001", "Objet"] = "modifié"
+    sb.save_df_target("inter", df, paths)
+    assert len(pd.read_csv(paths["inter"])) == 1          # rien d'écrit encore
+    view = sb.ensure_df_source("inter", COLS, paths).set_index("ID_Interaction")
+    assert view.loc["INT00001", "Objet"] == "modifié" and "INT00002" in view.index
+    journal = sb._write_behind_dir(paths)
+    assert wb.flush_once(journal_dir=journal) == 2
+    out = pd.read_csv(paths["inter"], dtype=str).set_index("ID_Interaction")
+    assert out.loc["INT00001", "Objet"] == "modifié" and "INT00002" in out.index
+    assert wb.status(journal)["en_attente"] == 0
+
+def test_consecutive_appends_and_informed_saves_are_coalesced():
+    entries = [{"seq": "1", "op": "append"}, {"seq": "2", "op": "append"},
+               {"seq": "3", "op": "save", "seen": "2"}, {"seq": "4", "op": "save", "seen": "3"},
+               {"seq": "5", "op": "save", "seen": "2"}]
+    assert [[e["seq"] for e in g] for g in wb.plan(entries)] == [["1", "2"], ["3", "4"], ["5"]]
+
+def test_failed_gsheets_write_stays_pending(paths):
+    journal = sb._write_behind_dir(paths)
+    wb.enqueue("inter", "append", pd.DataFrame([_row(1)]), backend="gsheets", paths=paths, journal_dir=journal)
+    def down(tab):
+        raise ConnectionError("Sheets indisponible")
+    with pytest.raises(RuntimeError, match="indisponible"):
+        wb.flush_once(ws_func=down, journal_dir=journal)
+    assert len(wb.pending_entries(journal_dir=journal)) == 1   # pas de repli CSV silencieux
+    assert not paths["inter"].exists()
+
+def test_row_conflicts_are_rejected_not_lost(paths):
+    sb.save_df_target("inter", pd.DataFrame([_row(1), _row(2)]), paths)
+    st.session_state["WRITE_BEHIND"] = True
+    mine = sb.ensure_df_source("inter", COLS, paths)
+    other = {"BACKEND_EFFECTIVE": "csv"}
+    with sb.session_state_override(other):
+        theirs = sb._load_df_now("inter", COLS, paths)
+        theirs.loc[theirs["ID_Interaction"] == "INT00001", "Objet"] = "autre session"
+        sb._save_df_now("inter", theirs, paths)
+    mine.loc[:, "Objet"] = "moi"
+    sb.save_df_target("inter", mine, paths)
+    journal = sb._write_behind_dir(paths)
+    wb.flush_once(journal_dir=journal)
+    out = pd.read_csv(paths["inter"], dtype=str).set_index("ID_Interaction")
+    assert out.loc["INT00001", "Objet"] == "autre session" and out.loc["INT00002", "Objet"] == "moi"
+    status = wb.status(journal)
+    assert status["en_attente"] == 0 and status["rejetées"] == 1
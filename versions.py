@@ -0,0 +1,260 @@
+# versions.py — versions des tables : deltas ligne à ligne (par clé) entre états complets, restauration à une date
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import wal
+
+VERSIONS_DIR = Path("data/.versions")
+FULL_EVERY = 50        # au-delà de 50 deltas depuis le dernier état complet, la version suivante en est un
+RETENTION_DAYS = 90    # compact() : versions plus anciennes retirées…
+KEEP_MIN = 10          # …sauf les 10 dernières, toujours gardées
+DAILY_AFTER_DAYS = 7   # au-delà de 7 jours, une seule version par jour (la dernière)
+
+# <racine>/<table>/log.jsonl : une ligne par version, dans l'ordre
+#   {"v", "ts", "user", "reason", "rows", "columns", "kind": "full", "file": "full-<v>.csv.gz"}  état complet
+#   {"v", "ts", "user", "reason", "rows", "columns", "kind": "delta", "key", "ops"}             depuis la précédente
+#   ops : format wal ({"op": "insert"|"update"|"delete", "key", "row"}), rejouées avec wal.replay.
+# La première version conservée est toujours un état complet.
+
+_LOCK = globals().get("_LOCK", threading.Lock())
+
+def _log_path(table: str, root: Path) -> Path:
+    return Path(root) / table / "log.jsonl"
+
+def _scan(table: str, root: Path) -> tuple:
+    """(versions valides, octets valides) : lecture jusqu'à la première ligne interrompue."""
+    records, end = [], 0
+    try:
+        fh = open(_log_path(table, root), "rb")
+    except OSError:
+        return records, end
+    with fh:
+        for line in fh:
+            if not line.endswith(b"\n"):
+                break  # version en cours d'écriture
+            try:
+                records.append(json.loads(line))
+            except Exception:
+                break
+            end += len(line)
+    return records, end
+
+def history(table: str, root: Path = VERSIONS_DIR) -> List[dict]:
+    """Versions de la table (sans les opérations), de la plus ancienne à la plus récente."""
+    out = []
+    for r in _scan(table, root)[0]:
+        ops = r.get("ops") or []
+        out.append({**{k: v for k, v in r.items() if k != "ops"},
+                    "ajouts": sum(o["op"] == "insert" for o in ops),
+                    "modifications": sum(o["op"] == "update" for o in ops),
+                    "suppressions": sum(o["op"] == "delete" for o in ops)})
+    return out
+
+# ---------- Deltas ----------
+def _keyed(df: pd.DataFrame, key: Optional[str]) -> bool:
+    if not key or key not in df.columns:
+        return False
+    k = df[key].astype(str).str.strip()
+    return not (k.eq("") | k.eq("nan")).any() and not k.duplicated().any()
+
+def _hashes(df: pd.DataFrame, key: str, cols: List[str]) -> pd.Series:
+    norm = df.reindex(columns=cols, fill_value="").fillna("").astype(str)
+    return pd.Series(pd.util.hash_pandas_object(norm, index=False).to_numpy(), index=df[key].astype(str).to_numpy())
+
+def delta_ops(before: pd.DataFrame, after: pd.DataFrame, key: str) -> List[dict]:
+    """Opérations (format wal) qui mènent de `before` à `after`, comparées sur les colonnes de `after`
+       (une colonne ajoutée vide ou retirée ne produit pas d'opération : voir "columns" de la version)."""
+    cols = list(after.columns)
+    old, new = _hashes(before, key, cols), _hashes(after, key, cols)
+    known = new.index.isin(old.index)
+    same = np.zeros(len(new), dtype=bool)
+    if known.any():
+        same[known] = new[known].to_numpy() == old.loc[new.index[known]].to_numpy()
+    rows = after.fillna("").astype(str)
+    ops = [{"op": "update" if k else "insert", "key": r[key], "row": r}
+           for r, k in zip(rows[~same].to_dict("records"), known[~same])]
+    ops += [{"op": "delete", "key": k} for k in old.index[~old.index.isin(new.index)]]
+    return ops
+
+def _write_full(table: str, v: int, df: pd.DataFrame, root: Path) -> str:
+    name = f"full-{v:06d}.csv.gz"
+    path = Path(root) / table / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{name}.{os.getpid()}.tmp")
+    df.to_csv(tmp, index=False, encoding="utf-8", compression="gzip")
+    os.replace(tmp, path)
+    return name
+
+def _state(table: str, records: List[dict], root: Path) -> Optional[pd.DataFrame]:
+    """État après la dernière version de `records` : dernier état complet + deltas suivants."""
+    fulls = [i for i, r in enumerate(records) if r["kind"] == "full"]
+    if not fulls:
+        return None
+    start = fulls[-1]
+    try:
+        df = pd.read_csv(Path(root) / table / records[start]["file"], dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        df = pd.DataFrame()  # table sans colonnes (fichier absent au moment de la version)
+    deltas = records[start + 1:]
+    if deltas:
+        df = wal.replay(df, deltas, deltas[-1]["key"])
+    return df.reindex(columns=records[-1]["columns"], fill_value="")
+
+def _encode(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+# ---------- Enregistrement ----------
+def record(table: str, df: pd.DataFrame, key: Optional[str], user: str = "system", reason: str = "",
+           root: Path = VERSIONS_DIR, lock=None) -> Optional[int]:
+    """Enregistre `df` comme nouvelle version de la table : delta par rapport à la précédente, ou état complet
+       (première version, clé absente / vide / en double, ou FULL_EVERY deltas depuis le dernier état complet).
+       `lock` : verrou inter-process (contexte). Renvoie le numéro de version, None si rien n'a changé."""
+    df = df.fillna("").astype(str)
+    with _LOCK, (lock if lock is not None else nullcontext()):
+        records, end = _scan(table, root)
+        head = _state(table, records, root) if records else None
+        v = (records[-1]["v"] + 1) if records else 1
+        rec = {"v": v, "ts": time.time(), "user": user, "reason": reason, "rows": len(df),
+               "columns": [str(c) for c in df.columns]}
+        fulls = [i for i, r in enumerate(records) if r["kind"] == "full"]
+        if head is not None and len(records) - 1 - fulls[-1] < FULL_EVERY and _keyed(head, key) and _keyed(df, key):
+            ops = delta_ops(head, df, key)
+            if not ops and list(head.columns) == rec["columns"]:
+                return None
+            rec.update(kind="delta", key=key, ops=ops)
+        else:
+            if head is not None and head.equals(df.reset_index(drop=True)):
+                return None
+            rec.update(kind="full", file=_write_full(table, v, df, root))
+        with open(_log_path(table, root), "ab") as fh:
+            if fh.tell() != end:
+                fh.truncate(end)  # reste d'une version interrompue
+            fh.write(_encode(rec))
+            fh.flush()
+            os.fsync(fh.fileno())
+    return v
+
+# ---------- Lecture, restauration, comparaison ----------
+def _timestamp(when: Union[float, int, str, datetime]) -> float:
+    if isinstance(when, (int, float)):
+        return float(when)
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    return when.timestamp()  # datetime naïf : heure locale
+
+def version_at(table: str, when: Union[float, str, datetime], root: Path = VERSIONS_DIR) -> Optional[int]:
+    """Dernière version enregistrée à la date `when` ou avant (None : aucune)."""
+    ts = _timestamp(when)
+    before = [r["v"] for r in _scan(table, root)[0] if r["ts"] <= ts]
+    return before[-1] if before else None
+
+def state(table: str, v: Optional[int] = None, root: Path = VERSIONS_DIR) -> Optional[pd.DataFrame]:
+    """Contenu de la table à la version `v` (dernière si None) ; None si cette version n'existe plus."""
+    records = _scan(table, root)[0]
+    if v is not None:
+        if not any(r["v"] == v for r in records):
+            return None
+        records = [r for r in records if r["v"] <= v]
+    return _state(table, records, root) if records else None
+
+def restore_at(table: str, when: Union[float, str, datetime], root: Path = VERSIONS_DIR) -> Optional[pd.DataFrame]:
+    """Contenu de la table tel qu'enregistré à la date `when` (à réécrire par l'appelant)."""
+    v = version_at(table, when, root)
+    return state(table, v, root) if v is not None else None
+
+def diff(table: str, v1: int, v2: int, key: str, root: Path = VERSIONS_DIR) -> Dict[str, pd.DataFrame]:
+    """Différences de v1 à v2 : lignes ajoutées, supprimées, et valeurs modifiées (clé, colonne, avant, après)."""
+    a, b = state(table, v1, root), state(table, v2, root)
+    if a is None or b is None:
+        raise ValueError(f"Version absente pour {table} : {v1 if a is None else v2}")
+    changed = pd.DataFrame(columns=[key, "Colonne", "Avant", "Après"])
+    if not (_keyed(a, key) and _keyed(b, key)):
+        return {"ajoutées": b, "supprimées": a, "modifiées": changed}
+    cols = list(b.columns) + [c for c in a.columns if c not in b.columns]
+    ops = delta_ops(a.reindex(columns=cols, fill_value=""), b.reindex(columns=cols, fill_value=""), key)
+    added = {o["key"] for o in ops if o["op"] == "insert"}
+    removed = {o["key"] for o in ops if o["op"] == "delete"}
+    updated = [o["key"] for o in ops if o["op"] == "update"]
+    if updated:
+        x = a.set_index(a[key].astype(str)).reindex(index=updated, columns=cols, fill_value="")
+        y = b.set_index(b[key].astype(str)).reindex(index=updated, columns=cols, fill_value="")
+        ne = (x != y).stack()
+        changed = pd.DataFrame([{key: k, "Colonne": c, "Avant": x.at[k, c], "Après": y.at[k, c]}
+                                for k, c in ne[ne].index], columns=changed.columns)
+    return {"ajoutées": b[b[key].astype(str).isin(added)],
+            "supprimées": a[a[key].astype(str).isin(removed)],
+            "modifiées": changed}
+
+# ---------- Rétention et compaction ----------
+def _fold(records: List[dict]) -> dict:
+    """Deltas consécutifs réunis en un seul (dernière opération par clé), métadonnées du dernier."""
+    ops: Dict[str, dict] = {}
+    for r in records:
+        for o in r["ops"]:
+            ops[str(o["key"])] = o
+    return {**records[-1], "ops": list(ops.values())}
+
+def compact(table: str, keep_days: float = RETENTION_DAYS, keep_min: int = KEEP_MIN,
+            daily_after_days: float = DAILY_AFTER_DAYS, root: Path = VERSIONS_DIR, lock=None) -> int:
+    """Rétention : retire les versions de plus de `keep_days` jours ; au-delà de `daily_after_days`, ne garde que
+       la dernière version de chaque jour (les deltas retirés sont fusionnés dans la version gardée suivante).
+       Les `keep_min` dernières versions sont toujours gardées. Renvoie le nombre de versions retirées."""
+    now = time.time()
+    with _LOCK, (lock if lock is not None else nullcontext()):
+        records, _ = _scan(table, root)
+        old = records[:max(0, len(records) - max(1, keep_min))]
+        expired = sum(1 for r in old if r["ts"] < now - keep_days * 86400)
+        day = lambda r: time.strftime("%Y-%m-%d", time.localtime(r["ts"]))
+        kept, pending, dropped = [], [], 0
+        for i, r in enumerate(records):
+            thin = (i < len(old) and r["ts"] < now - daily_after_days * 86400
+                    and i + 1 < len(records) and day(records[i + 1]) == day(r))
+            if i < expired or thin:
+                pending.append(r)
+                dropped += 1
+                continue
+            if pending and r["kind"] == "delta":
+                if not kept or any(p["kind"] == "full" for p in pending):  # première gardée : état complet
+                    name = _write_full(table, r["v"], _state(table, records[:i + 1], root), root)
+                    r = {k: x for k, x in r.items() if k not in ("key", "ops")}
+                    r.update(kind="full", file=name)
+                else:
+                    r = _fold(pending + [r])
+            kept.append(r)
+            pending = []
+        if dropped:
+            path = _log_path(table, root)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(b"".join(_encode(r) for r in kept))
+            os.replace(tmp, path)
+        used = {r["file"] for r in kept if r["kind"] == "full"}
+        folder = Path(root) / table
+        for f in folder.glob("full-*.csv.gz") if folder.exists() else []:
+            if f.name not in used:
+                f.unlink(missing_ok=True)  # états complets plus référencés (ou écriture interrompue)
+    return dropped
+
+# ---------- Diagnostic ----------
+def status(root: Path = VERSIONS_DIR) -> list:
+    out = []
+    root = Path(root)
+    for folder in sorted(p for p in root.iterdir() if p.is_dir()) if root.exists() else []:
+        records = _scan(folder.name, root)[0]
+        if not records:
+            continue
+        fmt = lambda ts: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        out.append({"table": folder.name, "versions": len(records),
+                    "états_complets": sum(r["kind"] == "full" for r in records),
+                    "octets": sum(f.stat().st_size for f in folder.iterdir() if f.is_file()),
+                    "première": fmt(records[0]["ts"]), "dernière": fmt(records[-1]["ts"])})
+    return out
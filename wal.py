@@ -0,0 +1,169 @@
+# wal.py — journal d'écriture anticipée par table (CSV) : opérations ligne à ligne, rejouées à la lecture
+from __future__ import annotations
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+WAL_DIR = ".wal"
+CHECKPOINT_MAX_OPS = 5000          # au-delà, le journal est compacté dans le fichier de la table
+CHECKPOINT_MAX_BYTES = 8 << 20
+CHECKPOINT_MAX_AGE_S = 24 * 3600.0
+
+# Une ligne = une transaction (un save ou un ajout) : "<crc32> <json>\n", json = {"lsn", "ts", "base", "etag", "ops"}
+#   base : ETag du fichier de la table sur lequel le journal s'applique ; etag : ETag de la table après la transaction
+#   ops  : {"op": "insert"|"update"|"delete", "key", "row" (sauf delete), "at", "by"}
+
+def wal_path(path: Path) -> Path:
+    return Path(path).parent / WAL_DIR / f"{Path(path).name}.wal"
+
+def _encode(record: dict) -> bytes:
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"%08x " % zlib.crc32(payload) + payload + b"\n"
+
+def _decode(line: bytes) -> Optional[dict]:
+    if not line.endswith(b"\n"):
+        return None  # ligne interrompue (arrêt pendant l'écriture)
+    crc, _, payload = line[:-1].partition(b" ")
+    try:
+        if int(crc, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except Exception:
+        return None
+
+def _scan(path: Path) -> tuple:
+    """(transactions valides, octets valides) : lecture jusqu'à la première ligne interrompue ou corrompue."""
+    records, end = [], 0
+    try:
+        fh = open(wal_path(path), "rb")
+    except OSError:
+        return records, end
+    with fh:
+        for line in fh:
+            rec = _decode(line)
+            if rec is None:
+                break
+            records.append(rec)
+            end += len(line)
+    return records, end
+
+def read(path: Path) -> List[dict]:
+    """Transactions validées du journal de `path`, dans l'ordre. Une transaction interrompue par un arrêt
+       brutal n'a pas eu lieu (l'appelant n'a pas eu de retour) : elle est ignorée."""
+    return _scan(path)[0]
+
+def append(path: Path, ops: List[dict], *, base: str, etag: str) -> dict:
+    """Ajoute une transaction, durable au retour (fsync). À appeler sous table_lock exclusif."""
+    jp = wal_path(path)
+    jp.parent.mkdir(parents=True, exist_ok=True)
+    records, end = _scan(path)
+    record = {"lsn": (records[-1]["lsn"] + 1) if records else 1, "ts": time.time(),
+              "base": base, "etag": etag, "ops": ops}
+    with open(jp, "ab") as fh:
+        if fh.tell() != end:
+            fh.truncate(end)  # reste d'une transaction interrompue : sinon les suivantes seraient illisibles
+        fh.write(_encode(record))
+        fh.flush()
+        os.fsync(fh.fileno())
+    if end == 0:
+        _fsync_dir(jp.parent)
+    return record
+
+def _fsync_dir(directory: Path) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def reset(path: Path, keep: bool = False) -> None:
+    """Vide le journal (après compaction). keep=True : mis de côté en <table>.wal.<horodatage>.orphan
+       (journal qui ne correspond plus au fichier, réécrit hors application)."""
+    jp = wal_path(path)
+    if not jp.exists():
+        return
+    if keep:
+        os.replace(jp, jp.with_name(f"{jp.name}.{time.strftime('%Y%m%d-%H%M%S')}.orphan"))
+    else:
+        jp.unlink()
+    _fsync_dir(jp.parent)
+
+def needs_checkpoint(path: Path, records: List[dict]) -> bool:
+    """Compaction due : trop d'opérations, journal trop gros ou trop ancien."""
+    if not records:
+        return False
+    try:
+        size = wal_path(path).stat().st_size
+    except OSError:
+        size = 0
+    ops = sum(len(r.get("ops", ())) for r in records)
+    return (ops >= CHECKPOINT_MAX_OPS or size >= CHECKPOINT_MAX_BYTES
+            or time.time() - float(records[0].get("ts", 0)) >= CHECKPOINT_MAX_AGE_S)
+
+# ---------- Opérations ----------
+def _audit(op: str, row: dict, user: str, now: str) -> tuple:
+    """(date, auteur) de l'opération depuis les colonnes d'audit de la ligne."""
+    first, second = ("Created", "Updated") if op == "insert" else ("Updated", "Created")
+    at = row.get(f"{first}_At") or row.get(f"{second}_At") or now
+    by = row.get(f"{first}_By") or row.get(f"{second}_By") or user
+    return at, by
+
+def row_ops(op: str, rows: pd.DataFrame, key: str, user: str = "system") -> List[dict]:
+    """Opérations 'insert' ou 'update' (ligne complète) pour chaque ligne de `rows`."""
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    out = []
+    for row in rows.fillna("").astype(str).to_dict("records"):
+        at, by = _audit(op, row, user, now)
+        out.append({"op": op, "key": row[key], "row": row, "at": at, "by": by})
+    return out
+
+def delete_ops(keys, user: str = "system") -> List[dict]:
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    return [{"op": "delete", "key": str(k), "at": now, "by": user} for k in keys]
+
+def replay(df: pd.DataFrame, records: List[dict], key: str) -> pd.DataFrame:
+    """Applique les transactions à `df` (clé `key` unique). Opérations idempotentes : insert/update écrivent
+       la ligne de clé k (en place si elle existe, sinon en fin de table), delete la retire si présente ;
+       rejouer un journal déjà compacté redonne donc le même état."""
+    final: Dict[str, Optional[dict]] = {}
+    for rec in records:
+        for op in rec.get("ops", ()):
+            final[str(op["key"])] = None if op["op"] == "delete" else op["row"]
+    if not final:
+        return df
+    upserts = [r for r in final.values() if r is not None]
+    gone = [k for k, r in final.items() if r is None]
+    cols = list(df.columns)
+    for r in upserts:
+        cols += [c for c in r if c not in cols]
+    out = df.set_index(df[key].astype(str), drop=False)
+    out = out.drop(index=[k for k in gone if k in out.index]).reindex(columns=cols, fill_value="")
+    if not upserts:
+        return out.reset_index(drop=True)
+    rows = pd.DataFrame(upserts).reindex(columns=cols, fill_value="").fillna("")
+    rows.index = rows[key].astype(str)
+    present = rows.index.isin(out.index)
+    if present.any():
+        out.loc[rows.index[present]] = rows[present].values
+    return pd.concat([out, rows[~present]]).reset_index(drop=True)
+
+# ---------- Diagnostic ----------
+def status(data_dir: Path) -> list:
+    out = []
+    wal_dir = Path(data_dir) / WAL_DIR
+    for jp in sorted(wal_dir.glob("*.wal")) if wal_dir.exists() else []:
+        records = read(jp.parent.parent / jp.name[:-len(".wal")])
+        out.append({"table": jp.name[:-len(".wal")], "transactions": len(records),
+                    "opérations": sum(len(r.get("ops", ())) for r in records), "octets": jp.stat().st_size,
+                    "depuis": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(records[0]["ts"])) if records else None})
+    return out
@@ -0,0 +1,262 @@
+# write_behind.py — écriture différée : journal local durable + flush en tâche de fond (coalescence par table)
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+JOURNAL_DIR = Path("data/.write_behind")
+DEFAULT_DELAY_S = 2.0     # attente avant flush : les clics rapprochés sont regroupés
+MAX_BACKOFF_S = 60.0
+
+# État process (partagé par toutes les sessions ; survit à importlib.reload)
+_WORKER: Dict[str, object] = globals().get("_WORKER", {"flushed": 0, "last_flush": None, "last_error": None})
+_LOCK = globals().get("_LOCK", threading.Lock())
+
+# ---------- Journal ----------
+def _fsync_write(path: Path, data: bytes) -> None:
+    """Écriture durable : fichier temporaire + fsync + os.replace."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _frame_path(entry: dict, which: str, journal_dir: Path) -> Path:
+    return journal_dir / f"{entry['seq']}.{which}.csv"
+
+def _write_frame(path: Path, df: pd.DataFrame) -> None:
+    _fsync_write(path, df.fillna("").astype(str).to_csv(index=False).encode("utf-8"))
+
+def load_frame(entry: dict, which: str = "data", journal_dir: Path = JOURNAL_DIR) -> Optional[pd.DataFrame]:
+    path = _frame_path(entry, which, journal_dir)
+    if not path.exists():
+        return None
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+def enqueue(table: str, op: str, df: pd.DataFrame, *, backend: str, paths: Optional[dict] = None,
+            etag: Optional[str] = None, base: Optional[pd.DataFrame] = None, seen: Optional[str] = None,
+            journal_dir: Path = JOURNAL_DIR) -> dict:
+    """Journalise une écriture ('save' = table complète, 'append' = lignes ajoutées) et rend la main.
+       L'entrée n'existe qu'une fois son .json écrit (après les données) : pas d'entrée à moitié écrite."""
+    journal_dir.mkdir(parents=True, exist_ok=True)
+    with _LOCK:
+        seq = f"{time.time_ns():020d}"
+        while (journal_dir / f"{seq}.json").exists():
+            seq = f"{int(seq) + 1:020d}"
+        entry = {"seq": seq, "table": table, "op": op, "backend": backend, "etag": etag, "seen": seen,
+                 "paths": {k: str(v) for k, v in (paths or {}).items()}, "created_at": time.time()}
+        _write_frame(_frame_path(entry, "data", journal_dir), df)
+        if base is not None:
+            _write_frame(_frame_path(entry, "base", journal_dir), base)
+        _fsync_write(journal_dir / f"{seq}.json", json.dumps(entry).encode("utf-8"))
+    wake()
+    return entry
+
+def pending_entries(table: Optional[str] = None, journal_dir: Path = JOURNAL_DIR) -> List[dict]:
+    """Entrées en attente (ordre d'arrivée), y compris celles laissées par un process arrêté."""
+    out = []
+    for p in sorted(journal_dir.glob("*.json")) if journal_dir.exists() else []:
+        try:
+            entry = json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        if table is None or entry.get("table") == table:
+            out.append(entry)
+    return out
+
+def _discard(entry: dict, journal_dir: Path) -> None:
+    (journal_dir / f"{entry['seq']}.json").unlink(missing_ok=True)  # d'abord le .json : l'entrée disparaît
+    for which in ("data", "base"):
+        _frame_path(entry, which, journal_dir).unlink(missing_ok=True)
+    (journal_dir / f"{entry['seq']}.inflight").unlink(missing_ok=True)
+
+def _reject(entry: dict, reason: str, journal_dir: Path) -> None:
+    """Écriture impossible à fusionner : mise de côté dans rejected/ (consultable), hors de la file."""
+    rej = journal_dir / "rejected"
+    rej.mkdir(exist_ok=True)
+    entry = {**entry, "rejected": reason}
+    for which in ("data", "base"):
+        src = _frame_path(entry, which, journal_dir)
+        if src.exists():
+            os.replace(src, rej / src.name)
+    _fsync_write(rej / f"{entry['seq']}.json", json.dumps(entry).encode("utf-8"))
+    _discard(entry, journal_dir)
+
+# ---------- Coalescence ----------
+def plan(entries: List[dict]) -> List[List[dict]]:
+    """Regroupe les écritures consécutives d'une même table : ajouts successifs -> un seul ajout ;
+       enregistrements successifs -> le dernier seulement, s'il a été fait en voyant les précédents
+       (sinon chacun est écrit, et la fusion à trois voies réconcilie)."""
+    groups: List[List[dict]] = []
+    for e in entries:
+        last = groups[-1] if groups else None
+        if last and last[-1]["op"] == e["op"] == "append":
+            last.append(e)
+        elif last and last[-1]["op"] == e["op"] == "save" and (e.get("seen") or "") >= last[-1]["seq"]:
+            last.append(e)
+        else:
+            groups.append([e])
+    return groups
+
+# ---------- Vue lecture (lire ses propres écritures) ----------
+def overlay(table: str, df: pd.DataFrame, current_etag: Optional[str] = None,
+            journal_dir: Path = JOURNAL_DIR) -> pd.DataFrame:
+    """Applique à `df` (état stocké) les écritures en attente de la table. Un enregistrement en attente fait
+       sur une version antérieure du stockage est fusionné (merge_three_way) plutôt que substitué."""
+    entries = pending_entries(table, journal_dir)
+    if not entries:
+        return df
+    from storage_backend import ROW_KEYS, _keyed, _rekey_new_rows, merge_three_way
+    key = ROW_KEYS.get(table)
+    out = df.fillna("").astype(str)
+    for e in entries:
+        rows = load_frame(e, "data", journal_dir)
+        if rows is None:
+            continue
+        if e["op"] == "append":
+            if key in out.columns and key in rows.columns:
+                rows = _rekey_new_rows(rows, out[key], key)
+            out = pd.concat([out, rows], ignore_index=True).fillna("")
+            continue
+        base = load_frame(e, "base", journal_dir)
+        if e.get("etag") == current_etag or base is None or not (_keyed(base, key) and _keyed(out, key)
+                                                                 and _keyed(rows, key)):
+            out = rows
+        else:
+            out, _ = merge_three_way(base, rows, out, key)
+        current_etag = None  # les entrées suivantes s'appliquent sur un état déjà modifié
+    return out
+
+# ---------- Flush ----------
+def flush_once(ws_func=None, journal_dir: Path = JOURNAL_DIR) -> int:
+    """Écrit les entrées en attente (par table, dans l'ordre) ; renvoie le nombre d'entrées traitées.
+       Une erreur sur une table arrête cette table (reprise au tour suivant) sans bloquer les autres."""
+    import storage_backend as sb
+    by_table: Dict[str, List[dict]] = {}
+    for e in pending_entries(journal_dir=journal_dir):
+        by_table.setdefault(e["table"], []).append(e)
+    done, failed = 0, []
+    for table, entries in by_table.items():
+        for group in plan(entries):
+            # Verrou fichier par table : un autre process Streamlit ne flushe pas les mêmes entrées en même temps
+            with sb.table_lock(journal_dir / table):
+                group = [e for e in group if (journal_dir / f"{e['seq']}.json").exists()]  # déjà écrites ailleurs
+                if not group:
+                    continue
+                try:
+                    conflicts = _flush_group(sb, table, group, ws_func, journal_dir)
+                except sb.WriteConflictError as err:
+                    for e in group:
+                        _reject(e, str(err), journal_dir)
+                    _WORKER["last_error"] = f"{table} : {err}"
+                    break
+                except Exception as err:
+                    # Marqueurs .inflight conservés : l'écriture a pu partir (ex. délai dépassé), reprise dédoublonnée
+                    failed.append(f"{table} : {err}")
+                    break
+                for e in group[:-1]:
+                    _discard(e, journal_dir)
+                if conflicts:
+                    # Fusion écrite sans les lignes modifiées entre-temps : l'entrée est gardée dans rejected/
+                    reason = f"{len(conflicts)} ligne(s) modifiée(s) entre-temps, non écrites : {', '.join(conflicts)}"
+                    _reject(group[-1], reason, journal_dir)
+                    _WORKER["last_error"] = f"{table} : {reason}"
+                else:
+                    _discard(group[-1], journal_dir)
+            done += len(group)
+            _WORKER["flushed"] = int(_WORKER.get("flushed", 0)) + len(group)
+            _WORKER["last_flush"] = time.time()
+    if failed:
+        raise RuntimeError(" ; ".join(failed))
+    return done
+
+def _flush_group(sb, table: str, group: List[dict], ws_func, journal_dir: Path) -> List[str]:
+    """Écrit le groupe ; renvoie les clés des lignes non écrites car modifiées des deux côtés."""
+    last = group[-1]
+    paths = {k: Path(v) for k, v in last.get("paths", {}).items()} or None
+    replayed = any((journal_dir / f"{e['seq']}.inflight").exists() for e in group)
+    for e in group:
+        (journal_dir / f"{e['seq']}.inflight").touch()
+    state = {"BACKEND_EFFECTIVE": last["backend"], f"etag_{table}": last.get("etag")}
+    base = load_frame(last, "base", journal_dir)
+    if base is not None:
+        state[f"base_{table}"] = base
+    with sb.session_state_override(state):
+        if last["op"] == "save":
+            sb._save_df_now(table, load_frame(last, "data", journal_dir), paths, ws_func)
+            return list(state.get(f"conflicts_{table}") or [])
+        key = sb.ROW_KEYS.get(table)
+        rows = pd.DataFrame()
+        for e in group:
+            r = load_frame(e, "data", journal_dir)
+            if key in rows.columns and key in r.columns:
+                r = sb._rekey_new_rows(r, rows[key], key)  # IDs pris entre deux ajouts en attente
+            rows = pd.concat([rows, r], ignore_index=True).fillna("")
+        if replayed:
+            # Reprise après arrêt pendant un flush : ne pas rajouter des lignes déjà écrites
+            current = sb._load_df_now(table, list(rows.columns), paths, ws_func)
+            known = set(sb._row_hashes(current.reindex(columns=rows.columns, fill_value="")).tolist())
+            rows = rows[[h not in known for h in sb._row_hashes(rows).tolist()]]
+        sb._append_rows_now(table, rows, paths, ws_func)
+    return []
+
+# ---------- Thread de fond ----------
+def wake() -> None:
+    ev = _WORKER.get("event")
+    if ev is not None:
+        ev.set()
+
+def _loop(ws_func, delay_s: float, journal_dir: Path, event: threading.Event) -> None:
+    backoff = 0.0
+    while True:
+        event.wait(backoff or None)   # réveil : nouvelle écriture, ou nouvel essai après erreur
+        time.sleep(delay_s)           # laisse arriver les clics suivants (coalescence)
+        event.clear()
+        _WORKER["last_error"] = None
+        try:
+            flush_once(_WORKER.get("ws_func", ws_func), journal_dir)
+            backoff = 0.0
+            if pending_entries(journal_dir=journal_dir):
+                event.set()
+        except Exception as e:  # réseau, quota… : on garde le journal, nouvel essai plus tard
+            _WORKER["last_error"] = str(e)
+            backoff = min(MAX_BACKOFF_S, max(1.0, backoff * 2))
+
+def ensure_worker(ws_func=None, delay_s: float = DEFAULT_DELAY_S, journal_dir: Path = JOURNAL_DIR) -> None:
+    """Démarre (une seule fois par process) le thread de flush. Les entrées laissées par un arrêt brutal
+       sont rejouées dès le démarrage."""
+    with _LOCK:
+        if ws_func is not None:
+            _WORKER["ws_func"] = ws_func
+        th = _WORKER.get("thread")
+        if th is not None and th.is_alive():
+            return
+        event = threading.Event()
+        event.set()  # premier tour immédiat : rejoue le journal existant
+        th = threading.Thread(target=_loop, args=(ws_func, delay_s, journal_dir, event),
+                              name="write-behind", daemon=True)
+        _WORKER.update({"thread": th, "event": event})
+        th.start()
+
+def status(journal_dir: Path = JOURNAL_DIR) -> dict:
+    entries = pending_entries(journal_dir=journal_dir)
+    per_table: Dict[str, int] = {}
+    for e in entries:
+        per_table[e["table"]] = per_table.get(e["table"], 0) + 1
+    th = _WORKER.get("thread")
+    rejected = journal_dir / "rejected"
+    return {
+        "actif": bool(th is not None and th.is_alive()),
+        "en_attente": len(entries),
+        "par_table": per_table,
+        "écrites": int(_WORKER.get("flushed", 0)),
+        "dernier_flush": _WORKER.get("last_flush"),
+        "dernière_erreur": _WORKER.get("last_error"),
+        "rejetées": len(list(rejected.glob("*.json"))) if rejected.exists() else 0,
+    }